@@ -0,0 +1,234 @@
+"""Times the hot paths against synthetic libraries and compares them to a stored baseline.
+
+    python benchmarks/run_benchmarks.py                    # run and compare to baseline.json
+    python benchmarks/run_benchmarks.py --save-baseline    # run and make this the new baseline
+    python benchmarks/run_benchmarks.py --output out.json  # also write the results somewhere
+
+Each benchmark is run at a few sizes so a change in how something scales shows up
+as well as a change in raw speed. Exits 1 if anything regressed.
+"""
+import os, sys, json, math, time, shutil, argparse, platform, tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), 'src'))
+
+from synthetic_library import make_library, make_element
+
+from tinyelements.tinyelements_helpers import get_longest_sequence, get_dirs
+from tinyelements.tinyelements_sampling import sample_list
+from tinyelements.tinyelements_crawler import crawl_library
+from tinyelements.tinyelements_copy import copy_files
+
+BASELINE_PATH = os.path.join(HERE, 'baseline.json')
+
+# a benchmark more than this much slower than baseline is a regression
+DEFAULT_TOLERANCE = 0.5
+# ignore differences smaller than this, they're noise
+NOISE_FLOOR = 0.002
+# time grows faster than n ** this between sizes means something went quadratic
+SCALING_LIMIT = 1.35
+
+
+def best_time(func, repeat):
+    """Best of a few runs of func, in seconds"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench_longest_sequence(sizes, repeat, scratch):
+    results = dict()
+    for n in sizes:
+        dir_list = ['fire_01.%04d.exr'%f for f in range(1001, 1001 + n)]
+        dir_list += ['fire_01_temp.%04d.exr'%f for f in range(1001, 1001 + n // 20)]
+        dir_list += ['fire_01.json', 'fire_01.gif', 'frame_list.txt']
+        results[n] = best_time(lambda: get_longest_sequence(list(dir_list)), repeat)
+    return results
+
+
+def bench_get_dirs(sizes, repeat, scratch):
+    results = dict()
+    for n in sizes:
+        root = os.path.join(scratch, 'dirs_%d'%n)
+        for i in range(n):
+            os.makedirs(os.path.join(root, 'element_%05d'%i))
+        for i in range(n // 10):
+            open(os.path.join(root, 'stray_%05d.txt'%i), 'w').close()
+        results[n] = best_time(lambda: get_dirs(root), repeat)
+    return results
+
+
+def bench_sample_frames(sizes, repeat, scratch):
+    results = dict()
+    for n in sizes:
+        frames = ['/lib/fire/fire_01/fire_01.%04d.exr'%f for f in range(n)]
+        results[n] = best_time(lambda: sample_list(frames, 100), repeat)
+    return results
+
+
+def bench_copy(sizes, repeat, scratch):
+    results = dict()
+    for n in sizes:
+        source = os.path.join(scratch, 'copy_src_%d'%n)
+        files = make_element(source, 'fire_01', n, file_size=256 * 1024)
+
+        def run():
+            target = os.path.join(scratch, 'copy_dst_%d'%n)
+            copy_files(source, target, files)
+            shutil.rmtree(target)
+        results[n] = best_time(run, repeat)
+    return results
+
+
+def bench_crawl(sizes, repeat, scratch):
+    results = dict()
+    for n in sizes:
+        root = make_library(os.path.join(scratch, 'crawl_%d'%n), categories=4, elements=n // 4, frames=50)
+        results[n] = best_time(lambda: crawl_library(root), repeat)
+    return results
+
+
+def bench_table(sizes, repeat, scratch):
+    try:
+        from PySide2.QtCore import QCoreApplication
+        from tinyelements.tinyelements_model import ElementTableModel, ElementFilterModel
+    except ImportError:
+        return None
+
+    app = QCoreApplication.instance() or QCoreApplication([])
+    results = dict()
+    for n in sizes:
+        rows = [{'name': 'element_%05d'%i, 'has_thumb': bool(i % 2)} for i in range(n)]
+        model = ElementTableModel()
+        proxy = ElementFilterModel()
+        proxy.setSourceModel(model)
+        proxy.sort(1)
+
+        def run():
+            model.set_elements(rows)
+            proxy.setFilterFixedString('element_0')
+            proxy.setFilterFixedString('')
+        results[n] = best_time(run, repeat)
+    return results
+
+
+BENCHMARKS = [
+    ('get_longest_sequence', bench_longest_sequence, [1000, 5000, 20000]),
+    ('get_dirs', bench_get_dirs, [500, 2000]),
+    ('sample_frames', bench_sample_frames, [1000, 5000, 20000]),
+    ('copy_files', bench_copy, [50, 200]),
+    ('crawl_library', bench_crawl, [100, 400]),
+    ('table_population', bench_table, [1000, 10000]),
+]
+
+
+def run_all(repeat=3, only=None):
+    """Run every benchmark in a scratch directory
+
+        Returns:
+        dictionary of 'name[size]' : seconds.
+    """
+    scratch = tempfile.mkdtemp(prefix='tinyelements_bench_')
+    results = dict()
+    try:
+        for name, func, sizes in BENCHMARKS:
+            if only and name not in only:
+                continue
+            timings = func(sizes, repeat, scratch)
+            if timings is None:
+                print('%-24s skipped'%name)
+                continue
+            for size, seconds in timings.items():
+                results['%s[%d]'%(name, size)] = seconds
+                print('%-24s %8d  %9.4fs'%(name, size, seconds))
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    return results
+
+
+def scaling_report(results):
+    """How each benchmark's time grows with size
+
+        Returns:
+        dictionary of name : exponent between its smallest and largest size.
+    """
+    series = dict()
+    for key, seconds in results.items():
+        name, size = key[:-1].split('[')
+        series.setdefault(name, dict())[int(size)] = seconds
+
+    exponents = dict()
+    for name, timings in series.items():
+        sizes = sorted(timings)
+        small, large = sizes[0], sizes[-1]
+        if small == large or timings[small] <= 0 or timings[large] < NOISE_FLOOR:
+            continue
+        exponents[name] = math.log(timings[large] / timings[small]) / math.log(float(large) / small)
+    return exponents
+
+
+def compare(results, baseline, tolerance):
+    """Find benchmarks that got slower than the baseline allows
+
+        Returns:
+        list of (name, baseline seconds, current seconds).
+    """
+    regressions = list()
+    for key, seconds in sorted(results.items()):
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if seconds > base * (1 + tolerance) and seconds - base > NOISE_FLOOR:
+            regressions.append((key, base, seconds))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Tiny Elements Library benchmarks.')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--only', action='append', help='just these benchmarks')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument('--output', help='write the results json here too')
+    args = parser.parse_args(argv)
+
+    results = run_all(args.repeat, args.only)
+    exponents = scaling_report(results)
+    report = {'python': platform.python_version(), 'platform': platform.platform(),
+              'results': results, 'scaling': exponents}
+
+    status = 0
+    for name, exponent in sorted(exponents.items()):
+        flag = ''
+        if exponent > SCALING_LIMIT:
+            flag = '  <-- superlinear'
+            status = 1
+        print('%-24s scales as n^%.2f%s'%(name, exponent, flag))
+
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.tolerance)
+        for key, base, seconds in regressions:
+            print('REGRESSION %-30s %.4fs -> %.4fs'%(key, base, seconds))
+        report['regressions'] = regressions
+        if regressions:
+            status = 1
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=4)
+        print('baseline written to %s'%args.baseline)
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""Builds throwaway element libraries of a given shape for the benchmarks.
+
+Frames are empty (or sparse) files so a library of thousands of elements costs
+next to nothing on disk.
+"""
+import os, random, argparse, tempfile
+
+SEPARATORS = ['.', '_']
+PADDINGS = [4, 4, 4, 5, 3]
+EXTENSIONS = ['exr', 'exr', 'png', 'jpg']
+STRAY_FILES = ['frame_list.txt', 'Thumbs.db', '.DS_Store', 'temp_0001.exr', 'notes.txt']
+
+
+def make_element(element_path, element, frames, separator='.', padding=4, extension='exr',
+                 start=1001, file_size=0, gaps=0, strays=0, rng=random):
+    """Write one element directory
+
+        Arguments:
+        element_path (string) : directory to make
+        element (string) : Name of the element
+        frames (int) : how many frames
+        separator (string) : between name and frame number
+        padding (int) : frame number padding
+        extension (string) : image extension
+        start (int) : first frame
+        file_size (int) : size of each frame, written sparse
+        gaps (int) : how many frames to leave out
+        strays (int) : how many junk files to drop in alongside
+
+        Returns:
+        list of file names written.
+    """
+    os.makedirs(element_path, exist_ok=True)
+    numbers = list(range(start, start + frames))
+    for frame in rng.sample(numbers[1:-1], min(gaps, max(0, frames - 2))):
+        numbers.remove(frame)
+
+    written = list()
+    for frame in numbers:
+        name = '%s%s%0*d.%s'%(element, separator, padding, frame, extension)
+        with open(os.path.join(element_path, name), 'wb') as f:
+            if file_size:
+                f.truncate(file_size)
+        written.append(name)
+    for stray in rng.sample(STRAY_FILES, min(strays, len(STRAY_FILES))):
+        open(os.path.join(element_path, stray), 'w').close()
+        written.append(stray)
+    return written
+
+
+def make_library(root=None, categories=4, elements=10, frames=100, file_size=0, gaps=0, strays=1, seed=0):
+    """Write a whole library: categories x elements x frames, with mixed padding,
+        separators and extensions and a few stray files
+
+        Arguments:
+        root (string) : where to build it, a new temp dir if not given
+        categories (int) : how many categories
+        elements (int) : elements per category
+        frames (int) : frames per element
+        file_size (int) : size of each frame, written sparse
+        gaps (int) : missing frames per element
+        strays (int) : junk files per element
+        seed (int) : random seed so runs are comparable
+
+        Returns:
+        the library root.
+    """
+    rng = random.Random(seed)
+    if root is None:
+        root = tempfile.mkdtemp(prefix='tinyelements_bench_')
+    for c in range(categories):
+        category = 'category_%02d'%c
+        os.makedirs(os.path.join(root, category, '_thumbnails'), exist_ok=True)
+        for e in range(elements):
+            element = '%s_el_%03d'%(category, e)
+            make_element(os.path.join(root, category, element), element, frames,
+                         separator=rng.choice(SEPARATORS), padding=rng.choice(PADDINGS),
+                         extension=rng.choice(EXTENSIONS), file_size=file_size, gaps=gaps,
+                         strays=strays, rng=rng)
+    return root
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build a synthetic element library.')
+    parser.add_argument('root', nargs='?')
+    parser.add_argument('--categories', type=int, default=4)
+    parser.add_argument('--elements', type=int, default=10)
+    parser.add_argument('--frames', type=int, default=100)
+    parser.add_argument('--file-size', type=int, default=0)
+    parser.add_argument('--gaps', type=int, default=0)
+    parser.add_argument('--strays', type=int, default=1)
+    args = parser.parse_args()
+    print(make_library(args.root, args.categories, args.elements, args.frames, args.file_size, args.gaps, args.strays))
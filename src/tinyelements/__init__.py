@@ -1,2 +1,14 @@
-from tinyelements.tinyelements_ui import TinyElements_Library
-from tinyelements.tinyelements_helpers import write_data_json, make_centering_transform, copy_read_to_show
\ No newline at end of file
+# The panel and node helpers need nuke (and PySide2), so they're only imported when
+# asked for. That keeps `python -m tinyelements` usable on machines without Nuke.
+NUKE_EXPORTS = {
+    'TinyElements_Library': 'tinyelements.tinyelements_ui',
+    'write_data_json': 'tinyelements.tinyelements_helpers',
+    'make_centering_transform': 'tinyelements.tinyelements_helpers',
+    'copy_read_to_show': 'tinyelements.tinyelements_helpers',
+}
+
+def __getattr__(name):
+    if name in NUKE_EXPORTS:
+        import importlib
+        return getattr(importlib.import_module(NUKE_EXPORTS[name]), name)
+    raise AttributeError("module 'tinyelements' has no attribute %r"%name)
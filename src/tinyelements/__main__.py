@@ -0,0 +1,5 @@
+import sys
+
+from tinyelements.tinyelements_cli import main
+
+sys.exit(main())
@@ -22,4 +22,69 @@ SHOW = 'MyShow' #more like... os.environ['SHOW_NAME']
 SHOW_DIR = os.path.join(PROJ_DIR, SHOW, SHOW_ELEMENTS_SUBPATH)
 
 # if you have ffmpeg somewhere else.. fix it here
-FFMPEG_PATH = 'ffmpeg'
\ No newline at end of file
+FFMPEG_PATH = 'ffmpeg'
+
+# Directories that live alongside elements but aren't elements themselves
+IGNORE_DIRS = ['contactsheet', '_catalogs', 'thumbnails', '_thumbnails']
+
+# Local cache of the library listing so the panel doesn't re-crawl the network every time
+INDEX_PATH = os.path.join(os.path.expanduser('~'), '.tinyelements', 'library_index.db')
+
+# How many directories get listed at once when crawling a library
+CRAWL_WORKERS = 16
+
+# How many frames get copied at once when bringing an element into the show
+COPY_WORKERS = 8
+
+# How many elements get looked up at once when planning a load
+PLAN_WORKERS = 8
+
+# How many ffmpeg thumbnail jobs run at once
+THUMB_WORKERS = 4
+
+# Seconds between checks when watching a library over NFS (local disks use inotify)
+WATCH_POLL_INTERVAL = 5.0
+
+# Set to a file path (or '-' for stderr) to log JSON-lines timings of each load phase
+PROFILE_LOG = os.environ.get('TINYELEMENTS_PROFILE_LOG')
+
+# how many frames go into a thumbnail gif, and how they're picked ('uniform', 'head' or 'keyframe')
+THUMB_SAMPLES = 100
+THUMB_SAMPLING = 'uniform'
+
+# scrub strips - one tiled jpg per preview height, kept in a thumbnails folder in the element
+STRIP_DIR = 'thumbnails'
+STRIP_SIZES = [100, 256]
+STRIP_FRAMES = 32
+
+# decoded previews kept in memory, and how many rows either side of the selection to load ahead
+PREVIEW_CACHE_MB = 256
+PREVIEW_WORKERS = 2
+PREVIEW_PREFETCH = 3
+
+# category contact sheets - one small tile per element in a contactsheet folder in the category
+CONTACT_DIR = 'contactsheet'
+CONTACT_TILE = [80, 45]
+CONTACT_COLUMNS = 16
+
+# published per-category catalogs, read by every panel instead of crawling
+CATALOG_DIR = '_catalogs'
+
+# Source Point animation in the sidecar - knobs keyed on more than this fraction of their frames
+# (baked tracks) are simplified to linear keys within SOURCE_POINT_TOLERANCE pixels
+SOURCE_POINT_DENSE = 0.5
+SOURCE_POINT_TOLERANCE = 0.1
+
+# How files get into the show, first that works wins. 'reflink' shares blocks copy-on-write
+# (btrfs, xfs, some NAS), 'hardlink' shares the file itself when the show is on the same
+# filesystem - only add it if nobody edits frames in place - and 'copy' always works
+COPY_STRATEGY = ['reflink', 'copy']
+
+# per-element manifest of frame sizes, mtimes and content hashes. MANIFEST_HASH can be
+# 'xxh3_64' where the xxhash module is installed, several times quicker than blake2b
+MANIFEST_NAME = '.tinyelements_manifest.json'
+MANIFEST_HASH = 'blake2b'
+
+# frames hashed at once when building manifests or verifying - reads are streamed and
+# hashlib lets go of the GIL, so threads keep a file server busy
+HASH_WORKERS = 8
@@ -0,0 +1,89 @@
+import threading
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """Least recently used cache held to a byte budget rather than an entry count,
+        since a Large scrub strip weighs a hundred times what a small gif does.
+        Safe to fill from worker threads.
+
+    Arguments:
+    budget (int) : most bytes to hold before the oldest entries are dropped
+
+    """
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.used = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, default=None):
+        """Look something up, marking it as just used
+
+        Arguments:
+        key : anything hashable
+        default : handed back on a miss
+
+        Returns:
+        the cached value or default.
+        """
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return default
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key][0]
+
+    def put(self, key, value, size):
+        """Add or replace an entry, evicting the least recently used ones to fit
+
+        Arguments:
+        key : anything hashable
+        value : what to keep
+        size (int) : how many bytes it costs
+
+        Returns:
+        bool - False if it's bigger than the whole budget and wasn't kept.
+        """
+        with self.lock:
+            if key in self.entries:
+                self.used -= self.entries.pop(key)[1]
+            if size > self.budget:
+                return False
+            self.entries[key] = (value, size)
+            self.used += size
+            while self.used > self.budget:
+                _, (_, old_size) = self.entries.popitem(last=False)
+                self.used -= old_size
+            return True
+
+    def discard(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.used -= self.entries.pop(key)[1]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.used = 0
+
+    def stats(self):
+        """Hit and miss counts and how full it is
+
+        Returns:
+        dictionary of hits, misses, entries, used and budget.
+        """
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self.entries),
+                    'used': self.used, 'budget': self.budget}
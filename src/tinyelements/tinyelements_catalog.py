@@ -0,0 +1,133 @@
+import os, json, gzip, time
+from concurrent.futures import ThreadPoolExecutor
+
+from tinyelements.globals import CATALOG_DIR, CRAWL_WORKERS, STRIP_DIR
+from tinyelements.tinyelements_crawler import crawl_library
+from tinyelements.tinyelements_files import temp_file
+
+# bump when the element entries change shape, older catalogs are then ignored
+CATALOG_VERSION = 2
+
+# sidecar keys worth carrying in the catalog - source_point (per frame in older sidecars)
+# only matters at load time, when the sidecar itself is read
+SIDECAR_KEYS = ['width', 'height', 'tags', 'start', 'end', 'element_name']
+
+
+def catalog_path(library, category):
+    return os.path.join(library, CATALOG_DIR, category + '.json.gz')
+
+
+def read_catalog(library, category):
+    """Load a category's published catalog
+
+        Arguments:
+        library (string) : path to the library root
+        category (string) : category name
+
+        Returns:
+        catalog dictionary, or None if there isn't a usable one.
+    """
+    try:
+        with gzip.open(catalog_path(library, category), 'rt') as f:
+            catalog = json.load(f)
+    except (OSError, ValueError, EOFError):
+        return None
+    if catalog.get('version') != CATALOG_VERSION or catalog.get('category') != category:
+        return None
+    return catalog
+
+
+def catalog_is_current(catalog, category_mtime):
+    """A catalog is good until the category directory changes after it was crawled
+
+        Arguments:
+        catalog (dict) : from read_catalog
+        category_mtime (float) : mtime of the category directory now
+
+        Returns:
+        bool.
+    """
+    return catalog is not None and category_mtime is not None and catalog['category_mtime'] >= category_mtime
+
+
+def thumb_paths(element_path, element, has_thumb):
+    """Thumbnail files an element has, relative to the element directory"""
+    thumbs = dict()
+    if has_thumb:
+        thumbs['gif'] = element + '.gif'
+    for key, name in [('strip_index', element + '_strip.json'), ('poster', element + '_poster.jpg')]:
+        if os.path.exists(os.path.join(element_path, STRIP_DIR, name)):
+            thumbs[key] = os.path.join(STRIP_DIR, name)
+    return thumbs
+
+
+def catalog_entry(category_path, element):
+    """Everything the catalog holds for one crawled element
+
+        Arguments:
+        category_path (string) : full path to the category directory
+        element (dict) : result of tinyelements_crawler.crawl_element
+
+        Returns:
+        element row dictionary (see tinyelements_index.element_row) plus thumbs and sidecar.
+    """
+    # the index module imports this one, so pull these in late
+    from tinyelements.tinyelements_index import element_row
+    from tinyelements.tinyelements_search import read_sidecar
+
+    entry = element_row(element)
+    element_path = os.path.join(category_path, element['name'])
+    entry['thumbs'] = thumb_paths(element_path, element['name'], element['has_thumb'])
+    sidecar = read_sidecar(element_path, element['name'])
+    entry['sidecar'] = dict((key, sidecar[key]) for key in SIDECAR_KEYS if key in sidecar)
+    return entry
+
+
+def write_catalog(library, category, catalog):
+    """Write a catalog under a temp name and rename it into place, so panels reading
+        it mid-publish get the old one or the new one, never half
+
+        Returns:
+        path written.
+    """
+    path = catalog_path(library, category)
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    handle, temp_path = temp_file(path)
+    try:
+        with os.fdopen(handle, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as f:
+            f.write(json.dumps(catalog, separators=(',', ':')).encode('utf-8'))
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return path
+
+
+def publish_library(library, workers=CRAWL_WORKERS, categories=None):
+    """Crawl a library once and publish a catalog per category into _catalogs, so
+        every panel in the studio can read one file per category instead of
+        crawling it themselves
+
+        Arguments:
+        library (string) : path to the library root
+        workers (int) : how many directories and sidecars to look at at once
+        categories (list) : only publish these categories, defaults to all of them
+
+        Returns:
+        Dictionary of category : {'path', 'elements', 'elapsed'}.
+    """
+    tree = crawl_library(library, workers=workers, categories=categories)
+    published = dict()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for category, category_info in sorted(tree['categories'].items()):
+            if category_info['mtime'] is None:
+                continue
+            start = time.perf_counter()
+            elements = [category_info['elements'][name] for name in sorted(category_info['elements'])]
+            entries = list(pool.map(lambda element: catalog_entry(category_info['path'], element), elements))
+            catalog = {'version': CATALOG_VERSION, 'library': library, 'category': category,
+                       'category_mtime': category_info['mtime'], 'published': time.time(), 'elements': entries}
+            path = write_catalog(library, category, catalog)
+            published[category] = {'path': path, 'elements': len(entries), 'elapsed': time.perf_counter() - start}
+    return published
@@ -0,0 +1,397 @@
+"""Library maintenance without Nuke.
+
+    python -m tinyelements scan [--lib PATH]
+    python -m tinyelements index [--lib PATH ...]
+    python -m tinyelements thumbs [--lib PATH] [--category NAME] [--element NAME ...] [--samples N] [--sampling uniform|head|keyframe]
+    python -m tinyelements publish [--lib PATH] [--category NAME ...]
+    python -m tinyelements sheets [--lib PATH] [--category NAME ...]
+    python -m tinyelements manifest [--lib PATH] [--category NAME ...] [--algorithm xxh3_64] [--rehash]
+    python -m tinyelements verify [--lib PATH] [--category NAME] [--frames [--sizes-only]] [--against PATH]
+    python -m tinyelements copy CATEGORY ELEMENT [ELEMENT ...]
+    python -m tinyelements plan CATEGORY ELEMENT [ELEMENT ...] [--type 'Centered Switch'] [--copy]
+
+Any command takes --timings PATH to log per-phase JSON lines ('-' for stderr)
+and --profile PATH to write a cProfile of the whole run.
+"""
+import os, sys, json, time, argparse
+
+from tinyelements.globals import GLOBAL_DIR, SHOW_DIR, INDEX_PATH, CRAWL_WORKERS, COPY_WORKERS, THUMB_WORKERS, \
+    THUMB_SAMPLES, THUMB_SAMPLING, PLAN_WORKERS, COPY_STRATEGY, HASH_WORKERS, MANIFEST_HASH
+from tinyelements.tinyelements_crawler import crawl_library, slowest_dirs
+from tinyelements.tinyelements_index import get_index
+from tinyelements.tinyelements_planner import plan_load, plan_to_dict
+from tinyelements.tinyelements_copy import copy_element, plan_sync, format_rate, format_strategies
+from tinyelements.tinyelements_sampling import SAMPLING_STRATEGIES
+from tinyelements.tinyelements_verify import audit_library, update_library_manifests, report_problems
+from tinyelements import tinyelements_profiling as profiling
+
+
+def resolve_library(lib):
+    """Let 'global' and 'show' stand in for the paths from globals.py
+
+        Arguments:
+        lib (string) : 'global', 'show' or a path
+
+        Returns:
+        string path.
+    """
+    if lib == 'global':
+        return GLOBAL_DIR
+    if lib == 'show':
+        return SHOW_DIR
+    return lib
+
+
+def print_json(data):
+    print(json.dumps(data, indent=4, default=str))
+
+
+def cmd_scan(args):
+    library = resolve_library(args.lib)
+    tree = crawl_library(library, workers=args.workers, categories=args.category or None)
+
+    summary = {'library': library, 'elapsed': tree['elapsed'], 'categories': dict()}
+    for category, category_info in sorted(tree['categories'].items()):
+        frames = 0
+        for element in category_info['elements'].values():
+            frames += sum(seq['count'] for seq in element['sequences'])
+        summary['categories'][category] = {'elements': len(category_info['elements']), 'frames': frames}
+    summary['slowest'] = slowest_dirs(tree, args.slowest)
+
+    if args.json:
+        print_json(summary)
+        return 0
+
+    for category, info in summary['categories'].items():
+        print('%-30s %6d elements %9d frames'%(category, info['elements'], info['frames']))
+    print('crawled %s in %.2fs'%(library, tree['elapsed']))
+    for path, seconds in summary['slowest']:
+        print('\t%.3fs  %s'%(seconds, path))
+    return 0
+
+
+def cmd_index(args):
+    index = get_index(args.db)
+    for lib in args.lib or ['global', 'show']:
+        library = resolve_library(lib)
+        tree = index.index_library(library, workers=args.workers)
+        count = sum(len(c['elements']) for c in tree['categories'].values())
+        print('indexed %d elements in %d categories of %s in %.2fs'%(count, len(tree['categories']), library, tree['elapsed']))
+    return 0
+
+
+def cmd_publish(args):
+    from tinyelements.tinyelements_catalog import publish_library
+
+    library = resolve_library(args.lib)
+    start = time.perf_counter()
+    published = publish_library(library, workers=args.workers, categories=args.category or None)
+    for category, info in published.items():
+        print('%-30s %6d elements  %s'%(category, info['elements'], info['path']))
+    print('published %d catalogs for %s in %.2fs'%(len(published), library, time.perf_counter() - start))
+    return 0 if published else 1
+
+
+def cmd_thumbs(args):
+    from tinyelements.tinyelements_thumbmaker import ThumbQueue
+
+    library = resolve_library(args.lib)
+    # the thumbnail jobs read through the shared index, point it at the right file
+    get_index(args.db)
+
+    def report(result):
+        line = '%-8s %s/%s'%(result['status'], result['category'], result['element'])
+        if result['error']:
+            line += ' : %s'%result['error']
+        print(line)
+
+    queue = ThumbQueue(workers=args.workers, on_done=report, max_count=args.samples, strategy=args.sampling)
+    if args.element:
+        queue.submit_elements(library, args.category, args.element, force=args.force)
+    elif args.category:
+        queue.submit_category(library, args.category, force=args.force)
+    else:
+        queue.submit_library(library, force=args.force)
+    if not args.no_sheets:
+        queue.submit_sheets(library, [args.category] if args.category else get_index().get_categories(library))
+    results = queue.wait()
+    queue.shutdown()
+
+    failed = [r for r in results if r['status'] == 'failed']
+    print('%d made, %d skipped, %d failed'%(len([r for r in results if r['status'] == 'made']),
+                                          len([r for r in results if r['status'] == 'skipped']), len(failed)))
+    return 1 if failed else 0
+
+
+def cmd_sheets(args):
+    from tinyelements.tinyelements_thumbmaker import make_contact_sheet
+
+    library = resolve_library(args.lib)
+    index = get_index(args.db)
+    status = 0
+    for category in args.category or index.get_categories(library):
+        result = make_contact_sheet(library, category)
+        if result['status'] == 'failed':
+            print('failed   %s : %s'%(category, result['error']))
+            status = 1
+        else:
+            print('%-8s %s (%d elements)'%(result['status'], category, result['count']))
+    return status
+
+
+def element_problems(element):
+    """Anything wrong with a crawled element that would bite at load time
+
+        Arguments:
+        element (dict) : result of tinyelements_crawler.crawl_element
+
+        Returns:
+        list of problem descriptions.
+    """
+    problems = list()
+    if element['mtime'] is None:
+        return ['can not read directory']
+    sequences = [seq for seq in element['sequences'] if seq['frame_format'] != 'None']
+    if not element['sequences']:
+        return ['no images']
+    if len(sequences) > 1:
+        problems.append('%d sequences: %s'%(len(sequences), ', '.join(seq['fname'] for seq in sequences)))
+    for seq in sequences:
+        if seq['missing_frames']:
+            problems.append('%s missing %d frames (first %d)'%(seq['fname'], len(seq['missing_frames']), seq['missing_frames'][0]))
+        if seq['mismatched_files']:
+            problems.append('%s padding mismatch: %s'%(seq['fname'], ', '.join(seq['mismatched_files'][:5])))
+    return problems
+
+
+def cmd_verify(args):
+    library = resolve_library(args.lib)
+    tree = crawl_library(library, workers=args.workers, categories=args.category or None)
+
+    report = dict()
+    for category, category_info in sorted(tree['categories'].items()):
+        for name, element in sorted(category_info['elements'].items()):
+            problems = element_problems(element)
+            if problems:
+                report['%s/%s'%(category, name)] = problems
+
+    if args.frames or args.against:
+        against = resolve_library(args.against) if args.against else None
+        audit, elapsed = audit_library(library, args.category or None, against, not args.sizes_only, args.hash_workers)
+        checked = sum(r.get('bytes', 0) for r in audit.values())
+        for element, element_report in sorted(audit.items()):
+            if 'error' in element_report:
+                problems = [element_report['error']]
+            else:
+                # gaps are in the crawl report already
+                problems = report_problems(dict(element_report, gaps=[]))
+            if problems:
+                report.setdefault(element, []).extend(problems)
+        if not args.json:
+            print('checked %d elements in %.1fs (%s)'%(len(audit), elapsed, format_rate(checked / max(elapsed, 1e-6))))
+
+    if args.json:
+        print_json(report)
+    else:
+        for element, problems in sorted(report.items()):
+            print(element)
+            for problem in problems:
+                print('\t%s'%problem)
+        print('%d elements with problems'%len(report))
+    return 1 if report else 0
+
+
+def cmd_manifest(args):
+    library = resolve_library(args.lib)
+    results, elapsed = update_library_manifests(library, args.category or None, args.algorithm, args.rehash,
+                                                args.workers)
+    status = 0
+    for element, result in sorted(results.items()):
+        if 'error' in result:
+            print('%s : %s'%(element, result['error']))
+            status = 1
+    hashed = sum(r.get('hashed', 0) for r in results.values())
+    hashed_bytes = sum(r.get('bytes', 0) for r in results.values())
+    print('%d elements, hashed %d files (%s) in %.1fs'%(len(results), hashed,
+                                                       format_rate(hashed_bytes / max(elapsed, 1e-6)), elapsed))
+    return status
+
+
+def cmd_copy(args):
+    load_info = dict()
+    load_info['global_lib'] = resolve_library(args.global_lib)
+    load_info['show_lib'] = resolve_library(args.show_lib)
+    load_info['category'] = args.category
+    load_info['copy_workers'] = args.workers
+    load_info['sync_hash'] = args.hash
+    if args.strategy:
+        load_info['copy_strategy'] = args.strategy.split(',')
+
+    status = 0
+    for element in args.element:
+        if args.dry_run:
+            source_folder = os.path.join(load_info['global_lib'], args.category, element)
+            target_folder = os.path.join(load_info['show_lib'], args.category, element)
+            try:
+                sync = plan_sync(source_folder, target_folder, args.workers, args.hash)
+            except (OSError, ValueError) as e:
+                print('%s : %s'%(element, e))
+                status = 1
+                continue
+            print('%s : %d to copy, %d up to date, %d to remove'%(element, len(sync['copy']), len(sync['unchanged']),
+                                                               len(sync['stale'])))
+            continue
+
+        def progress(done, total, bytes_copied, bytes_per_sec, filename):
+            sys.stdout.write('\r%s : %d of %d (%s)   '%(element, done, total, format_rate(bytes_per_sec)))
+            sys.stdout.flush()
+
+        try:
+            with profiling.span('copy', element) as timer:
+                result = copy_element(load_info, element, progress=progress)
+                timer.set(bytes=result['bytes'], files=len(result['copied']))
+        except (OSError, ValueError) as e:
+            print('%s : %s'%(element, e))
+            status = 1
+            continue
+        print('')
+        print('\t%s'%format_strategies(result))
+        for filename, e in result['failed']:
+            print('\tfailed %s : %s'%(filename, e))
+            status = 1
+    return status
+
+
+def cmd_plan(args):
+    load_info = dict()
+    load_info['element_list'] = args.element
+    load_info['type'] = args.type
+    load_info['category'] = args.category
+    load_info['start_frame'] = args.start_frame
+    load_info['copy_to'] = args.copy
+    load_info['global_lib'] = resolve_library(args.global_lib)
+    load_info['show_lib'] = resolve_library(args.show_lib)
+
+    plan = plan_load(load_info, workers=args.workers, index=get_index(args.db))
+    if args.json:
+        print_json(plan_to_dict(plan))
+    else:
+        for element in plan.elements:
+            if element.error is not None:
+                print('%s : %s'%(element.element, element.error))
+                continue
+            size = '%dx%d'%(element.width, element.height) if element.width else 'size unknown'
+            print('%s : %d-%d %s from %s%s'%(element.element, element.start, element.end, size, element.source_dir,
+                                             ', copy to show first' if element.needs_copy else ''))
+        print('planned in %.3fs'%plan.elapsed)
+    return 1 if any(element.error for element in plan.elements) else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m tinyelements', description='Tiny Elements Library maintenance.')
+    # --timings and --profile go before or after the command, given after they win
+    common = argparse.ArgumentParser(add_help=False)
+    for target, default in [(parser, None), (common, argparse.SUPPRESS)]:
+        target.add_argument('--timings', default=default,
+                            help="append per-phase timings as json lines to this file, '-' for stderr")
+        target.add_argument('--profile', default=default, help='write a cProfile of the command to this file')
+    sub = parser.add_subparsers(dest='command')
+    sub.required = True
+
+    scan = sub.add_parser('scan', parents=[common], help='crawl a library and summarise it')
+    scan.add_argument('--lib', default='global', help="'global', 'show' or a path")
+    scan.add_argument('--category', action='append', help='only these categories')
+    scan.add_argument('--workers', type=int, default=CRAWL_WORKERS)
+    scan.add_argument('--slowest', type=int, default=5, help='how many of the slowest directories to list')
+    scan.add_argument('--json', action='store_true')
+    scan.set_defaults(func=cmd_scan)
+
+    index = sub.add_parser('index', parents=[common], help='crawl libraries into the index')
+    index.add_argument('--lib', action='append', help="'global', 'show' or a path, defaults to both")
+    index.add_argument('--db', default=INDEX_PATH)
+    index.add_argument('--workers', type=int, default=CRAWL_WORKERS)
+    index.set_defaults(func=cmd_index)
+
+    publish = sub.add_parser('publish', parents=[common], help='crawl a library and write the shared catalogs panels read from')
+    publish.add_argument('--lib', default='global', help="'global', 'show' or a path")
+    publish.add_argument('--category', action='append', help='only these categories')
+    publish.add_argument('--workers', type=int, default=CRAWL_WORKERS)
+    publish.set_defaults(func=cmd_publish)
+
+    thumbs = sub.add_parser('thumbs', parents=[common], help='build thumbnails that are missing or out of date')
+    thumbs.add_argument('--lib', default='global', help="'global', 'show' or a path")
+    thumbs.add_argument('--category')
+    thumbs.add_argument('--element', nargs='+', help='needs --category')
+    thumbs.add_argument('--force', action='store_true', help='rebuild even if current')
+    thumbs.add_argument('--db', default=INDEX_PATH)
+    thumbs.add_argument('--workers', type=int, default=THUMB_WORKERS)
+    thumbs.add_argument('--samples', type=int, default=THUMB_SAMPLES, help='most frames per gif')
+    thumbs.add_argument('--sampling', choices=SAMPLING_STRATEGIES, default=THUMB_SAMPLING,
+                        help="which frames - evenly spaced, bunched at the start, or the sidecar's keyframes")
+    thumbs.add_argument('--no-sheets', action='store_true', help="don't rebuild the contact sheets afterwards")
+    thumbs.set_defaults(func=cmd_thumbs)
+
+    sheets = sub.add_parser('sheets', parents=[common], help='rebuild category contact sheets from the existing thumbnails')
+    sheets.add_argument('--lib', default='global', help="'global', 'show' or a path")
+    sheets.add_argument('--category', action='append', help='only these categories')
+    sheets.add_argument('--db', default=INDEX_PATH)
+    sheets.set_defaults(func=cmd_sheets)
+
+    verify = sub.add_parser('verify', parents=[common], help='report gaps, padding mismatches, empty elements and damaged frames')
+    verify.add_argument('--lib', default='global', help="'global', 'show' or a path")
+    verify.add_argument('--category', action='append', help='only these categories')
+    verify.add_argument('--workers', type=int, default=CRAWL_WORKERS)
+    verify.add_argument('--frames', action='store_true', help='check frames against the element manifests too')
+    verify.add_argument('--sizes-only', action='store_true', help="with --frames, don't read the frames")
+    verify.add_argument('--against', help="check copies against this library ('global' or a path), implies --frames")
+    verify.add_argument('--hash-workers', type=int, default=HASH_WORKERS)
+    verify.add_argument('--json', action='store_true')
+    verify.set_defaults(func=cmd_verify)
+
+    manifest = sub.add_parser('manifest', parents=[common], help='write or update per-element checksum manifests')
+    manifest.add_argument('--lib', default='global', help="'global', 'show' or a path")
+    manifest.add_argument('--category', action='append', help='only these categories')
+    manifest.add_argument('--algorithm', default=MANIFEST_HASH, help="'blake2b', or 'xxh3_64' with xxhash installed")
+    manifest.add_argument('--rehash', action='store_true', help='hash every file, not just new or changed ones')
+    manifest.add_argument('--workers', type=int, default=HASH_WORKERS)
+    manifest.set_defaults(func=cmd_manifest)
+
+    copy = sub.add_parser('copy', parents=[common], help='copy elements from the global library to the show, or bring copies up to date')
+    copy.add_argument('category')
+    copy.add_argument('element', nargs='+')
+    copy.add_argument('--global-lib', default='global')
+    copy.add_argument('--show-lib', default='show')
+    copy.add_argument('--workers', type=int, default=COPY_WORKERS)
+    copy.add_argument('--strategy', help="comma separated, tried in order, e.g. 'reflink,hardlink,copy' "
+                                         "(defaults to %s)"%','.join(COPY_STRATEGY))
+    copy.add_argument('--hash', action='store_true', help='compare frame content, not just size and mtime')
+    copy.add_argument('--dry-run', action='store_true', help="say what would be copied and removed, don't do it")
+    copy.set_defaults(func=cmd_copy)
+
+    plan = sub.add_parser('plan', parents=[common], help='show what loading elements in nuke would do, without nuke')
+    plan.add_argument('category')
+    plan.add_argument('element', nargs='+')
+    plan.add_argument('--type', default='Standard', help="load type as in the panel, e.g. 'Centered Switch'")
+    plan.add_argument('--start-frame', type=int, default=1001)
+    plan.add_argument('--copy', action='store_true', help='as if Copy To Show was ticked')
+    plan.add_argument('--global-lib', default='global')
+    plan.add_argument('--show-lib', default='show')
+    plan.add_argument('--db', default=INDEX_PATH)
+    plan.add_argument('--workers', type=int, default=PLAN_WORKERS)
+    plan.add_argument('--json', action='store_true')
+    plan.set_defaults(func=cmd_plan)
+
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == 'thumbs' and args.element and not args.category:
+        parser.error('--element needs --category')
+    if args.timings:
+        profiling.enable(args.timings)
+    if args.profile:
+        profiling.profile_next(args.profile)
+        return profiling.capture_profile(args.func)(args)
+    return args.func(args)
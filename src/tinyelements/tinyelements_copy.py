@@ -0,0 +1,664 @@
+import os, shutil, time, threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from tinyelements.globals import COPY_WORKERS, STRIP_DIR, COPY_STRATEGY
+from tinyelements.tinyelements_sequence import find_sequences, longest_sequence, classify_filename
+from tinyelements.tinyelements_crawler import scan_dir
+from tinyelements.tinyelements_manifest import read_manifest, write_manifest, new_manifest, file_entry, content_index, \
+    add_to_content_index, hash_file
+
+CHUNK_SIZE = 64 * 1024 * 1024
+
+# linux ioctl to share a file's blocks copy-on-write, _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+
+
+def make_dirs(target_folder):
+    """Make a directory (and parents) open to everyone, like the rest of the library
+
+        Arguments:
+        target_folder (string) : directory to create
+
+        Returns:
+        None.
+    """
+    # chmod each level made rather than clearing the umask, which is process wide
+    missing = list()
+    folder = os.path.abspath(target_folder)
+    while not os.path.isdir(folder):
+        missing.append(folder)
+        folder = os.path.dirname(folder)
+    for folder in reversed(missing):
+        try:
+            os.mkdir(folder)
+        except FileExistsError:
+            continue
+        os.chmod(folder, 0o777)
+
+
+def kernel_copy(src_fd, dst_fd, size, stop_event=None):
+    """Copy between two open files without pulling the bytes through python.
+        Tries copy_file_range, then sendfile, then falls back to plain reads and writes.
+
+        Arguments:
+        src_fd (int) : source file descriptor
+        dst_fd (int) : destination file descriptor
+        size (int) : number of bytes to copy
+        stop_event (threading.Event) : bail out between chunks when this is set
+
+        Returns:
+        number of bytes copied.
+    """
+    copied = 0
+    for method in ['copy_file_range', 'sendfile']:
+        if not hasattr(os, method):
+            continue
+        try:
+            while copied < size:
+                if stop_event is not None and stop_event.is_set():
+                    return copied
+                count = min(CHUNK_SIZE, size - copied)
+                if method == 'copy_file_range':
+                    sent = os.copy_file_range(src_fd, dst_fd, count)
+                else:
+                    sent = os.sendfile(dst_fd, src_fd, copied, count)
+                if sent == 0:
+                    # some fuse and network mounts say 0 rather than not supported
+                    break
+                copied += sent
+            if copied == size:
+                return copied
+        except OSError:
+            pass
+        # not supported between these filesystems - start over with the next method
+        os.lseek(src_fd, 0, os.SEEK_SET)
+        os.lseek(dst_fd, 0, os.SEEK_SET)
+        os.ftruncate(dst_fd, 0)
+        copied = 0
+
+    while copied < size:
+        if stop_event is not None and stop_event.is_set():
+            return copied
+        data = os.read(src_fd, min(CHUNK_SIZE, size - copied))
+        if not data:
+            break
+        view = memoryview(data)
+        while view:
+            written = os.write(dst_fd, view)
+            view = view[written:]
+            copied += written
+    return copied
+
+
+def copy_file(src, dst, stop_event=None):
+    """Copy a single file, keeping its permission bits the way shutil.copy does
+
+        Arguments:
+        src (string) : source file path
+        dst (string) : destination file path (not a directory)
+        stop_event (threading.Event) : bail out between chunks when this is set
+
+        Returns:
+        number of bytes copied.
+    """
+    size = os.stat(src).st_size
+    src_fd = os.open(src, os.O_RDONLY)
+    try:
+        dst_fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+        try:
+            copied = kernel_copy(src_fd, dst_fd, size, stop_event)
+        finally:
+            os.close(dst_fd)
+    finally:
+        os.close(src_fd)
+
+    if copied < size:
+        # cancelled part way through, don't leave a short frame behind
+        os.remove(dst)
+    else:
+        shutil.copymode(src, dst)
+    return copied
+
+
+def reflink_file(src, dst):
+    """Clone a file's blocks into a new file, no data moves. Raises OSError where the
+        filesystem (or the platform) can't.
+
+        Arguments:
+        src (string) : source file path
+        dst (string) : destination file path
+
+        Returns:
+        number of bytes the file holds.
+    """
+    if fcntl is None:
+        raise OSError('no reflinks on this platform')
+    src_fd = os.open(src, os.O_RDONLY)
+    try:
+        dst_fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+        try:
+            fcntl.ioctl(dst_fd, FICLONE, src_fd)
+        except OSError:
+            os.close(dst_fd)
+            dst_fd = None
+            os.remove(dst)
+            raise
+        finally:
+            if dst_fd is not None:
+                os.close(dst_fd)
+        size = os.fstat(src_fd).st_size
+    finally:
+        os.close(src_fd)
+    shutil.copymode(src, dst)
+    return size
+
+
+def link_file(src, dst):
+    """Hardlink dst to src. Raises OSError across filesystems.
+
+        Arguments:
+        src (string) : source file path
+        dst (string) : destination file path
+
+        Returns:
+        number of bytes the file holds.
+    """
+    if os.lstat(src).st_dev != os.stat(os.path.dirname(dst) or '.').st_dev:
+        raise OSError('%s is on another filesystem'%src)
+    os.link(src, dst)
+    return os.stat(dst).st_size
+
+
+def place_file(src, dst, stop_event=None, strategies=COPY_STRATEGY):
+    """Get a file to dst the cheapest way the filesystem allows, trying each strategy in turn
+
+        Arguments:
+        src (string) : source file path
+        dst (string) : destination file path (not a directory)
+        stop_event (threading.Event) : bail out of a real copy between chunks when this is set
+        strategies (list) : any of 'reflink', 'hardlink' and 'copy', in order of preference
+
+        Returns:
+        (bytes, strategy used) tuple.
+    """
+    if os.path.lexists(dst):
+        # dst already is src (a hardlink, or src was found in dst's own folder) - removing it
+        # would lose the only copy
+        if os.path.exists(src) and os.path.samefile(src, dst):
+            return os.stat(dst).st_size, 'hardlink'
+        # never write through an old dst, it may be a hardlink into the global library
+        os.remove(dst)
+    for strategy in strategies:
+        try:
+            if strategy == 'reflink':
+                return reflink_file(src, dst), strategy
+            if strategy == 'hardlink':
+                return link_file(src, dst), strategy
+        except OSError:
+            continue
+    return copy_file(src, dst, stop_event), 'copy'
+
+
+def copy_files(source_folder, target_folder, file_list, workers=COPY_WORKERS, progress=None, is_cancelled=None,
+               strategies=COPY_STRATEGY, sources=None):
+    """Copy a list of files from one folder to another over a pool of workers.
+        The target folder is made once up front. Progress is reported from the
+        calling thread so it's safe to drive UI from the callback.
+
+        Arguments:
+        source_folder (string) : where the files are now
+        target_folder (string) : where they're going
+        file_list (list) : file names inside source_folder
+        workers (int) : how many files to copy at once
+        progress (function) : called as progress(done, total, bytes_copied, bytes_per_sec, filename)
+        is_cancelled (function) : returns True when the copy should stop
+        strategies (list) : see place_file
+        sources (dict) : file name : path of an identical file to take it from instead,
+                         one already in the show say
+
+        Returns:
+        Dictionary containing:
+                result['copied'] : file names that made it over
+                result['failed'] : (file name, error) tuples, short copies included
+                result['bytes'] : total bytes copied
+                result['elapsed'] : seconds taken
+                result['cancelled'] : whether it was stopped early
+                result['strategies'] : {strategy : file count}
+                result['source_stats'] : {file name : {'size', 'mtime'}} of the source_folder files
+    """
+    make_dirs(target_folder)
+    if sources is None:
+        sources = dict()
+
+    result = {'copied': [], 'failed': [], 'bytes': 0, 'elapsed': 0.0, 'cancelled': False,
+              'strategies': dict(), 'source_stats': dict()}
+    stop_event = threading.Event()
+    start = time.perf_counter()
+    total = len(file_list)
+
+    def copy_one(filename):
+        if stop_event.is_set():
+            return 0, False, None
+        stat = os.stat(os.path.join(source_folder, filename))
+        result['source_stats'][filename] = {'size': stat.st_size, 'mtime': stat.st_mtime}
+        src = os.path.join(source_folder, filename)
+        dst = os.path.join(target_folder, filename)
+        if filename in sources and os.path.realpath(sources[filename]) != os.path.realpath(dst):
+            src = sources[filename]
+        copied, strategy = place_file(src, dst, stop_event, strategies)
+        if copied != stat.st_size and not stop_event.is_set():
+            # the source changed size under us, or the copy came up short - don't keep half a frame
+            if os.path.lexists(dst):
+                os.remove(dst)
+            raise OSError('copied %d of %d bytes'%(copied, stat.st_size))
+        return copied, copied == stat.st_size, strategy
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        jobs = dict((pool.submit(copy_one, filename), filename) for filename in file_list)
+        for done, job in enumerate(as_completed(jobs)):
+            if job.cancelled():
+                continue
+            filename = jobs[job]
+            try:
+                copied, complete, strategy = job.result()
+                result['bytes'] += copied
+                if complete:
+                    result['copied'].append(filename)
+                    result['strategies'][strategy] = result['strategies'].get(strategy, 0) + 1
+            except OSError as e:
+                result['failed'].append((filename, e))
+
+            elapsed = time.perf_counter() - start
+            if progress is not None:
+                progress(done + 1, total, result['bytes'], result['bytes'] / max(elapsed, 1e-6), filename)
+
+            if not stop_event.is_set() and is_cancelled is not None and is_cancelled():
+                stop_event.set()
+                result['cancelled'] = True
+                for pending in jobs:
+                    pending.cancel()
+
+    result['elapsed'] = time.perf_counter() - start
+    return result
+
+
+def element_copy_list(dir_list):
+    """Work out which files make up an element: the longest sequence plus anything
+        riding along with the same name (sidecar json, gif)
+
+        Arguments:
+        dir_list (list) : the file names in the element directory
+
+        Returns:
+        (sequence info, list of file names) tuple.
+    """
+    seq = longest_sequence(find_sequences(dir_list))
+    seq_files = set(seq['files'])
+    file_list = seq['files'] + [f for f in dir_list if os.path.splitext(f)[0] == seq['name'] and f not in seq_files]
+    return seq, file_list
+
+
+def shared_sources(source_folder, target_library, file_list, source_manifest=None, target_folder=None, present=None):
+    """Find files already in the target library with the same content as ones about to be
+        copied, going by the hashes in the manifests, so they can be linked or copied
+        locally instead of pulled across from the global library. Files in the element's
+        own target folder don't count, they're the ones about to be replaced.
+
+        Arguments:
+        source_folder (string) : element directory being copied
+        target_library (string) : library root it's going into
+        file_list (list) : file names being copied
+        source_manifest (dict) : the source element's manifest, read if not given
+        target_folder (string) : where the element is going
+        present (dict) : content_index of the target library, built if not given
+
+        Returns:
+        dictionary of file name : path of the same content in the target library.
+    """
+    if source_manifest is None:
+        source_manifest = read_manifest(source_folder)
+    if source_manifest is None:
+        return dict()
+
+    wanted = dict()
+    for filename in file_list:
+        entry = source_manifest['files'].get(filename)
+        if entry is None or not entry.get('hash'):
+            continue
+        try:
+            stat = os.stat(os.path.join(source_folder, filename))
+        except OSError:
+            continue
+        # a hash is only good while the file is as it was when hashed
+        if stat.st_size == entry['size'] and stat.st_mtime == entry['mtime']:
+            wanted[filename] = (source_manifest['algorithm'], entry['hash'])
+    if not wanted:
+        return dict()
+
+    if present is None:
+        present = content_index(target_library)
+    own_folder = os.path.realpath(target_folder) if target_folder else None
+    sources = dict()
+    for filename, key in wanted.items():
+        if key not in present:
+            continue
+        path, size, mtime = present[key]
+        if own_folder is not None and os.path.dirname(os.path.realpath(path)) == own_folder:
+            continue
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        # same rule as the source side, a show frame edited since it was hashed isn't a match
+        if stat.st_size == size and stat.st_mtime == mtime:
+            sources[filename] = path
+    return sources
+
+
+def stat_files(folder, file_list, workers=COPY_WORKERS):
+    """Size and mtime of a list of files, stat'd over a pool so network round trips overlap
+
+        Arguments:
+        folder (string) : where the files are
+        file_list (list) : file names
+        workers (int) : how many to stat at once
+
+        Returns:
+        dictionary of file name : {'size', 'mtime'}, files that aren't there are left out.
+    """
+    def stat_one(filename):
+        try:
+            stat = os.stat(os.path.join(folder, filename))
+        except OSError:
+            return filename, None
+        return filename, {'size': stat.st_size, 'mtime': stat.st_mtime}
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        return dict((f, stat) for f, stat in pool.map(stat_one, file_list) if stat is not None)
+
+
+def current_hash(folder, filename, entry, stat):
+    """Hash for a file, from its manifest entry while that still matches the file"""
+    if entry and entry.get('hash') and entry['size'] == stat['size'] and entry['mtime'] == stat['mtime']:
+        return entry['hash']
+    return hash_file(os.path.join(folder, filename))
+
+
+def plan_sync(source_folder, target_folder, workers=COPY_WORKERS, use_hash=False, source_manifest=None):
+    """Work out what it takes to bring a show copy up to date with the global element,
+        rsync style. A file is left alone when the source still has the size and mtime it
+        had when it was copied and the copy hasn't been touched since; copies made before
+        there were manifests count as current when the size matches and the copy is newer.
+        With use_hash, files that look current are checked by content as well. The sidecar
+        and gif are only copied when the show doesn't have its own, and only frames an
+        earlier copy put there (going by the show manifest) are ever removed.
+
+        Arguments:
+        source_folder (string) : global element directory
+        target_folder (string) : show element directory, doesn't have to exist
+        workers (int) : how many files to look at at once
+        use_hash (bool) : compare content hashes too
+        source_manifest (dict) : the source element's manifest, read if not given
+
+        Returns:
+        Dictionary containing:
+                sync['seq'] : the source's sequence info
+                sync['file_list'] : every file the element should have
+                sync['copy'] : file names that are new or changed
+                sync['unchanged'] : file names already up to date
+                sync['kept'] : sidecar and gif the show has its own of
+                sync['stale'] : frames an earlier copy made that the source no longer has
+                sync['source_stats'] : {file name : {'size', 'mtime'}} for the source
+                sync['hashes'] : {file name : hash} of source files hashed along the way
+    """
+    seq, file_list = element_copy_list(os.listdir(source_folder))
+    if source_manifest is None:
+        source_manifest = read_manifest(source_folder)
+    source_entries = source_manifest['files'] if source_manifest else dict()
+
+    try:
+        _, target_files = scan_dir(target_folder)
+    except OSError:
+        target_files = []
+    target_manifest = read_manifest(target_folder)
+    target_entries = target_manifest['files'] if target_manifest else dict()
+
+    file_set = set(file_list)
+    present = [f for f in target_files if f in file_set]
+    source_stats = stat_files(source_folder, file_list, workers)
+    target_stats = stat_files(target_folder, present, workers)
+
+    sync = {'seq': seq, 'file_list': file_list, 'copy': [], 'unchanged': [], 'kept': [], 'source_stats': source_stats,
+            'hashes': dict()}
+    # the show's own sidecar, gif, strips and manifest are never stale - only images a copy recorded
+    sync['stale'] = [f for f in target_files if f not in file_set and f in target_entries and
+                     classify_filename(f) is not None]
+
+    frames = set(seq['files'])
+    maybe_current = list()
+    for filename in file_list:
+        source, target = source_stats.get(filename), target_stats.get(filename)
+        if filename not in frames and target is not None:
+            # sidecar edits (Source Point) happen in the show, don't sync over them
+            sync['kept'].append(filename)
+            continue
+        entry = target_entries.get(filename)
+        if source is None or target is None:
+            current = False
+        elif entry is not None and 'source_size' in entry:
+            current = (entry['source_size'] == source['size'] and entry['source_mtime'] == source['mtime'] and
+                       entry['size'] == target['size'] and entry['mtime'] == target['mtime'])
+        else:
+            current = target['size'] == source['size'] and target['mtime'] >= source['mtime']
+        if current:
+            maybe_current.append(filename)
+        else:
+            sync['copy'].append(filename)
+
+    if use_hash and maybe_current:
+        def compare(filename):
+            source_hash = current_hash(source_folder, filename, source_entries.get(filename), source_stats[filename])
+            target_hash = current_hash(target_folder, filename, target_entries.get(filename), target_stats[filename])
+            return filename, source_hash, source_hash == target_hash
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            for filename, source_hash, same in pool.map(compare, maybe_current):
+                sync['hashes'][filename] = source_hash
+                (sync['unchanged'] if same else sync['copy']).append(filename)
+        sync['copy'].sort()
+        sync['unchanged'].sort()
+    else:
+        sync['unchanged'] = maybe_current
+    return sync
+
+
+def remove_stale(target_folder, stale):
+    """Delete files the source element no longer has
+
+        Returns:
+        list of file names removed.
+    """
+    removed = list()
+    for filename in stale:
+        try:
+            os.remove(os.path.join(target_folder, filename))
+            removed.append(filename)
+        except OSError as e:
+            print('could not remove %s : %s'%(filename, e))
+    return removed
+
+
+def record_copy(target_folder, element, result, source_manifest=None, sync=None):
+    """Write the manifest for a copy: each file that made it over, with the source's size
+        and mtime at the time and the hash the source manifest had for it. Files a sync
+        found already current get an entry if they were missing one, removed files are
+        dropped and files that didn't make it are listed as pending. Written after cancelled
+        copies too, so the next sync picks up from where this one stopped.
+
+        Arguments:
+        target_folder (string) : the copied element directory
+        element (string) : Name of the element
+        result (dict) : from copy_files
+        source_manifest (dict) : the source element's manifest, if it has one
+        sync (dict) : from plan_sync, if the copy was a sync
+
+        Returns:
+        the manifest dictionary.
+    """
+    manifest = read_manifest(target_folder)
+    if manifest is None or (source_manifest and manifest['algorithm'] != source_manifest['algorithm']):
+        manifest = new_manifest(element, source_manifest['algorithm']) if source_manifest else new_manifest(element)
+    source_files = source_manifest['files'] if source_manifest else dict()
+    hashes = sync['hashes'] if sync else dict()
+
+    def entry_for(filename):
+        source = result['source_stats'][filename]
+        known = source_files.get(filename, {})
+        digest = hashes.get(filename)
+        if digest is None and known.get('size') == source['size'] and known.get('mtime') == source['mtime']:
+            digest = known.get('hash')
+        return file_entry(os.path.join(target_folder, filename), digest, source)
+
+    for filename in result['copied']:
+        manifest['files'][filename] = entry_for(filename)
+    if sync is not None:
+        for filename in sync['unchanged']:
+            if 'source_size' not in manifest['files'].get(filename, {}):
+                manifest['files'][filename] = entry_for(filename)
+        for filename in result.get('removed', []):
+            manifest['files'].pop(filename, None)
+        # what a cancelled or failed copy didn't get to, so a verify can tell the element is short
+        manifest['pending'] = sorted(set(sync['file_list']).difference(manifest['files'], sync['kept']))
+    write_manifest(target_folder, manifest)
+    return manifest
+
+
+def copy_element(load_info, element, progress=None, is_cancelled=None):
+    """Bring an element from the global lib into the show lib, thumbnail included. Only
+        frames that are new or changed since the last copy go over (see plan_sync), and
+        frames the global element no longer has are removed. Frames the show already has
+        elsewhere (by content hash) are taken from there, and each file goes over by
+        reflink, hardlink or copy as COPY_STRATEGY allows. A cancelled copy leaves only
+        whole frames behind and the next one carries on. No UI in here, so it runs the
+        same in Nuke or from the command line.
+
+        Arguments:
+        load_info (dict) : needs global_lib, show_lib, category and optionally copy_workers,
+                           copy_strategy and sync_hash (compare content, not just size and mtime).
+                           The show library's content_index is kept in it, so pass the same
+                           dictionary for every element in a load
+        element (string) : Name of the element
+        progress (function) : see copy_files
+        is_cancelled (function) : see copy_files
+
+        Returns:
+        copy_files result dictionary, plus:
+                result['file_list'] : every file the element has
+                result['target_folder'] : where it went
+                result['shared'] : file names taken from content already in the show
+                result['unchanged'] : file names that were already up to date
+                result['removed'] : stale file names deleted from the show copy
+    """
+    source_folder = os.path.join(load_info['global_lib'], load_info['category'], element)
+    target_folder = os.path.join(load_info['show_lib'], load_info['category'], element)
+    strategies = load_info.get('copy_strategy', COPY_STRATEGY)
+    workers = load_info.get('copy_workers', COPY_WORKERS)
+
+    source_manifest = read_manifest(source_folder)
+    sync = plan_sync(source_folder, target_folder, workers, load_info.get('sync_hash', False), source_manifest)
+    present = None
+    if sync['copy']:
+        # read the show manifests once per load, not once per element
+        present = load_info.get('content_index')
+        if present is None:
+            present = load_info['content_index'] = content_index(load_info['show_lib'])
+    sources = shared_sources(source_folder, load_info['show_lib'], sync['copy'], source_manifest, target_folder,
+                             present)
+
+    result = copy_files(source_folder, target_folder, sync['copy'], workers=workers, progress=progress,
+                        is_cancelled=is_cancelled, strategies=strategies, sources=sources)
+    result['source_stats'] = dict(sync['source_stats'], **result['source_stats'])
+    result['file_list'] = sync['file_list']
+    result['target_folder'] = target_folder
+    result['shared'] = sorted(set(sources).intersection(result['copied']))
+    result['unchanged'] = sync['unchanged']
+    result['removed'] = [] if result['cancelled'] else remove_stale(target_folder, sync['stale'])
+    if result['copied'] or result['removed'] or sync['unchanged']:
+        manifest = record_copy(target_folder, element, result, source_manifest, sync)
+        if present is not None:
+            add_to_content_index(present, target_folder, manifest)
+
+    # scrub strips live in their own folder in the element
+    strip_folder = os.path.join(source_folder, STRIP_DIR)
+    if os.path.isdir(strip_folder) and not result['cancelled']:
+        copy_files(strip_folder, os.path.join(target_folder, STRIP_DIR), os.listdir(strip_folder), strategies=strategies)
+
+    try:
+        t_global_path = os.path.join(load_info['global_lib'], load_info['category'], '_thumbnails')
+        t_show_path = os.path.join(load_info['show_lib'], load_info['category'], '_thumbnails')
+        make_dirs(t_show_path)
+        shutil.copy(os.path.join(t_global_path, sync['seq']['name']+'.gif'), t_show_path)
+    except OSError:
+        print('had trouble with the thumbnail')
+
+    return result
+
+
+def element_needs_sync(load_info, element, use_hash=False):
+    """Whether the show copy of an element is missing or behind the global one
+
+        Arguments:
+        load_info (dict) : needs global_lib, show_lib and category
+        element (string) : Name of the element
+        use_hash (bool) : compare content hashes too
+
+        Returns:
+        bool, False when there's no global element to sync from.
+    """
+    source_folder = os.path.join(load_info['global_lib'], load_info['category'], element)
+    target_folder = os.path.join(load_info['show_lib'], load_info['category'], element)
+    try:
+        sync = plan_sync(source_folder, target_folder, load_info.get('copy_workers', COPY_WORKERS), use_hash)
+    except (OSError, ValueError):
+        return False
+    return bool(sync['copy'] or sync['stale'])
+
+
+def format_rate(bytes_per_sec):
+    """Human readable transfer rate
+
+        Arguments:
+        bytes_per_sec (float) : the rate
+
+        Returns:
+        string like '212.4 MB/s'.
+    """
+    for unit in ['B', 'KB', 'MB']:
+        if bytes_per_sec < 1024.0:
+            return '%.1f %s/s'%(bytes_per_sec, unit)
+        bytes_per_sec /= 1024.0
+    return '%.1f GB/s'%bytes_per_sec
+
+
+def format_strategies(result):
+    """How the files of a copy got there, e.g. '120 reflink, 4 copy, 30 already in show, 900 up to date'
+
+        Arguments:
+        result (dict) : from copy_element or copy_files
+
+        Returns:
+        string.
+    """
+    parts = ['%d %s'%(count, strategy) for strategy, count in sorted(result['strategies'].items())]
+    if result.get('shared'):
+        parts.append('%d already in show'%len(result['shared']))
+    if result.get('unchanged'):
+        parts.append('%d up to date'%len(result['unchanged']))
+    if result.get('removed'):
+        parts.append('%d removed'%len(result['removed']))
+    return ', '.join(parts) or 'nothing copied'
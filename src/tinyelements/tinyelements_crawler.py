@@ -0,0 +1,186 @@
+import os, time
+from concurrent.futures import ThreadPoolExecutor
+
+from tinyelements.globals import IGNORE_DIRS, CRAWL_WORKERS
+from tinyelements.tinyelements_sequence import find_sequences, longest_sequence
+from tinyelements.tinyelements_metadata import read_image_header
+
+
+def scan_dir(dir_path):
+    """List a directory once with scandir, splitting it into directories and files
+        using the dirent type so there's no extra stat per entry.
+
+        Arguments:
+        dir_path (string) : the path to list
+
+        Returns:
+        (dirs, files) tuple of sorted name lists, IGNORE_DIRS left out of dirs.
+    """
+    dirs = list()
+    files = list()
+    with os.scandir(dir_path) as it:
+        for entry in it:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                continue
+            if is_dir:
+                if entry.name not in IGNORE_DIRS:
+                    dirs.append(entry.name)
+            else:
+                files.append(entry.name)
+    dirs.sort()
+    files.sort()
+    return dirs, files
+
+
+def element_metadata(element_path, sequences):
+    """Header info for an element, read off one frame of its longest sequence
+
+        Arguments:
+        element_path (string) : full path to the element directory
+        sequences (list) : sequence dictionaries from find_sequences
+
+        Returns:
+        dictionary from tinyelements_metadata.read_image_header, or None if there
+        are no images or the header can't be read.
+    """
+    if not sequences:
+        return None
+    seq = longest_sequence(sequences)
+    try:
+        return read_image_header(os.path.join(element_path, seq['files'][0]))
+    except (OSError, ValueError):
+        return None
+
+
+def crawl_element(element_path, element, read_headers=True):
+    """Look at one element directory: its files, sequences, thumbnail and the
+        header of its first frame
+
+        Arguments:
+        element_path (string) : full path to the element directory
+        element (string) : Name of the element
+        read_headers (bool) : read image metadata too, costs one small read per element
+
+        Returns:
+        Dictionary containing:
+                info['name'] : element name
+                info['path'] : element directory
+                info['mtime'] : mtime of the element directory (None if unreadable)
+                info['sequences'] : every sequence from find_sequences
+                info['has_thumb'] : whether <element>.gif is in there
+                info['metadata'] : from element_metadata, None when not read
+                info['elapsed'] : seconds spent on this directory
+    """
+    start = time.perf_counter()
+    info = dict()
+    info['name'] = element
+    info['path'] = element_path
+    try:
+        # stat before listing so a change during the listing still looks stale next time
+        info['mtime'] = os.stat(element_path).st_mtime
+        _, files = scan_dir(element_path)
+    except OSError:
+        info['mtime'] = None
+        files = []
+    info['sequences'] = find_sequences(files)
+    info['has_thumb'] = element + '.gif' in files
+    info['metadata'] = element_metadata(element_path, info['sequences']) if read_headers else None
+    info['elapsed'] = time.perf_counter() - start
+    return info
+
+
+def crawl_category(category_path):
+    """List the elements in a category
+
+        Arguments:
+        category_path (string) : full path to the category directory
+
+        Returns:
+        (element names, mtime, seconds elapsed) tuple.
+    """
+    start = time.perf_counter()
+    try:
+        mtime = os.stat(category_path).st_mtime
+        elements, _ = scan_dir(category_path)
+    except OSError:
+        mtime = None
+        elements = []
+    return elements, mtime, time.perf_counter() - start
+
+
+def crawl_library(library, workers=CRAWL_WORKERS, categories=None):
+    """Walk a whole library in one call. Categories and elements are spread over a
+        bounded thread pool so the network round trips overlap.
+
+        Arguments:
+        library (string) : path to the library root
+        workers (int) : how many directories to look at at once
+        categories (list) : only crawl these categories, defaults to all of them
+
+        Returns:
+        Dictionary containing:
+                tree['library'] : the library root
+                tree['mtime'] : mtime of the library root
+                tree['categories'] : {category : {'path', 'mtime', 'elements' : {name : crawl_element info}}}
+                tree['timings'] : {directory path : seconds spent listing it}
+                tree['elapsed'] : seconds for the whole crawl
+    """
+    start = time.perf_counter()
+    tree = dict()
+    tree['library'] = library
+    tree['categories'] = dict()
+    tree['timings'] = dict()
+
+    try:
+        tree['mtime'] = os.stat(library).st_mtime
+        all_categories, _ = scan_dir(library)
+    except OSError:
+        print('Can not find directory at %s'%library)
+        tree['mtime'] = None
+        all_categories = []
+    tree['timings'][library] = time.perf_counter() - start
+
+    if categories is None:
+        categories = all_categories
+    else:
+        categories = [c for c in categories if c in all_categories]
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        category_jobs = dict()
+        for category in categories:
+            category_path = os.path.join(library, category)
+            category_jobs[category] = pool.submit(crawl_category, category_path)
+
+        element_jobs = list()
+        for category in categories:
+            category_path = os.path.join(library, category)
+            elements, mtime, elapsed = category_jobs[category].result()
+            tree['timings'][category_path] = elapsed
+            tree['categories'][category] = {'path': category_path, 'mtime': mtime, 'elements': dict()}
+            for element in elements:
+                job = pool.submit(crawl_element, os.path.join(category_path, element), element)
+                element_jobs.append((category, job))
+
+        for category, job in element_jobs:
+            info = job.result()
+            tree['categories'][category]['elements'][info['name']] = info
+            tree['timings'][info['path']] = info['elapsed']
+
+    tree['elapsed'] = time.perf_counter() - start
+    return tree
+
+
+def slowest_dirs(tree, count=10):
+    """The directories that took the longest to look at in a crawl
+
+        Arguments:
+        tree (dict) : result of crawl_library
+        count (int) : how many to return
+
+        Returns:
+        list of (path, seconds) tuples, slowest first.
+    """
+    timings = sorted(tree['timings'].items(), key=lambda t: t[1], reverse=True)
+    return timings[:count]
@@ -0,0 +1,286 @@
+from bisect import bisect_right
+
+from tinyelements.globals import SOURCE_POINT_TOLERANCE
+
+# Source Point animation in a sidecar is {'curves': [x keys, y keys]}. A key is
+# [frame, value], linear to the next key, or [frame, value, interpolation, lslope, rslope]
+# as read off a nuke curve. Older sidecars hold {frame: [x, y]} for every frame, and are
+# turned into keys when read.
+
+LINEAR = 'linear'
+CONSTANT = 'constant'
+
+
+def static_source_point(x, y):
+    """Source Point that doesn't move
+
+        Arguments:
+        x (float) : x position
+        y (float) : y position
+
+        Returns:
+        source point dictionary.
+    """
+    return {'curves': [[[0, x]], [[0, y]]]}
+
+
+def is_animated(source_point):
+    return any(len(curve) > 1 for curve in source_point['curves'])
+
+
+def simplify_indices(frames, xs, ys, tolerance=SOURCE_POINT_TOLERANCE):
+    """Which samples to keep so straight lines between them stay within tolerance of
+        every sample dropped (Ramer-Douglas-Peucker, measured along the frame axis
+        since that's how the curve gets evaluated)
+
+        Arguments:
+        frames (list) : frame numbers, ascending
+        xs (list) : x value at each frame
+        ys (list) : y value at each frame
+        tolerance (float) : most either value may drift, in pixels
+
+        Returns:
+        sorted list of indices to keep, first and last always included.
+    """
+    count = len(frames)
+    if count < 3:
+        return list(range(count))
+
+    keep = [False] * count
+    keep[0] = keep[-1] = True
+    # explicit stack, a long noisy track would blow the recursion limit
+    stack = [(0, count - 1)]
+    while stack:
+        first, last = stack.pop()
+        span = float(frames[last] - frames[first])
+        worst, worst_error = None, tolerance
+        for i in range(first + 1, last):
+            t = (frames[i] - frames[first]) / span
+            error = max(abs(xs[first] + (xs[last] - xs[first]) * t - xs[i]),
+                        abs(ys[first] + (ys[last] - ys[first]) * t - ys[i]))
+            if error > worst_error:
+                worst, worst_error = i, error
+        if worst is not None:
+            keep[worst] = True
+            stack.append((first, worst))
+            stack.append((worst, last))
+    return [i for i in range(count) if keep[i]]
+
+
+def simplify_samples(samples, tolerance=SOURCE_POINT_TOLERANCE):
+    """Turn per-frame samples into linear keys within tolerance
+
+        Arguments:
+        samples (dict) : {frame : [x, y]}, frame keys can be strings as json leaves them
+        tolerance (float) : most either value may drift, in pixels
+
+        Returns:
+        source point dictionary.
+    """
+    frames = sorted(samples, key=float)
+    if not frames:
+        raise ValueError('no source point samples')
+    xs = [float(samples[f][0]) for f in frames]
+    ys = [float(samples[f][1]) for f in frames]
+    numbers = [float(f) for f in frames]
+    if len(frames) == 1:
+        return static_source_point(xs[0], ys[0])
+    kept = simplify_indices(numbers, xs, ys, tolerance)
+    return {'curves': [[[numbers[i], xs[i]] for i in kept], [[numbers[i], ys[i]] for i in kept]]}
+
+
+def read_source_point(data, tolerance=SOURCE_POINT_TOLERANCE):
+    """Source Point as keys, whichever way the sidecar stored it
+
+        Arguments:
+        data (dict) : the sidecar's source_point
+        tolerance (float) : how closely per-frame data from older sidecars is followed
+
+        Returns:
+        source point dictionary.
+    """
+    if 'curves' in data:
+        return data
+    return simplify_samples(data, tolerance)
+
+
+def key_frames(source_point):
+    """Every frame with a key on either curve
+
+        Returns:
+        sorted list of frame numbers.
+    """
+    return sorted(set(key[0] for curve in source_point['curves'] for key in curve))
+
+
+def curve_value(curve, frame):
+    """Evaluate one curve at a frame. Keys hold their value outside the keyed range,
+        as nuke curves do by default.
+
+        Arguments:
+        curve (list) : keys, ascending by frame
+        frame (float) : where to evaluate
+
+        Returns:
+        float.
+    """
+    i = bisect_right([key[0] for key in curve], frame) - 1
+    if i < 0:
+        return curve[0][1]
+    if i >= len(curve) - 1:
+        return curve[-1][1]
+
+    left, right = curve[i], curve[i + 1]
+    dt = float(right[0] - left[0])
+    t = (frame - left[0]) / dt
+    left_interp = left[2] if len(left) > 2 else LINEAR
+    right_interp = right[2] if len(right) > 2 else LINEAR
+    if left_interp == CONSTANT:
+        return left[1]
+    if left_interp == LINEAR and right_interp == LINEAR:
+        return left[1] + (right[1] - left[1]) * t
+
+    # cubic hermite on the slopes nuke reported for the keys
+    linear_slope = (right[1] - left[1]) / dt
+    out_slope = left[4] if len(left) > 2 else linear_slope
+    in_slope = right[3] if len(right) > 2 else linear_slope
+    t2, t3 = t * t, t * t * t
+    return ((2 * t3 - 3 * t2 + 1) * left[1] + (t3 - 2 * t2 + t) * dt * out_slope +
+            (3 * t2 - 2 * t3) * right[1] + (t3 - t2) * dt * in_slope)
+
+
+def source_point_at(source_point, frame):
+    """Source Point position at a frame
+
+        Returns:
+        [x, y] list.
+    """
+    return [curve_value(curve, frame) for curve in source_point['curves']]
+
+
+def expand_source_point(source_point, frames):
+    """Per-frame positions, for anything that really does need every frame
+
+        Arguments:
+        source_point (dict) : source point dictionary
+        frames (iterable) : frame numbers wanted
+
+        Returns:
+        generator of (frame, [x, y]) tuples.
+    """
+    for frame in frames:
+        yield frame, source_point_at(source_point, frame)
+
+
+def offset_source_point(source_point, center):
+    """Keys for center minus the Source Point, what a centering translate needs
+
+        Arguments:
+        source_point (dict) : source point dictionary
+        center (list) : [x, y] of the frame center
+
+        Returns:
+        source point dictionary.
+    """
+    curves = list()
+    for offset, curve in zip(center, source_point['curves']):
+        keys = list()
+        for key in curve:
+            if len(key) > 2:
+                keys.append([key[0], offset - key[1], key[2], -key[3], -key[4]])
+            else:
+                keys.append([key[0], offset - key[1]])
+        curves.append(keys)
+    return {'curves': curves}
+
+
+# interpolation letters in a nuke curve script, each applies to the keys after it
+CURVE_FLAGS = {'constant': 'K', 'linear': 'L', 'smooth': 'Z', 'catmull_rom': 'R', 'cubic': 'C',
+               'horizontal': 'H', 'break': 'X', 'user_set_slope': 'Z'}
+
+
+def format_number(value):
+    # shortest text that reads back as the same float, so keys survive the trip exactly
+    text = repr(float(value))
+    return text[:-2] if text.endswith('.0') else text
+
+
+def curve_script(curve):
+    """One curve in nuke's curve syntax - 'curve L x1001 960 x1010 975.5' - so a whole
+        channel goes onto a knob in one call instead of a setValueAt per key
+
+        Arguments:
+        curve (list) : keys, ascending by frame
+
+        Returns:
+        string.
+    """
+    words = ['curve']
+    flag = None
+    for key in curve:
+        interpolation = key[2] if len(key) > 2 else LINEAR
+        key_flag = CURVE_FLAGS.get(interpolation, 'Z')
+        if key_flag != flag:
+            words.append(key_flag)
+            flag = key_flag
+        words.append('x' + format_number(key[0]))
+        words.append(format_number(key[1]))
+        # slopes nuke works out itself are left to it, set ones have to be written - s is
+        # the left slope (both, unless a t follows with a different right one)
+        if interpolation == 'user_set_slope':
+            words.append('s' + format_number(key[3]))
+            if key[4] != key[3]:
+                words.append('t' + format_number(key[4]))
+    return ' '.join(words)
+
+
+def source_point_script(source_point):
+    """Knob script for an XY knob holding the Source Point, for knob.fromScript
+
+        Arguments:
+        source_point (dict) : source point dictionary
+
+        Returns:
+        string.
+    """
+    if not is_animated(source_point):
+        return '{%s}'%' '.join(format_number(curve[0][1]) for curve in source_point['curves'])
+    return '{%s}'%' '.join('{%s}'%curve_script(curve) for curve in source_point['curves'])
+
+
+def parse_curve_script(text):
+    """Read keys back out of a curve script from curve_script or source_point_script
+
+        Arguments:
+        text (string) : the script
+
+        Returns:
+        list of curves, each a list of [frame, value, interpolation] keys, with lslope and
+        rslope added for keys that have set slopes.
+    """
+    names = dict((flag, name) for name, flag in CURVE_FLAGS.items() if name != 'user_set_slope')
+    curves = list()
+    for chunk in text.replace('{', ' { ').replace('}', ' } ').split('{'):
+        words = chunk.replace('}', ' ').split()
+        if not words:
+            continue
+        if words[0] != 'curve':
+            curves.extend([[[0, float(word), LINEAR]] for word in words])
+            continue
+        keys = list()
+        frame = 1.0
+        interpolation = 'smooth'
+        for word in words[1:]:
+            if word in names:
+                interpolation = names[word]
+            elif word[0] == 'x':
+                frame = float(word[1:])
+            elif word[0] == 's':
+                keys[-1][2:] = ['user_set_slope', float(word[1:]), float(word[1:])]
+            elif word[0] == 't':
+                keys[-1][4] = float(word[1:])
+            else:
+                keys.append([frame, float(word), interpolation])
+                frame += 1
+        curves.append(keys)
+    return curves
@@ -0,0 +1,23 @@
+import os
+
+# Files written under a temp name and renamed into place get the permissions a plain open
+# would give them - 0o666 less the umask - which mkstemp doesn't (it makes them private).
+# The kernel applies the umask at create time, so it never has to be read or changed here.
+
+
+def temp_file(path):
+    """Create a new file next to path to write before renaming it over path
+
+        Arguments:
+        path (string) : where the file ends up
+
+        Returns:
+        (file descriptor open for writing, temp path) tuple.
+    """
+    folder, name = os.path.split(path)
+    while True:
+        temp_path = os.path.join(folder, '.%s.%s.tmp'%(name, os.urandom(6).hex()))
+        try:
+            return os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666), temp_path
+        except FileExistsError:
+            continue
@@ -0,0 +1,201 @@
+import re
+
+from tinyelements.tinyelements_curves import static_source_point, source_point_script, offset_source_point
+
+# Node graph for a load written out as nuke script, so a whole batch of elements goes in
+# with one paste instead of a few dozen nuke API calls per element. Nothing in here needs
+# nuke, the script is plain text.
+
+GLOBAL_COLOR = 4278255360
+SHOW_COLOR = 8494847
+
+# spacing of the pasted graph, roughly where createNode used to drop things
+READ_SPACING = 100
+TRANSFORM_DROP = 100
+TIME_OFFSET_DROP = 60
+SWITCH_DROP = 200
+
+PLAIN_WORD = re.compile(r'^[\w./:+-]+$')
+
+BUTTONS = [
+    ('writed', 'Write Data', 'from tinyelements import write_data_json; write_data_json(nuke.thisNode())', False),
+    ('make_center', 'Center Source', 'from tinyelements import make_centering_transform; make_centering_transform(nuke.thisNode())', True),
+    ('copy_to_show', 'Copy Element to Show', 'from tinyelements import copy_read_to_show; copy_read_to_show(nuke.thisNode())', True),
+]
+
+
+def quote(value):
+    """A value as a word of nuke script, quoted and escaped when it has to be
+
+        Arguments:
+        value : anything, it's turned into a string
+
+        Returns:
+        string.
+    """
+    text = str(value)
+    if PLAIN_WORD.match(text):
+        return text
+    for char in ['\\', '"', '[', ']', '$', '{', '}']:
+        text = text.replace(char, '\\' + char)
+    return '"%s"'%text.replace('\n', '\\n')
+
+
+def read_label(element, from_global_lib):
+    return element + '\n' + ('global lib' if from_global_lib else 'show lib')
+
+
+def element_info_knobs(element):
+    """Lines for the Element Info tab on every loaded Read, the knob names write_data_json,
+        gather_data and copy_read_to_show look for
+
+        Arguments:
+        element (dict) : element to load, see node_graph_script
+
+        Returns:
+        list of script lines.
+    """
+    width, height = element['width'], element['height']
+    texts = [('Element Name:', element['element_dir'].rstrip('/').split('/')[-1]),
+             ('Element Path:', element['element_dir']),
+             ('Start:', element['start']),
+             ('End:', element['end']),
+             ('Duration:', element['end'] - element['start']),
+             ('Width:', width if width else ''),
+             ('Height:', height if height else '')]
+    metadata = element.get('metadata') or dict()
+    if metadata.get('channel_names'):
+        texts += [('Channels:', metadata['channel_names']), ('Compression:', metadata['compression']),
+                  ('Pixel Type:', metadata['pixel_type'])]
+
+    lines = [' addUserKnob {20 %s}'%quote('Element Info')]
+    for name, value in texts:
+        lines.append(' addUserKnob {26 %s T %s +STARTLINE}'%(quote(name), quote(value)))
+    lines.append(' addUserKnob {12 %s +STARTLINE}'%quote('Source Point'))
+    source_point = element_source_point(element)
+    if source_point is not None:
+        lines.append(' %s %s'%(quote('Source Point'), source_point_script(source_point)))
+    for name, label, command, startline in BUTTONS:
+        lines.append(' addUserKnob {22 %s l %s T %s%s}'%(name, quote(label), quote(command),
+                                                      ' +STARTLINE' if startline else ''))
+    return lines
+
+
+def element_source_point(element):
+    """The sidecar's Source Point, or the frame center, or None if neither is known yet"""
+    if element.get('source_point') is not None:
+        return element['source_point']
+    if element['width'] and element['height']:
+        return static_source_point(element['width']/2, element['height']/2)
+    return None
+
+
+def read_script(element, xpos, ypos):
+    """A Read node for an element, Element Info tab and all
+
+        Arguments:
+        element (dict) : element to load, see node_graph_script
+        xpos (int) : node x position
+        ypos (int) : node y position
+
+        Returns:
+        list of script lines.
+    """
+    lines = ['Read {',
+             ' inputs 0',
+             ' file %s'%quote(element['file']),
+             ' first %d'%element['start'],
+             ' last %d'%element['end'],
+             ' origfirst %d'%element['start'],
+             ' origlast %d'%element['end'],
+             ' origset true',
+             ' label %s'%quote(read_label(element['element'], element['from_global_lib'])),
+             ' tile_color 0x%08x'%(GLOBAL_COLOR if element['from_global_lib'] else SHOW_COLOR),
+             ' xpos %d'%xpos,
+             ' ypos %d'%ypos]
+    lines += element_info_knobs(element)
+    lines.append('}')
+    return lines
+
+
+def centering_script(element, xpos, ypos):
+    """The Transform make_centering_transform builds, moving the Source Point to the
+        center of frame. Left at identity when the resolution isn't known yet.
+
+        Returns:
+        list of script lines.
+    """
+    lines = ['Transform {']
+    source_point = element_source_point(element)
+    if source_point is not None and element['width'] and element['height']:
+        center = [element['width']/2, element['height']/2]
+        lines.append(' translate %s'%source_point_script(offset_source_point(source_point, center)))
+        lines.append(' center %s'%source_point_script(source_point))
+    lines += [' name CenteringTX',
+              ' label %s'%quote(element['element_dir'].rstrip('/').split('/')[-1]),
+              ' xpos %d'%xpos,
+              ' ypos %d'%ypos,
+              '}']
+    return lines
+
+
+def node_graph_script(elements, load_type, start_frame, origin):
+    """Everything a load makes as one nuke script: per element a Read with its Element
+        Info tab, then a centering Transform and a TimeOffset as the load type asks,
+        and a Switch over the lot
+
+        Arguments:
+        elements (list) : dictionaries of
+                element : Name of the element
+                file : full path of the sequence, frame numbers as %04d or the like
+                element_dir : the element directory
+                start, end : frame range
+                from_global_lib : bool
+                width, height : resolution, None if it isn't known
+                metadata : the element's index row, or None
+                source_point : from the sidecar, or None
+        load_type (string) : 'Standard', 'Switch', 'Centered', 'Centered Switch', 'Thumb Setup'...
+        start_frame (int) : frame the elements should start on
+        origin (list) : [x, y] of the first Read
+
+        Returns:
+        (script, layout) - the script text, and a list per element of the node names in the
+        chain as the script calls them ('Read', 'Transform', 'TimeOffset').
+    """
+    lines = list()
+    layout = list()
+    last_positions = list()
+    # elements go in back to front, so the first is on top of the stack and the Switch takes it as input 0
+    for i in reversed(range(len(elements))):
+        element = elements[i]
+        x = int(origin[0] + READ_SPACING * i)
+        y = int(origin[1])
+        lines += read_script(element, x, y)
+        chain = ['Read']
+
+        if 'Centered' in load_type:
+            y += TRANSFORM_DROP
+            lines += centering_script(element, x, y)
+            chain.append('Transform')
+
+        if element['start'] != start_frame and 'Thumb' not in load_type:
+            y += TIME_OFFSET_DROP if len(chain) > 1 else TRANSFORM_DROP
+            lines += ['TimeOffset {',
+                      ' time_offset %d'%(start_frame - element['start']),
+                      ' xpos %d'%x,
+                      ' ypos %d'%y,
+                      '}']
+            chain.append('TimeOffset')
+
+        layout.insert(0, chain)
+        last_positions.insert(0, (x, y))
+
+    if 'Switch' in load_type and elements:
+        x = sum(p[0] for p in last_positions) / len(last_positions)
+        y = sum(p[1] for p in last_positions) / len(last_positions) + SWITCH_DROP
+        lines += ['Switch {',
+                  ' inputs %d'%len(elements),
+                  ' xpos %d'%int(x),
+                  ' ypos %d'%int(y),
+                  '}']
+    return '\n'.join(lines) + '\n', layout
@@ -1,8 +1,16 @@
-import nuke
-import os, shutil, json
-import fnmatch
-
-from tinyelements.globals import GLOBAL_DIR, SHOW_DIR, SHOW
+import os, json, tempfile
+
+# nuke is imported inside the functions that build nodes or UI, so everything
+# else in here can run headless (see tinyelements_cli)
+from tinyelements.globals import GLOBAL_DIR, SHOW_DIR, SHOW, SOURCE_POINT_DENSE, SOURCE_POINT_TOLERANCE
+from tinyelements.tinyelements_sequence import find_sequences, longest_sequence
+from tinyelements.tinyelements_planner import plan_load
+from tinyelements.tinyelements_graph import node_graph_script
+from tinyelements.tinyelements_crawler import scan_dir
+from tinyelements.tinyelements_copy import copy_element, element_needs_sync, format_rate, format_strategies
+from tinyelements.tinyelements_profiling import span, capture_profile
+from tinyelements.tinyelements_curves import static_source_point, simplify_samples, read_source_point, \
+    offset_source_point, source_point_script
 
 def copy_element_to_show(load_info, element):
     """Set up dirs and make copies from the global lib to the show lib for any element
@@ -13,56 +21,36 @@ def copy_element_to_show(load_info, element):
         element (string) : Name of the element
 
         Returns:
-        None - but should probably return success
+        bool - True if every file made it over
     """
-    source_folder = os.path.join(load_info['global_lib'], load_info['category'], element)
-    dir_list = os.listdir(source_folder)
-    copy_seq_name = get_longest_sequence(dir_list)
-    file_list = fnmatch.filter(dir_list, copy_seq_name['name'] + '*')
+    import nuke
 
-    target_folder = os.path.join(load_info['show_lib'], load_info['category'], element)
+    print('copying %s to %s'%(element, os.path.join(load_info['show_lib'], load_info['category'])))
 
-    file_count = len(file_list)
+    progBar = nuke.ProgressTask("Progress job")
 
-    print('gonna copy:')
-    for cf in file_list:
-        print('\t%s'%cf)
-    print('to %s'%target_folder)
+    def show_progress(done, total, bytes_copied, bytes_per_sec, filename):
+        progBar.setMessage('Copying file %s : %d of %d (%s)'%(filename, done, total, format_rate(bytes_per_sec)))
+        progBar.setProgress(int(done / float(total) * 100))
 
     try:
-        progBar = nuke.ProgressTask("Progress job")
-
-        for i, filename in enumerate(file_list):
-            if progBar.isCancelled():
-                break
-            try:
-                if os.path.isdir(target_folder) == False:
-                    old_umask = os.umask(0)
-                    os.makedirs(target_folder, 0o777)
-                    os.umask(old_umask)
-                progBar.setMessage('Copying file %s : %d of %d'%(filename, i+1, file_count))
-                progBar.setProgress(int(i / float(file_count) * 100))
-
-                shutil.copy(os.path.join(source_folder, filename), target_folder)
-            except OSError as e:
-                message1 = f'had the following error copying {filename}:\n{e}'
-                nuke.message(message1)
-    except OSError as e:
+        with span('copy', element) as timer:
+            result = copy_element(load_info, element, progress=show_progress, is_cancelled=progBar.isCancelled)
+            timer.set(bytes=result['bytes'], files=len(result['copied']))
+    except (OSError, ValueError) as e:
         message = f'had the following error:\n{e}'
         nuke.message(message)
+        return False
 
+    if result['failed']:
+        message1 = 'had the following errors copying:\n' + '\n'.join(f'{filename}: {e}' for filename, e in result['failed'])
+        nuke.message(message1)
 
-    try:
-        t_global_path = os.path.join(load_info['global_lib'], load_info['category'], '_thumbnails')
-        t_show_path = os.path.join(load_info['show_lib'], load_info['category'], '_thumbnails')
-        if os.path.isdir(t_show_path) == False:
-                        old_umask = os.umask(0)
-                        os.makedirs(t_show_path, 0o777)
-                        os.umask(old_umask)
+    print('copied %d of %d files, %s (%s)'%(len(result['copied']), len(result['file_list']),
+                                            format_rate(result['bytes'] / max(result['elapsed'], 1e-6)),
+                                            format_strategies(result)))
 
-        shutil.copy(os.path.join(t_global_path, copy_seq_name['name']+'.gif'), t_show_path)
-    except:
-        print('had trouble with the thumbnail')
+    return not result['failed'] and not result['cancelled']
 
 
 def set_node_attribs(node, element, from_global_lib=True):
@@ -88,6 +76,80 @@ def set_node_attribs(node, element, from_global_lib=True):
     node['tile_color'].setValue(read_color)
 
 
+def paste_script(script):
+    """Paste nuke script into the node graph in one go
+
+        Arguments:
+        script (string) : nodes as they'd be in a .nk file
+
+        Returns:
+        list of the pasted nodes.
+    """
+    import nuke
+
+    handle, script_path = tempfile.mkstemp(prefix='tinyelements_', suffix='.nk')
+    try:
+        with os.fdopen(handle, 'w') as f:
+            f.write(script)
+        nuke.nodePaste(script_path)
+    finally:
+        os.remove(script_path)
+    return nuke.selectedNodes()
+
+
+def pasted_chains(nodes, elements, layout):
+    """Match pasted nodes up to the elements they were made for, following each Read
+        down through the nodes the script hung off it
+
+        Arguments:
+        nodes (list) : from paste_script
+        elements (list) : the element dictionaries the script was made from
+        layout (list) : from node_graph_script
+
+        Returns:
+        list per element of the nodes in its chain, Read first.
+    """
+    import nuke
+
+    pasted = set(node.name() for node in nodes)
+    by_file = dict((node['file'].value(), node) for node in nodes if node.Class() == 'Read')
+    chains = list()
+    for element, names in zip(elements, layout):
+        chain = [by_file[element['file']]]
+        for name in names[1:]:
+            below = [n for n in chain[-1].dependent(nuke.INPUTS, forceEvaluate=False)
+                     if n.Class() == name and n.name() in pasted]
+            chain.append(below[0])
+        chains.append(chain)
+    return chains
+
+
+def finish_unknown_format(element, chain):
+    """Resolution couldn't be read from the image header, so ask the Read, then fill in
+        what the script had to leave out
+
+        Arguments:
+        element (dict) : the element dictionary the script was made from
+        chain (list) : its nodes, Read first
+
+        Returns:
+        None.
+    """
+    read = chain[0]
+    width, height = read.width(), read.height()
+    read['Width:'].setValue(str(width))
+    read['Height:'].setValue(str(height))
+    source_point = element['source_point']
+    if source_point is None:
+        source_point = static_source_point(width/2, height/2)
+        apply_offset_anim(read['Source Point'], source_point)
+    for node in chain[1:]:
+        if node.Class() == 'Transform':
+            apply_offset_anim(node['translate'], source_point, [width/2, height/2])
+            apply_offset_anim(node['center'], source_point)
+
+
+@capture_profile
 def load_element_list(load_info):
     """Given a list of element names, load each one, then add nodes as needed to satisfy
         the options
@@ -106,96 +168,56 @@ def load_element_list(load_info):
         Returns:
         None.
     """
-    nuke.selectAll()
-    nuke.invertSelection()
+    execute_plan(plan_load(load_info))
 
-    position = None
-    last_node_list = list()
 
-    library = load_info['global_lib']
-    from_global_lib = True
+def execute_plan(plan):
+    """Carry out a load plan from tinyelements_planner: make the copies it calls for,
+        then put the whole node graph in as one pasted script, in a single undo step.
 
+        Arguments:
+        plan (LoadPlan) : from plan_load
 
-    for element in load_info['element_list']:
-        # establish if we need to copy it in:
-        if load_info['copy_to']:
-            if not os.path.exists(os.path.join(load_info['show_lib'], load_info['category'], element)):
-                copy_element_to_show(load_info, element)
-
-        if os.path.exists(os.path.join(load_info['show_lib'], load_info['category'], element)):
-            library = load_info['show_lib']
-            from_global_lib = False
-        
-        element_path = os.path.join(library, load_info['category'], element)
+        Returns:
+        list per loaded element of the nodes made for it, Read first.
+    """
+    import nuke
 
-        try:
-            element_seq = get_img_seq(element_path)
-        except:
+    copy_info = {'global_lib': plan.global_lib, 'show_lib': plan.show_lib, 'category': plan.category}
+    elements = list()
+    for element in plan.elements:
+        if element.error is not None:
             print('Something went wrong')
-            print('Can not find element at %s'%element_path)
+            print(element.error)
             continue
+        if element.needs_copy and not copy_element_to_show(copy_info, element.element):
+            # load what's there rather than a half copied element
+            element = element._replace(element_dir=element.source_dir, from_global_lib=True,
+                                       file=os.path.join(element.source_dir, os.path.basename(element.file)))
+        elements.append(element._asdict())
+    if not elements:
+        return []
 
-        element_seq_path = os.path.join(element_path, element_seq['fname'])
-
-        # sort out all the info
-        start = element_seq['startframe']
-        end = element_seq['endframe']
-
-        # start making stuff
-        read = nuke.nodes.Read(file=element_seq_path)
-        read['first'].setValue(start)
-        read['last'].setValue(end)
-
-        set_node_attribs(read, element, from_global_lib)
-        add_data_to_read(read)
-
-        if position is None:
-            # center it
-            read.setXpos(nuke.center()[0])
-            read.setYpos(nuke.center()[1])
-        else: 
-            # then position each one to the right a bit
-            read.setXpos(int(position[0] + 100))
-            read.setYpos(int(position[1]))
-
-        position = [read['xpos'].value(), read['ypos'].value()]
+    script, layout = node_graph_script(elements, plan.load_type, plan.start_frame, nuke.center())
 
-        read.setSelected(True)
-        last_node = read
-
-        # now apply options
-        if 'Centered' in load_info['type']:
-            tx_node = make_centering_transform(read)
-            tx_node.setSelected(True)
-            last_node = tx_node
-    
-        if start != load_info['start_frame'] and 'Thumb' not in load_info['type']:
-            time_o = nuke.createNode('TimeOffset')
-            time_o['time_offset'].setValue(load_info['start_frame'] - start)
-            time_o.setYpos(time_o.ypos() + 35)
-            time_o.setSelected(True)
-            last_node = time_o
-
-        last_node_list.append(last_node)
-
-    if 'Switch' in load_info['type']:
-        nuke.selectAll()
-        nuke.invertSelection()
-        x_avg, y_avg = 0,0
-        for ln in last_node_list:
-            x_avg += ln.xpos()
-            y_avg += ln.ypos()
-            ln.setSelected(True)
-        x = x_avg / len(last_node_list)
-        y = y_avg / len(last_node_list) + 200
-        switch_node = nuke.createNode('Switch')
-        switch_node.setXpos(int(x))
-        switch_node.setYpos(int(y))
-    
-    if 'Thumb' in load_info['type']:
+    nuke.Undo.begin('Load Elements')
+    try:
         nuke.selectAll()
         nuke.invertSelection()
-        setup_for_thumb(last_node_list)
+        with span('nodes', plan.category, files=len(elements)):
+            nodes = paste_script(script)
+            chains = pasted_chains(nodes, elements, layout)
+            for element, chain in zip(elements, chains):
+                if not (element['width'] and element['height']):
+                    finish_unknown_format(element, chain)
+
+        if 'Thumb' in plan.load_type:
+            nuke.selectAll()
+            nuke.invertSelection()
+            setup_for_thumb([chain[-1] for chain in chains])
+    finally:
+        nuke.Undo.end()
+    return chains
 
 
 def setup_for_thumb(node_list):
@@ -207,6 +229,8 @@ def setup_for_thumb(node_list):
         Returns:
         None.
     """
+    import nuke
+
     for i, node in enumerate(node_list):
         node.setSelected(True)
         node['postage_stamp'].setValue(False)
@@ -259,15 +283,12 @@ def get_dirs(dir_path):
         Returns:
         list of the contained directory names.
     """
-    # get listing and check to make sure it's a dir
-    # ignore it if it start with '_'
-    ignore_list = ['contactsheet', '_catalogs', 'thumbnails', '_thumbnails']
+    # one scandir pass - the dirent type tells us what's a dir
     try:
-        dirs = [ name for name in os.listdir(dir_path) if os.path.isdir(os.path.join(dir_path, name)) and name not in ignore_list ]
+        dirs, _ = scan_dir(dir_path)
     except FileNotFoundError:
         print('Can not find directory at %s'%dir_path)
         dirs = []
-    dirs.sort()
     return dirs
 
 
@@ -286,12 +307,12 @@ def get_img_seq(dir_path):
 
 def get_longest_sequence(dir_list):
     """Finds the longest logical image sequence in a given directory. Looks only
-        at a select number of image formats. Finds the pattern of a sequence and
-        then returns information regarding only the longest sequence. This way we 
-        avoid numbered temp files or partial conversions
+        at a select number of image formats. Every file is grouped into its sequence
+        in one pass and then information regarding only the longest sequence is
+        returned. This way we avoid numbered temp files or partial conversions
 
         Arguments:
-        dir_path (string) : the path to the directories you're looking for
+        dir_list (list) : the file names in the directory you're looking at
 
         Returns:
         Dictionary containing:
@@ -302,82 +323,11 @@ def get_longest_sequence(dir_list):
                 info['extension'] : the image file type
                 info['frame_format'] : the format of the numbering w/in the seq
                 info['fname'] : the sequentially formatted naming
+                info['files'] : the file names in the seq, in frame order
+            plus the rest of the keys from tinyelements_sequence.build_sequence_info
 
     """
-    ext_list = ['.exr', '.png', '.jpg', '.jpeg', '.tif', '.tiff', '.hdr']
-    dir_list.sort()
-    seq_names = set()
-    potential_seq = dict()
-
-    for item in dir_list:
-        if len(seq_names) > 0 and any(seq in item for seq in seq_names):
-            continue
-        # see if there are images
-        if any(ext in item for ext in ext_list):
-            info = dict()
-            # clear out the extension
-            ext_index = item.rfind('.')
-            item_ext = item.split('.')[-1]
-            item_name_num = item[0:ext_index]
-
-            # find the seq num
-            end_index = len(item_name_num)
-            start_index = end_index-1
-            found = False
-            dot_format = True
-            sep = '.'
-            num = 'x'
-            while not found:
-                try:
-                    num = int(item_name_num[start_index:end_index])
-                    start_index-=1
-                    num_pad = end_index-start_index-1
-
-                except:
-                    found = True
-                    if item_name_num[start_index] != '.':
-                        dot_format = False
-                        sep = item_name_num[start_index]
-
-
-            info = dict()
-            info['name'] = 'none'
-            info['count'] = 0
-
-            if num != 'x':
-                info['name'] = item[0:start_index]
-                info['count'] = len(fnmatch.filter(dir_list, info['name'] + '*' + item_ext))
-                info['startframe'] = num
-                info['endframe'] = num + info['count']-1
-                info['extension'] = item_ext
-                info['frame_format'] = '%0' + str(num_pad) + 'd'
-                if dot_format:
-                    info['fname'] = '.'.join([info['name'], info['frame_format'], info['extension']])
-                else:
-                    info['fname'] = info['name'] + sep + info['frame_format'] + '.' + info['extension']
-            else:
-                #print('un-numbered still')
-                info['name'] = item_name_num
-                info['count'] = 1
-                info['extension'] = item_ext
-                info['frame_format'] = 'None'
-                info['fname'] = '.'.join([info['name'],info['extension']])
-
-        try:
-            potential_seq[info['name']] = info
-            seq_names.add(info['name'])
-        except:
-            print('problem with %s'%item)
-            continue
-
-    # print_potential_seq(potential_seq)
-    longest = [None, 0]
-
-    for seq in potential_seq.keys():
-        if potential_seq[seq]['count'] > longest[1]:
-            longest = [seq, potential_seq[seq]['count']]
-
-    return potential_seq[longest[0]]
+    return longest_sequence(find_sequences(dir_list))
 
 
 def print_potential_seq(data):
@@ -387,102 +337,21 @@ def print_potential_seq(data):
             print('\t%s : %s'%(k, data[d][k]))
 
 
-def add_data_to_read(el_node):
-    """Get info about the file and add it to the read node
+def knob_curve_keys(curve):
+    """Keys of a nuke AnimationCurve as [frame, value, interpolation, lslope, rslope]"""
+    import nuke
 
-        Arguments:
-        el_node (nuke node obj) : Read node for the element
-
-        Returns:
-        None.
-    """
-    info = dict()
-    # Gather data from the read:
-    info['start'] = el_node.knob('first').value()
-    info['end'] = el_node.knob('last').value()
-    info['duration'] = info['end']-info['start']
-    info['width'] = el_node.width()
-    info['height'] = el_node.height()
-
-    fname = el_node.knob('file').value()
-    info['element_dir'] = os.path.dirname(fname)
-    info['element_name'] = info['element_dir'].split('/')[-1]
-
-    center = [info['width']/2, info['height']/2]
-
-    # put it in new knobs
-    k = nuke.Tab_Knob('Element Info')
-    k.setFlag(nuke.STARTLINE)
-    el_node.addKnob(k)
-
-    k = nuke.Text_Knob('Element Name:')
-    k.setValue(info['element_name'])
-    k.setFlag(nuke.STARTLINE)
-    el_node.addKnob(k)
-
-    k = nuke.Text_Knob('Element Path:')
-    k.setValue(info['element_dir'])
-    k.setFlag(nuke.STARTLINE)
-    el_node.addKnob(k)
-
-    k = nuke.Text_Knob('Start:')
-    k.setValue(str(info['start']))
-    k.setFlag(nuke.STARTLINE)
-    el_node.addKnob(k)
-
-    k = nuke.Text_Knob('End:')
-    k.setValue(str(info['end']))
-    k.setFlag(nuke.STARTLINE)
-    el_node.addKnob(k)
-
-    k = nuke.Text_Knob('Duration:')
-    k.setValue(str(info['duration']))
-    k.setFlag(nuke.STARTLINE)
-    el_node.addKnob(k)
-
-    k = nuke.Text_Knob('Width:')
-    k.setValue(str(info['width']))
-    k.setFlag(nuke.STARTLINE)
-    el_node.addKnob(k)
-
-    k = nuke.Text_Knob('Height:')
-    k.setValue(str(info['height']))
-    k.setFlag(nuke.STARTLINE)
-    el_node.addKnob(k)
-
-    source = nuke.XY_Knob('Source Point')
-    source.setValue([info['width']/2, info['height']/2])
-    source.setFlag(nuke.STARTLINE)
-    el_node.addKnob(source)
-
-    k = nuke.PyScript_Knob('writed', label='Write Data', command='from tinyelements import write_data_json; write_data_json(nuke.thisNode())')
-    el_node.addKnob(k)
-
-    k = nuke.PyScript_Knob('make_center', label='Center Source', command='from tinyelements import make_centering_transform; make_centering_transform(nuke.thisNode())')
-    k.setFlag(nuke.STARTLINE)
-    el_node.addKnob(k)
-
-    k = nuke.PyScript_Knob('copy_to_show', label='Copy Element to Show', command='from tinyelements import copy_read_to_show; copy_read_to_show(nuke.thisNode())')
-    k.setFlag(nuke.STARTLINE)
-    el_node.addKnob(k)
-
-    # check for a pre-existing json file, if it's there, apply the centering info
-    json_path = os.path.join(info['element_dir'], info['element_name']+'.json')
-
-    if os.path.exists(json_path):
-        with open(json_path) as json_file:
-            json_data = json.load(json_file)
-        info['source_point'] = json_data['source_point']
-        apply_offset_anim(source, info['source_point'])
-    else:
-        info['source_point'] = {0: (info['width']/2, info['height']/2)}
-
-    # open up the first tab again
-    el_node['file'].setFlag(0)
+    names = dict()
+    for name in ['CONSTANT', 'LINEAR', 'SMOOTH', 'CATMULL_ROM', 'CUBIC', 'HORIZONTAL', 'BREAK', 'USER_SET_SLOPE']:
+        if hasattr(nuke, name):
+            names[getattr(nuke, name)] = name.lower()
+    return [[key.x, key.y, names.get(key.interpolation, 'smooth'), key.lslope, key.rslope] for key in curve.keys()]
 
 
 def get_center_data(info, center_knob):
-    """Look for values on the centering knob of the read, then return it back in the dictionary provided
+    """Look for values on the centering knob of the read, then return it back in the dictionary provided.
+        Keys are stored as they are on the knob; a knob keyed on most frames (a baked track)
+        or driven by an expression is sampled per frame and simplified to linear keys.
 
         Arguments:
         info (dict) : A dictionary we can add info to and return
@@ -491,15 +360,29 @@ def get_center_data(info, center_knob):
         Returns:
         info (dict) w/ the added data.
     """
-    source_dict = dict()
-    if center_knob.isAnimated():
-        for n in range(info['start'], info['end']+1):
-            val = center_knob.getValueAt(n)
-            source_dict[n]=val
-    else:
-        source_dict[0]=center_knob.getValueAt(0)
-
-    info['source_point'] = source_dict
+    if not center_knob.isAnimated():
+        value = center_knob.getValueAt(0)
+        info['source_point'] = static_source_point(value[0], value[1])
+        return info
+
+    frame_count = info['end'] - info['start'] + 1
+    curves = dict((curve.knobIndex(), curve) for curve in center_knob.animations())
+    keyed = [curve for curve in curves.values() if curve.noExpression()]
+    dense = any(len(curve.keys()) > SOURCE_POINT_DENSE * frame_count for curve in keyed)
+
+    if dense or len(keyed) != len(curves):
+        samples = dict((n, center_knob.getValueAt(n)) for n in range(info['start'], info['end']+1))
+        info['source_point'] = simplify_samples(samples, SOURCE_POINT_TOLERANCE)
+        return info
+
+    still = center_knob.getValueAt(info['start'])
+    source = list()
+    for channel in [0, 1]:
+        if channel in curves and curves[channel].keys():
+            source.append(knob_curve_keys(curves[channel]))
+        else:
+            source.append([[0, still[channel]]])
+    info['source_point'] = {'curves': source}
     return info
 
 
@@ -535,11 +418,12 @@ def make_centering_transform(read_node):
         Returns:
         tx_node (nuke node object) : The created transform.
     """
+    import nuke
+
     ## Check for JSON file
     info = gather_data(read_node)
     info = get_center_data(info, read_node.knob('Source Point'))
 
-    curve_keys = info['source_point'].keys()
     center = [info['width']/2, info['height']/2]
 
     ypos = read_node.ypos()
@@ -560,31 +444,23 @@ def make_centering_transform(read_node):
     return tx_node
 
 
-def apply_offset_anim(anim_knob, anim_dict, center=None):
-    """Take anim data {frame : [x, y], ...} and apply it to a knob. If a center is given,
-        the anim is subtracted from it for a centered offset
+def apply_offset_anim(anim_knob, source_point, center=None):
+    """Put Source Point keys on a knob. If a center is given, the anim is subtracted
+        from it for a centered offset. Both channels go on as one curve script in a
+        single fromScript call, however many keys there are.
 
         Arguments:
         anim_knob (nuke knob obj) : right now this needs to be an XY knob as this only works for that
-        anim_dict (dict) : anim data formatted as { framenum : [x, y], ...}
+        source_point (dict) : keys as tinyelements_curves keeps them, or the older { framenum : [x, y], ...}
         center (float list len 2) : the new center point on the frame [x, y]
 
         Returns:
         None.
     """
-    curve_keys = anim_dict.keys()
-    curve_keys.sort()
-    if len(curve_keys)>1:
-        anim_knob.setAnimated()
-    for frame in curve_keys:
-        if center is not None:
-            x = center[0] - anim_dict[frame][0]
-            y = center[1] - anim_dict[frame][1]
-        else:
-            x = anim_dict[frame][0]
-            y = anim_dict[frame][1]
-        anim_knob.setValueAt(x, float(frame), 0)
-        anim_knob.setValueAt(y, float(frame), 1)
+    source_point = read_source_point(source_point, SOURCE_POINT_TOLERANCE)
+    if center is not None:
+        source_point = offset_source_point(source_point, center)
+    anim_knob.fromScript(source_point_script(source_point))
 
 
 def gather_data(node):
@@ -609,8 +485,9 @@ def gather_data(node):
 
 def copy_read_to_show(node):
     """This is a little embarassing because it's a mess, but hopefully this function won't exist for long.
-        Check the file read, if it's global and you want it in the show it will copy the files then alter the 
-        read path, change the color of the node, and alter the label.
+        Check the file read, if it's global, or a show copy the global element has moved on from, it will
+        copy (or sync) the files then alter the read path and frame range, change the color of the node,
+        and alter the label.
 
         Arguments:
         node (nuke node obj) : The node w/ the data (element read node)
@@ -627,17 +504,25 @@ def copy_read_to_show(node):
 
     show_element_path = os.path.join(copy_info['show_lib'], copy_info['category'], info['element_name'])
 
-    if SHOW not in info['element_dir']:
-        copy_element_to_show(copy_info, info['element_name'])
-        element_seq = get_img_seq(show_element_path)
-        element_seq_path = os.path.join(show_element_path, element_seq['fname'])
-        node['file'].setValue(element_seq_path)
-        node['Element Path:'].setValue(show_element_path)
-        set_node_attribs(node, info['element_name'], from_global_lib=False)
-
-
-    else:
-        print('already copied')
+    if SHOW in info['element_dir'] and not element_needs_sync(copy_info, info['element_name']):
+        print('already up to date')
         set_node_attribs(node, info['element_name'], from_global_lib=False)
+        return
+
+    if not copy_element_to_show(copy_info, info['element_name']):
+        return
+    # a sync can change the frame range, so go by what's on disk rather than the index
+    element_seq = longest_sequence(find_sequences(scan_dir(show_element_path)[1]))
+    element_seq_path = os.path.join(show_element_path, element_seq['fname'])
+    node['file'].setValue(element_seq_path)
+    for knob in ['first', 'origfirst']:
+        node[knob].setValue(element_seq['startframe'])
+    for knob in ['last', 'origlast']:
+        node[knob].setValue(element_seq['endframe'])
+    node['Element Path:'].setValue(show_element_path)
+    node['Start:'].setValue(str(element_seq['startframe']))
+    node['End:'].setValue(str(element_seq['endframe']))
+    node['Duration:'].setValue(str(element_seq['endframe'] - element_seq['startframe']))
+    set_node_attribs(node, info['element_name'], from_global_lib=False)
 
     
\ No newline at end of file
@@ -0,0 +1,468 @@
+import os, json, sqlite3, threading
+from concurrent.futures import ThreadPoolExecutor
+
+from tinyelements.globals import INDEX_PATH, CRAWL_WORKERS
+from tinyelements.tinyelements_sequence import longest_sequence, frames_to_ranges, ranges_to_frames
+from tinyelements.tinyelements_crawler import scan_dir, crawl_element, crawl_library
+from tinyelements.tinyelements_catalog import read_catalog, catalog_is_current
+
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    mtime REAL
+);
+CREATE TABLE IF NOT EXISTS categories (
+    library TEXT,
+    name TEXT,
+    PRIMARY KEY (library, name)
+);
+CREATE TABLE IF NOT EXISTS elements (
+    library TEXT,
+    category TEXT,
+    name TEXT,
+    mtime REAL,
+    seq_name TEXT,
+    fname TEXT,
+    startframe INTEGER,
+    endframe INTEGER,
+    count INTEGER,
+    extension TEXT,
+    frame_format TEXT,
+    padding INTEGER,
+    separator TEXT,
+    frames TEXT,
+    mismatched_files TEXT,
+    has_thumb INTEGER,
+    width INTEGER,
+    height INTEGER,
+    channels INTEGER,
+    channel_names TEXT,
+    compression TEXT,
+    pixel_type TEXT,
+    PRIMARY KEY (library, category, name)
+);
+"""
+
+ELEMENT_COLUMNS = ['library', 'category', 'name', 'mtime', 'seq_name', 'fname', 'startframe', 'endframe',
+                   'count', 'extension', 'frame_format', 'padding', 'separator', 'frames',
+                   'mismatched_files', 'has_thumb', 'width', 'height', 'channels', 'channel_names',
+                   'compression', 'pixel_type']
+
+METADATA_COLUMNS = ['width', 'height', 'channels', 'compression', 'pixel_type']
+
+_shared_index = None
+
+
+def get_index(db_path=None):
+    """Hand back the index shared by the panel, loaders and thumbnail maker
+
+        Arguments:
+        db_path (string) : use the database at this path, defaults to INDEX_PATH
+
+        Returns:
+        LibraryIndex object.
+    """
+    global _shared_index
+    if _shared_index is None or (db_path is not None and _shared_index.db_path != db_path):
+        _shared_index = LibraryIndex(db_path or INDEX_PATH)
+    return _shared_index
+
+
+def get_mtime(path):
+    """mtime of a path, or None if it isn't there
+
+        Arguments:
+        path (string) : path to check
+
+        Returns:
+        float mtime or None.
+    """
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def list_subdirs(dir_path):
+    """Sorted names of the directories under dir_path, skipping the IGNORE_DIRS
+
+        Arguments:
+        dir_path (string) : the path to look in
+
+        Returns:
+        list of directory names.
+    """
+    try:
+        dirs, _ = scan_dir(dir_path)
+    except OSError:
+        dirs = []
+    return dirs
+
+
+def element_row(element):
+    """Flatten a crawled element down to what the index stores about it
+
+        Arguments:
+        element (dict) : result of tinyelements_crawler.crawl_element
+
+        Returns:
+        Dictionary of the element columns (minus library and category).
+    """
+    info = dict()
+    info['name'] = element['name']
+    info['mtime'] = element['mtime']
+    info['has_thumb'] = int(element['has_thumb'])
+
+    metadata = element.get('metadata') or dict()
+    for key in METADATA_COLUMNS:
+        info[key] = metadata.get(key)
+    info['channel_names'] = ','.join(metadata['channel_names']) if metadata else None
+
+    try:
+        seq = longest_sequence(element['sequences'])
+    except ValueError:
+        seq = None
+
+    if seq is None:
+        for key in ['seq_name', 'fname', 'startframe', 'endframe', 'count', 'extension',
+                    'frame_format', 'padding', 'separator', 'frames', 'mismatched_files']:
+            info[key] = None
+        return info
+
+    info['seq_name'] = seq['name']
+    info['fname'] = seq['fname']
+    info['startframe'] = seq['startframe']
+    info['endframe'] = seq['endframe']
+    info['count'] = seq['count']
+    info['extension'] = seq['extension']
+    info['frame_format'] = seq['frame_format']
+    info['padding'] = seq['padding']
+    info['separator'] = seq['separator']
+    info['frames'] = frames_to_ranges(seq['frames'])
+    info['mismatched_files'] = json.dumps(seq['mismatched_files'])
+    return info
+
+
+def scan_element(element_path, element):
+    """Look at an element directory and collect what the index stores about it
+
+        Arguments:
+        element_path (string) : full path to the element directory
+        element (string) : Name of the element
+
+        Returns:
+        Dictionary of the element columns (minus library and category).
+    """
+    return element_row(crawl_element(element_path, element))
+
+
+def row_to_sequence(row):
+    """Turn an element row back into the dictionary get_img_seq hands out
+
+        Arguments:
+        row (dict) : element row from the index
+
+        Returns:
+        sequence dictionary, or None if the element has no images.
+    """
+    if row is None or row['fname'] is None:
+        return None
+    seq = dict()
+    seq['name'] = row['seq_name']
+    seq['fname'] = row['fname']
+    seq['startframe'] = row['startframe']
+    seq['endframe'] = row['endframe']
+    seq['count'] = row['count']
+    seq['extension'] = row['extension']
+    seq['frame_format'] = row['frame_format']
+    seq['padding'] = row['padding']
+    seq['separator'] = row['separator']
+    seq['frames'] = ranges_to_frames(row['frames'] or '')
+    seq['mismatched_files'] = json.loads(row['mismatched_files'] or '[]')
+    seq['missing_frames'] = list()
+    if seq['frames'] and len(seq['frames']) != seq['endframe'] - seq['startframe'] + 1:
+        present = set(seq['frames'])
+        seq['missing_frames'] = [f for f in range(seq['startframe'], seq['endframe'] + 1) if f not in present]
+    return seq
+
+
+class LibraryIndex(object):
+    """SQLite-backed listing of libraries, categories and elements. A directory is
+        only looked at again when its mtime has changed since it was last indexed.
+
+    Arguments:
+    db_path (string) : where to keep the database, ':memory:' works for throwaway use
+
+    """
+
+    def __init__(self, db_path=INDEX_PATH):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        try:
+            if db_path != ':memory:' and not os.path.isdir(os.path.dirname(db_path)):
+                os.makedirs(os.path.dirname(db_path))
+            self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        except (OSError, sqlite3.Error) as e:
+            print('Can not open library index at %s, keeping it in memory:\n%s'%(db_path, e))
+            self.conn = sqlite3.connect(':memory:', check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.setup_schema()
+
+    def setup_schema(self):
+        """Create the tables, throwing out an index written by an older version.
+
+        Returns:
+        None.
+        """
+        with self.lock, self.conn:
+            version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+            if version != SCHEMA_VERSION:
+                self.conn.executescript('DROP TABLE IF EXISTS dirs; DROP TABLE IF EXISTS categories; '
+                                        'DROP TABLE IF EXISTS elements;')
+                self.conn.execute('PRAGMA user_version = %d'%SCHEMA_VERSION)
+            self.conn.executescript(SCHEMA)
+
+    def query(self, sql, params=()):
+        """Run a read query under the lock
+
+        Arguments:
+        sql (string) : the query
+        params (tuple) : query parameters
+
+        Returns:
+        list of sqlite3.Row.
+        """
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def is_current(self, path, mtime):
+        """Check the stored mtime for a directory against the one on disk
+
+        Arguments:
+        path (string) : directory path
+        mtime (float) : the mtime on disk right now
+
+        Returns:
+        bool.
+        """
+        rows = self.query('SELECT mtime FROM dirs WHERE path=?', (path,))
+        return len(rows) > 0 and rows[0]['mtime'] == mtime
+
+    def get_categories(self, library):
+        """Categories in a library - one stat when nothing has changed.
+
+        Arguments:
+        library (string) : path to the library root
+
+        Returns:
+        sorted list of category names.
+        """
+        mtime = get_mtime(library)
+        if mtime is None:
+            return []
+        if not self.is_current(library, mtime):
+            self.store_categories(library, list_subdirs(library), mtime)
+
+        rows = self.query('SELECT name FROM categories WHERE library=? ORDER BY name', (library,))
+        return [row['name'] for row in rows]
+
+    def store_categories(self, library, categories, mtime):
+        """Replace the category listing for a library
+
+        Arguments:
+        library (string) : path to the library root
+        categories (list) : category names
+        mtime (float) : mtime of the library root when it was listed
+
+        Returns:
+        None.
+        """
+        with self.lock, self.conn:
+            self.conn.execute('DELETE FROM categories WHERE library=?', (library,))
+            self.conn.executemany('INSERT INTO categories (library, name) VALUES (?, ?)',
+                                  [(library, name) for name in categories])
+            self.conn.execute('INSERT OR REPLACE INTO dirs (path, mtime) VALUES (?, ?)', (library, mtime))
+
+    def get_elements(self, library, category):
+        """Elements in a category - one stat when nothing has changed. When it has,
+            a published catalog newer than the directory is read in one go; failing
+            that, each element's directory is stat'd and only new or changed ones
+            are scanned.
+
+        Arguments:
+        library (string) : path to the library root
+        category (string) : category name
+
+        Returns:
+        list of element row dictionaries sorted by name.
+        """
+        category_path = os.path.join(library, category)
+        mtime = get_mtime(category_path)
+        if mtime is None:
+            return []
+
+        if not self.is_current(category_path, mtime):
+            catalog = read_catalog(library, category)
+            if catalog_is_current(catalog, mtime):
+                self.store_elements(library, category, catalog['elements'], mtime,
+                                    keep=[entry['name'] for entry in catalog['elements']])
+                return self.query_elements(library, category)
+
+            names = list_subdirs(category_path)
+            known = dict((row['name'], row['mtime']) for row in self.query(
+                'SELECT name, mtime FROM elements WHERE library=? AND category=?', (library, category)))
+
+            def scan_if_changed(name):
+                # the category's mtime only covers elements coming and going, not what's inside them
+                element_path = os.path.join(category_path, name)
+                if name in known and get_mtime(element_path) == known[name]:
+                    return None
+                return scan_element(element_path, name)
+
+            with ThreadPoolExecutor(max_workers=CRAWL_WORKERS) as pool:
+                scanned = [info for info in pool.map(scan_if_changed, names) if info is not None]
+            self.store_elements(library, category, scanned, mtime, keep=names)
+
+        return self.query_elements(library, category)
+
+    def query_elements(self, library, category):
+        rows = self.query('SELECT * FROM elements WHERE library=? AND category=? ORDER BY name',
+                          (library, category))
+        return [dict(row) for row in rows]
+
+    def store_elements(self, library, category, elements, mtime=None, keep=None):
+        """Write scanned element info into the index
+
+        Arguments:
+        library (string) : path to the library root
+        category (string) : category name
+        elements (list) : dictionaries from scan_element
+        mtime (float) : mtime of the category directory, when the whole listing is known
+        keep (list) : every element name in the category - anything else is dropped
+
+        Returns:
+        None.
+        """
+        category_path = os.path.join(library, category)
+        sql = 'INSERT OR REPLACE INTO elements (%s) VALUES (%s)'%(', '.join(ELEMENT_COLUMNS),
+                                                                   ', '.join('?' * len(ELEMENT_COLUMNS)))
+        rows = list()
+        for element in elements:
+            element = dict(element, library=library, category=category)
+            rows.append([element[c] for c in ELEMENT_COLUMNS])
+
+        with self.lock, self.conn:
+            if keep is not None:
+                existing = self.conn.execute('SELECT name FROM elements WHERE library=? AND category=?',
+                                             (library, category)).fetchall()
+                keep = set(keep)
+                gone = [(library, category, row['name']) for row in existing if row['name'] not in keep]
+                self.conn.executemany('DELETE FROM elements WHERE library=? AND category=? AND name=?', gone)
+            self.conn.executemany(sql, rows)
+            if mtime is not None:
+                self.conn.execute('INSERT OR REPLACE INTO dirs (path, mtime) VALUES (?, ?)', (category_path, mtime))
+
+    def index_library(self, library, workers=CRAWL_WORKERS, categories=None):
+        """Crawl a whole library in parallel and replace what the index has for it
+
+        Arguments:
+        library (string) : path to the library root
+        workers (int) : how many directories to look at at once
+        categories (list) : only index these categories, defaults to all of them
+
+        Returns:
+        the crawl tree from crawl_library, timings included.
+        """
+        tree = crawl_library(library, workers=workers, categories=categories)
+        if tree['mtime'] is None:
+            return tree
+
+        if categories is None:
+            self.store_categories(library, sorted(tree['categories'].keys()), tree['mtime'])
+        for category, category_info in tree['categories'].items():
+            rows = [element_row(element) for element in category_info['elements'].values()]
+            self.store_elements(library, category, rows, category_info['mtime'],
+                                keep=list(category_info['elements'].keys()))
+        return tree
+
+    def get_element(self, library, category, element):
+        """Info for a single element, rescanning it only when its directory changed
+
+        Arguments:
+        library (string) : path to the library root
+        category (string) : category name
+        element (string) : Name of the element
+
+        Returns:
+        element row dictionary, or None if the element isn't there.
+        """
+        element_path = os.path.join(library, category, element)
+        mtime = get_mtime(element_path)
+        if mtime is None:
+            return None
+
+        rows = self.query('SELECT * FROM elements WHERE library=? AND category=? AND name=?',
+                          (library, category, element))
+        if rows and rows[0]['mtime'] == mtime:
+            return dict(rows[0])
+        return self.refresh_element(library, category, element)
+
+    def refresh_element(self, library, category, element):
+        """Rescan a single element no matter what the index thinks
+
+        Arguments:
+        library (string) : path to the library root
+        category (string) : category name
+        element (string) : Name of the element
+
+        Returns:
+        element row dictionary.
+        """
+        info = scan_element(os.path.join(library, category, element), element)
+        self.store_elements(library, category, [info])
+        return dict(info, library=library, category=category)
+
+    def remove_element(self, library, category, element):
+        """Drop an element that's gone from disk
+
+        Arguments:
+        library (string) : path to the library root
+        category (string) : category name
+        element (string) : Name of the element
+
+        Returns:
+        None.
+        """
+        with self.lock, self.conn:
+            self.conn.execute('DELETE FROM elements WHERE library=? AND category=? AND name=?',
+                              (library, category, element))
+
+    def get_sequence(self, library, category, element):
+        """Sequence info for an element in the same shape get_img_seq gives
+
+        Arguments:
+        library (string) : path to the library root
+        category (string) : category name
+        element (string) : Name of the element
+
+        Returns:
+        sequence dictionary.
+        """
+        seq = row_to_sequence(self.get_element(library, category, element))
+        if seq is None:
+            raise ValueError('no image sequence found in %s'%os.path.join(library, category, element))
+        return seq
+
+    def invalidate(self, path):
+        """Forget the stored mtime for a directory so it is looked at next time
+
+        Arguments:
+        path (string) : directory path
+
+        Returns:
+        None.
+        """
+        with self.lock, self.conn:
+            self.conn.execute('DELETE FROM dirs WHERE path=?', (path,))
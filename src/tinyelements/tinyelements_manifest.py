@@ -0,0 +1,166 @@
+import os, json, hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+from tinyelements.globals import MANIFEST_NAME, MANIFEST_HASH, CRAWL_WORKERS
+from tinyelements.tinyelements_crawler import scan_dir
+from tinyelements.tinyelements_files import temp_file
+
+# A manifest sits in each element directory and records, per file, its size, mtime and
+# content hash. Copies also record the size and mtime the source had, so a later sync can
+# tell what changed without reading any frames, and list under 'pending' any files a
+# cancelled copy didn't get to.
+
+MANIFEST_VERSION = 1
+
+HASH_CHUNK = 1024 * 1024
+
+
+def manifest_path(element_path):
+    return os.path.join(element_path, MANIFEST_NAME)
+
+
+def hash_file(path, algorithm=MANIFEST_HASH):
+    """Content hash of a file, read in chunks so a 4K exr doesn't land in memory at once
+
+        Arguments:
+        path (string) : the file
+        algorithm (string) : 'blake2b', an xxhash one ('xxh64', 'xxh3_64', 'xxh3_128')
+                             if xxhash is installed, or anything hashlib knows
+
+        Returns:
+        hex digest string.
+    """
+    if algorithm == 'blake2b':
+        digest = hashlib.blake2b(digest_size=16)
+    elif algorithm.startswith('xxh'):
+        if xxhash is None:
+            raise ValueError('%s needs the xxhash module'%algorithm)
+        digest = getattr(xxhash, algorithm)()
+    else:
+        digest = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(HASH_CHUNK)
+            if not data:
+                break
+            digest.update(data)
+    return digest.hexdigest()
+
+
+def read_manifest(element_path):
+    """Load an element's manifest
+
+        Arguments:
+        element_path (string) : full path to the element directory
+
+        Returns:
+        manifest dictionary, or None if there isn't a usable one.
+    """
+    try:
+        with open(manifest_path(element_path)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('version') != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def write_manifest(element_path, manifest):
+    """Write a manifest under a temp name and rename it into place
+
+        Arguments:
+        element_path (string) : full path to the element directory
+        manifest (dict) : from new_manifest
+
+        Returns:
+        path written.
+    """
+    path = manifest_path(element_path)
+    handle, temp_path = temp_file(path)
+    try:
+        with os.fdopen(handle, 'w') as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return path
+
+
+def new_manifest(element, algorithm=MANIFEST_HASH):
+    return {'version': MANIFEST_VERSION, 'element': element, 'algorithm': algorithm, 'files': dict()}
+
+
+def file_entry(path, digest=None, source=None):
+    """One file's manifest entry
+
+        Arguments:
+        path (string) : the file
+        digest (string) : its content hash, if known
+        source (dict) : entry of the file it was copied from
+
+        Returns:
+        dictionary of size, mtime, hash and, for copies, source_size and source_mtime.
+    """
+    stat = os.stat(path)
+    entry = {'size': stat.st_size, 'mtime': stat.st_mtime, 'hash': digest}
+    if source is not None:
+        entry['source_size'] = source['size']
+        entry['source_mtime'] = source['mtime']
+    return entry
+
+
+def content_index(library, workers=CRAWL_WORKERS):
+    """Every hashed file in a library's manifests, so a frame that's already there can be
+        found by its content
+
+        Arguments:
+        library (string) : path to the library root
+        workers (int) : how many manifests to read at once
+
+        Returns:
+        dictionary of (algorithm, hash) : (full path, size, mtime).
+    """
+    try:
+        categories, _ = scan_dir(library)
+    except OSError:
+        return dict()
+
+    def element_dirs(category):
+        try:
+            return [os.path.join(library, category, name) for name in scan_dir(os.path.join(library, category))[0]]
+        except OSError:
+            return []
+
+    index = dict()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        paths = [path for paths in pool.map(element_dirs, categories) for path in paths]
+        for element_path, manifest in zip(paths, pool.map(read_manifest, paths)):
+            add_to_content_index(index, element_path, manifest)
+    return index
+
+
+def add_to_content_index(index, element_path, manifest):
+    """Add the hashed files of one element's manifest to a content_index, so files copied
+        during a load can be found without reading the whole library again
+
+        Arguments:
+        index (dict) : from content_index, updated in place
+        element_path (string) : full path to the element directory
+        manifest (dict) : the element's manifest, may be None
+
+        Returns:
+        None.
+    """
+    if manifest is None:
+        return
+    for filename, entry in manifest['files'].items():
+        if entry.get('hash'):
+            index[(manifest['algorithm'], entry['hash'])] = (os.path.join(element_path, filename),
+                                                             entry['size'], entry['mtime'])
@@ -0,0 +1,202 @@
+import os, struct
+
+# enough for the header of anything but an exr stuffed with metadata, which gets a second read
+HEADER_BYTES = 16 * 1024
+MAX_HEADER_BYTES = 1024 * 1024
+
+EXR_COMPRESSION = ['none', 'rle', 'zips', 'zip', 'piz', 'pxr24', 'b44', 'b44a', 'dwaa', 'dwab']
+EXR_PIXEL_TYPES = ['uint32', 'half', 'float']
+
+PNG_CHANNELS = {0: ['Y'], 2: ['R', 'G', 'B'], 3: ['R', 'G', 'B'], 4: ['Y', 'A'], 6: ['R', 'G', 'B', 'A']}
+JPEG_CHANNELS = {1: ['Y'], 3: ['R', 'G', 'B'], 4: ['C', 'M', 'Y', 'K']}
+TIFF_COMPRESSION = {1: 'none', 2: 'ccitt', 5: 'lzw', 6: 'ojpeg', 7: 'jpeg', 8: 'deflate', 32773: 'packbits',
+                    32946: 'deflate', 34925: 'lzma', 50000: 'zstd'}
+TIFF_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8, 16: 8}
+
+
+def make_info(format, width, height, channel_names, compression, pixel_type):
+    info = dict()
+    info['format'] = format
+    info['width'] = width
+    info['height'] = height
+    info['channels'] = len(channel_names)
+    info['channel_names'] = channel_names
+    info['compression'] = compression
+    info['pixel_type'] = pixel_type
+    return info
+
+
+def read_cstring(data, pos):
+    end = data.index(b'\0', pos)
+    return data[pos:end].decode('latin-1'), end + 1
+
+
+def read_exr(data, path):
+    """Walk the attributes of the first (or only) part of an OpenEXR header"""
+    pos = 8
+    channel_names = list()
+    pixel_types = set()
+    info = {'compression': None, 'dataWindow': None}
+    while True:
+        if pos >= len(data):
+            raise ValueError('header runs past what was read')
+        name, pos = read_cstring(data, pos)
+        if not name:
+            break
+        _, pos = read_cstring(data, pos)
+        size = struct.unpack_from('<i', data, pos)[0]
+        pos += 4
+        value = data[pos:pos + size]
+        if len(value) < size:
+            raise ValueError('header runs past what was read')
+        pos += size
+
+        if name == 'channels':
+            at = 0
+            while value[at:at + 1] not in [b'\0', b'']:
+                channel, at = read_cstring(value, at)
+                channel_names.append(channel)
+                pixel_type = struct.unpack_from('<i', value, at)[0]
+                pixel_types.add(EXR_PIXEL_TYPES[pixel_type] if 0 <= pixel_type < 3 else str(pixel_type))
+                at += 16
+        elif name == 'compression':
+            code = value[0]
+            info['compression'] = EXR_COMPRESSION[code] if code < len(EXR_COMPRESSION) else str(code)
+        elif name == 'dataWindow':
+            info['dataWindow'] = struct.unpack('<iiii', value)
+
+    if info['dataWindow'] is None:
+        raise ValueError('no dataWindow in %s'%path)
+    x_min, y_min, x_max, y_max = info['dataWindow']
+    return make_info('exr', x_max - x_min + 1, y_max - y_min + 1, channel_names, info['compression'],
+                     '/'.join(sorted(pixel_types)) or None)
+
+
+def read_png(data, path):
+    if data[12:16] != b'IHDR':
+        raise ValueError('no IHDR in %s'%path)
+    width, height, depth, color_type = struct.unpack_from('>IIBB', data, 16)
+    return make_info('png', width, height, PNG_CHANNELS.get(color_type, []), 'deflate',
+                     'palette' if color_type == 3 else 'uint%d'%depth)
+
+
+def read_jpeg(data, path):
+    pos = 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xff:
+            raise ValueError('lost sync in %s'%path)
+        marker = data[pos + 1]
+        if marker == 0xff:
+            # fill byte
+            pos += 1
+            continue
+        length = struct.unpack_from('>H', data, pos + 2)[0]
+        # SOF0 to SOF15, minus DHT, JPG and DAC which share the range
+        if 0xc0 <= marker <= 0xcf and marker not in [0xc4, 0xc8, 0xcc]:
+            depth, height, width, components = struct.unpack_from('>BHHB', data, pos + 4)
+            compression = 'progressive' if marker in [0xc2, 0xc6, 0xca, 0xce] else 'baseline'
+            return make_info('jpeg', width, height, JPEG_CHANNELS.get(components, ['C%d'%i for i in range(components)]),
+                             compression, 'uint%d'%depth)
+        pos += 2 + length
+    raise ValueError('no frame header in the first %d bytes of %s'%(len(data), path))
+
+
+def read_tiff(data, path):
+    endian = '<' if data[:2] == b'II' else '>'
+    magic, offset = struct.unpack_from(endian + 'HI', data, 2)
+    if magic != 42:
+        raise ValueError('%s is a BigTIFF or not a tiff'%path)
+    if offset + 2 > len(data):
+        raise ValueError('first directory is past what was read')
+
+    tags = dict()
+    count = struct.unpack_from(endian + 'H', data, offset)[0]
+    for i in range(count):
+        entry = offset + 2 + i * 12
+        if entry + 12 > len(data):
+            break
+        tag, kind, n = struct.unpack_from(endian + 'HHI', data, entry)
+        size = TIFF_TYPE_SIZES.get(kind, 1)
+        fmt = {1: 'B', 3: 'H', 4: 'I'}.get(kind)
+        if fmt is None:
+            continue
+        at = entry + 8 if size * n <= 4 else struct.unpack_from(endian + 'I', data, entry + 8)[0]
+        if at + size * n > len(data):
+            continue
+        tags[tag] = struct.unpack_from(endian + fmt * n, data, at)
+
+    if 256 not in tags or 257 not in tags:
+        raise ValueError('no image size in %s'%path)
+    samples = tags.get(277, (1,))[0]
+    bits = tags.get(258, (1,))[0]
+    sample_format = {1: 'uint', 2: 'int', 3: 'float'}.get(tags.get(339, (1,))[0], 'uint')
+    extra = len(tags.get(338, ()))
+    names = (['Y'] if samples - extra < 3 else ['R', 'G', 'B']) + ['A'] * extra
+    names = names[:samples] + ['C%d'%i for i in range(len(names), samples)]
+    compression = tags.get(259, (1,))[0]
+    return make_info('tiff', tags[256][0], tags[257][0], names, TIFF_COMPRESSION.get(compression, str(compression)),
+                     '%s%d'%(sample_format, bits))
+
+
+def read_hdr(data, path):
+    lines = data.split(b'\n')
+    compression = 'rle'
+    for i, line in enumerate(lines[1:], 1):
+        if line.startswith(b'FORMAT=') and b'xyze' in line:
+            compression = 'rle xyze'
+        if not line.strip():
+            size = lines[i + 1].split()
+            if len(size) != 4:
+                break
+            # e.g. -Y 1080 +X 1920, either axis can come first
+            dims = {size[0][1:2]: int(size[1]), size[2][1:2]: int(size[3])}
+            return make_info('hdr', dims[b'X'], dims[b'Y'], ['R', 'G', 'B'], compression, 'rgbe')
+    raise ValueError('no resolution line in %s'%path)
+
+
+def read_image_header(path):
+    """Resolution, channels, compression and pixel type from the first few KB of
+        an image, without decoding any pixels
+
+        Arguments:
+        path (string) : the image
+
+        Returns:
+        Dictionary containing:
+                info['format'] : exr, png, jpeg, tiff or hdr
+                info['width'] : width in pixels (data window for exr)
+                info['height'] : height in pixels
+                info['channels'] : channel count
+                info['channel_names'] : list of channel names
+                info['compression'] : compression name
+                info['pixel_type'] : e.g. half, float, uint8, uint16, rgbe
+
+        Raises ValueError for formats it doesn't know or headers it can't make sense of.
+    """
+    with open(path, 'rb') as f:
+        data = f.read(HEADER_BYTES)
+        try:
+            return parse_header(data, path)
+        except (ValueError, struct.error, IndexError):
+            # exr headers can carry a lot of metadata before the dataWindow
+            if not data.startswith(b'\x76\x2f\x31\x01') or len(data) < HEADER_BYTES:
+                raise
+            data += f.read(MAX_HEADER_BYTES - len(data))
+    return parse_header(data, path)
+
+
+def parse_header(data, path):
+    try:
+        if data.startswith(b'\x76\x2f\x31\x01'):
+            return read_exr(data, path)
+        if data.startswith(b'\x89PNG\r\n\x1a\n'):
+            return read_png(data, path)
+        if data.startswith(b'\xff\xd8'):
+            return read_jpeg(data, path)
+        if data[:4] in [b'II*\0', b'MM\0*']:
+            return read_tiff(data, path)
+        if data.startswith(b'#?'):
+            return read_hdr(data, path)
+    except (struct.error, IndexError) as e:
+        raise ValueError('bad header in %s : %s'%(path, e))
+    raise ValueError('%s is not an image format the header reader knows'%os.path.basename(path))
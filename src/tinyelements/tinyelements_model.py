@@ -0,0 +1,186 @@
+from PySide2.QtCore import *
+from PySide2.QtGui import QPixmap
+
+HEADERS = ['Thumb', 'Element Name']
+
+
+class ElementTableModel(QAbstractTableModel):
+    """Element listing for the panel's table. Only the rows the view asks for
+        are ever looked at, so thumbnail presence is worked out lazily for
+        visible rows and cached on the row. With a contact sheet set, the Thumb
+        column shows each element's tile cropped out of the one sheet image.
+
+    Arguments:
+    thumb_resolver (function) : called with an element name when a row doesn't know
+                                whether it has a thumbnail yet, returns a bool
+
+    """
+
+    def __init__(self, thumb_resolver=None, parent=None):
+        QAbstractTableModel.__init__(self, parent)
+        self.thumb_resolver = thumb_resolver
+        self.rows = list()
+        self.positions = dict()
+        self.sheet = None
+        self.tile_cache = dict()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return HEADERS[section]
+        return QAbstractTableModel.headerData(self, section, orientation, role)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in [Qt.DisplayRole, Qt.DecorationRole]:
+            return None
+        row = self.rows[index.row()]
+        if index.column() == 1:
+            if role != Qt.DisplayRole:
+                return None
+            if row.get('show_category'):
+                return '%s  [%s]'%(row['name'], row['category'])
+            return row['name']
+
+        tile = self.tile(row)
+        if role == Qt.DecorationRole:
+            return tile
+        if tile is not None:
+            return None
+
+        if row.get('has_thumb') is None:
+            row['has_thumb'] = bool(self.thumb_resolver(row['name'])) if self.thumb_resolver else False
+        return 'yes' if row['has_thumb'] else 'no'
+
+    def set_elements(self, rows, thumb_resolver=None):
+        """Swap in a whole new listing
+
+        Arguments:
+        rows (list) : dictionaries with at least 'name', and 'has_thumb' if it's known
+        thumb_resolver (function) : replaces the resolver for unknown thumbnails
+
+        Returns:
+        None.
+        """
+        self.beginResetModel()
+        if thumb_resolver is not None:
+            self.thumb_resolver = thumb_resolver
+        self.rows = [dict(row) for row in rows]
+        self.reindex()
+        self.endResetModel()
+
+    def tile(self, row):
+        """Mini-thumbnail for a row from the contact sheet, cropped the first time
+            it's drawn
+
+        Arguments:
+        row (dict) : element row
+
+        Returns:
+        QPixmap or None.
+        """
+        # search results span categories, the sheet only covers the one listed
+        if self.sheet is None or row.get('show_category'):
+            return None
+        name = row['name']
+        if name not in self.tile_cache:
+            rect = self.sheet['tiles'].get(name)
+            self.tile_cache[name] = QPixmap.fromImage(self.sheet['image'].copy(*rect)) if rect else None
+        return self.tile_cache[name]
+
+    def set_contact_sheet(self, sheet):
+        """Use a category contact sheet for the Thumb column
+
+        Arguments:
+        sheet (dict) : image (QImage) and tiles (name : [x, y, w, h]), or None to go
+                       back to yes/no
+
+        Returns:
+        None.
+        """
+        self.sheet = sheet
+        self.tile_cache = dict()
+        if self.rows:
+            self.dataChanged.emit(self.index(0, 0), self.index(len(self.rows) - 1, 0))
+
+    def reindex(self):
+        self.positions = dict((row['name'], i) for i, row in enumerate(self.rows))
+
+    def row_at(self, i):
+        return self.rows[i]
+
+    def element_names(self):
+        return [row['name'] for row in self.rows]
+
+    def add_element(self, row):
+        """Add or replace a single element
+
+        Arguments:
+        row (dict) : element row, needs at least 'name'
+
+        Returns:
+        None.
+        """
+        if row['name'] in self.positions:
+            i = self.positions[row['name']]
+            self.rows[i] = dict(row)
+            self.dataChanged.emit(self.index(i, 0), self.index(i, len(HEADERS) - 1))
+            return
+
+        i = len(self.rows)
+        self.beginInsertRows(QModelIndex(), i, i)
+        self.rows.append(dict(row))
+        self.positions[row['name']] = i
+        self.endInsertRows()
+
+    def remove_element(self, name):
+        """Drop a single element if it's in the listing
+
+        Arguments:
+        name (string) : Name of the element
+
+        Returns:
+        None.
+        """
+        if name not in self.positions:
+            return
+        i = self.positions[name]
+        self.beginRemoveRows(QModelIndex(), i, i)
+        del self.rows[i]
+        self.reindex()
+        self.endRemoveRows()
+
+    def set_thumb(self, name, has_thumb=True):
+        """Flip the Thumb column for one element
+
+        Arguments:
+        name (string) : Name of the element
+        has_thumb (bool) : whether it has a thumbnail now
+
+        Returns:
+        None.
+        """
+        if name not in self.positions:
+            return
+        i = self.positions[name]
+        self.rows[i]['has_thumb'] = has_thumb
+        self.dataChanged.emit(self.index(i, 0), self.index(i, 0))
+
+
+class ElementFilterModel(QSortFilterProxyModel):
+    """Sorts the element table and filters it by a case-insensitive name match,
+        all in memory."""
+
+    def __init__(self, parent=None):
+        QSortFilterProxyModel.__init__(self, parent)
+        self.setFilterKeyColumn(1)
+        self.setFilterCaseSensitivity(Qt.CaseInsensitive)
+        self.setSortCaseSensitivity(Qt.CaseInsensitive)
@@ -0,0 +1,149 @@
+import os, time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+
+from tinyelements.globals import PLAN_WORKERS, SOURCE_POINT_TOLERANCE
+from tinyelements.tinyelements_index import get_index, row_to_sequence
+from tinyelements.tinyelements_search import read_sidecar
+from tinyelements.tinyelements_curves import read_source_point
+from tinyelements.tinyelements_copy import element_needs_sync
+from tinyelements.tinyelements_profiling import span
+
+# Everything a load needs from the filesystem, worked out up front across a thread pool
+# so the lookups overlap, and handed back as a plan that can be looked at (or tested)
+# before anything touches the node graph. Nothing in here needs nuke.
+
+ElementPlan = namedtuple('ElementPlan', [
+    'element',          # Name of the element
+    'element_dir',      # where it'll be loaded from, the show copy if there is or will be one
+    'source_dir',       # where its frames are now
+    'file',             # full sequence path under element_dir, frame number as %04d or the like
+    'start',            # first frame
+    'end',              # last frame
+    'from_global_lib',  # bool
+    'needs_copy',       # bool - has to be copied or synced into the show before it's loaded
+    'width',            # resolution from the image header, None if it couldn't be read
+    'height',
+    'metadata',         # the element's index row, read only
+    'source_point',     # sidecar Source Point keys, read only, None if there's no sidecar
+    'error',            # why it can't be loaded, None if it can
+])
+
+LoadPlan = namedtuple('LoadPlan', [
+    'category',
+    'load_type',
+    'start_frame',
+    'global_lib',
+    'show_lib',
+    'elements',         # tuple of ElementPlan, in the order asked for
+    'elapsed',          # seconds spent planning
+])
+
+
+def freeze_source_point(source_point):
+    curves = tuple(tuple(tuple(key) for key in curve) for curve in source_point['curves'])
+    return MappingProxyType({'curves': curves})
+
+
+def plan_element(load_info, element, index=None):
+    """Look up one element: which library it loads from, whether it needs copying (or a
+        show copy needs bringing up to date), its sequence, header info and sidecar
+
+        Arguments:
+        load_info (dict) : see load_element_list
+        element (string) : Name of the element
+        index (LibraryIndex) : defaults to the shared index
+
+        Returns:
+        ElementPlan.
+    """
+    if index is None:
+        index = get_index()
+    category = load_info['category']
+    show_dir = os.path.join(load_info['show_lib'], category, element)
+    global_dir = os.path.join(load_info['global_lib'], category, element)
+
+    in_show = os.path.isdir(show_dir)
+    needs_copy = False
+    if load_info['copy_to'] and os.path.isdir(global_dir):
+        with span('sync', element):
+            needs_copy = not in_show or element_needs_sync(load_info, element)
+    from_global_lib = not (in_show or needs_copy)
+    source_dir = global_dir if (needs_copy or not in_show) else show_dir
+    element_dir = global_dir if from_global_lib else show_dir
+
+    plan = dict(element=element, element_dir=element_dir, source_dir=source_dir, file=None, start=None,
+                end=None, from_global_lib=from_global_lib, needs_copy=needs_copy, width=None, height=None,
+                metadata=None, source_point=None, error=None)
+
+    # a copy is frame for frame, so until it's made (or synced) the source stands in for it
+    library = load_info['global_lib'] if source_dir == global_dir else load_info['show_lib']
+    with span('sequence', element) as timer:
+        row = index.get_element(library, category, element)
+        seq = row_to_sequence(row)
+        timer.set(files=seq['count'] if seq else 0)
+    if seq is None:
+        plan['error'] = 'Can not find element at %s'%source_dir
+        return ElementPlan(**plan)
+
+    with span('sidecar', element, files=1):
+        sidecar = read_sidecar(source_dir, element)
+
+    plan['file'] = os.path.join(element_dir, seq['fname'])
+    plan['start'] = seq['startframe']
+    plan['end'] = seq['endframe']
+    plan['width'] = row.get('width')
+    plan['height'] = row.get('height')
+    plan['metadata'] = MappingProxyType(dict(row))
+    if 'source_point' in sidecar:
+        try:
+            plan['source_point'] = freeze_source_point(read_source_point(sidecar['source_point'], SOURCE_POINT_TOLERANCE))
+        except (KeyError, TypeError, ValueError, IndexError) as e:
+            print('Ignoring the Source Point in the %s sidecar : %s'%(element, e))
+    return ElementPlan(**plan)
+
+
+def plan_load(load_info, workers=PLAN_WORKERS, index=None):
+    """Resolve every element in a load across a thread pool, without touching nuke
+
+        Arguments:
+        load_info (dict) : see load_element_list
+        workers (int) : how many elements to look up at once
+        index (LibraryIndex) : defaults to the shared index
+
+        Returns:
+        LoadPlan.
+    """
+    start = time.perf_counter()
+    if index is None:
+        index = get_index()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        elements = tuple(pool.map(lambda element: plan_element(load_info, element, index),
+                                  load_info['element_list']))
+    return LoadPlan(category=load_info['category'], load_type=load_info['type'],
+                    start_frame=load_info['start_frame'], global_lib=load_info['global_lib'],
+                    show_lib=load_info['show_lib'], elements=elements, elapsed=time.perf_counter() - start)
+
+
+def plan_to_dict(plan):
+    """Plain dictionaries and lists for a plan, for printing or json
+
+        Arguments:
+        plan (LoadPlan) : from plan_load
+
+        Returns:
+        dictionary.
+    """
+    info = plan._asdict()
+    elements = list()
+    for element in plan.elements:
+        element = element._asdict()
+        if element['metadata'] is not None:
+            element['metadata'] = dict(element['metadata'])
+        if element['source_point'] is not None:
+            element['source_point'] = {'curves': [[list(key) for key in curve]
+                                                  for curve in element['source_point']['curves']]}
+        elements.append(element)
+    info['elements'] = elements
+    return info
@@ -0,0 +1,212 @@
+import os, threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PySide2.QtCore import QByteArray
+from PySide2.QtGui import QImage
+
+from tinyelements.globals import STRIP_DIR, PREVIEW_CACHE_MB, PREVIEW_WORKERS
+from tinyelements.tinyelements_cache import LRUCache
+from tinyelements.tinyelements_thumbmaker import strip_index_path, read_strip_index, contact_map_path, read_contact_map
+
+
+def image_bytes(image):
+    try:
+        return image.sizeInBytes()
+    except AttributeError:
+        return image.byteCount()
+
+
+def preview_key(element_path, element, size):
+    """Work out what would be shown for an element, and key it by path and mtime so
+        a rebuilt thumbnail is never served stale
+
+        Arguments:
+        element_path (string) : full path to the element directory
+        element (string) : Name of the element
+        size (int) : preview height
+
+        Returns:
+        ('strip', index path, size, mtime) or ('gif', gif path, mtime), or None if the
+        element has no thumbnail.
+    """
+    index_path = strip_index_path(element_path, element)
+    try:
+        return ('strip', index_path, size, os.stat(index_path).st_mtime)
+    except OSError:
+        pass
+    gif_path = os.path.join(element_path, element + '.gif')
+    try:
+        return ('gif', gif_path, os.stat(gif_path).st_mtime)
+    except OSError:
+        return None
+
+
+def load_preview(key, element_path, element):
+    """Read a preview off disk. Only QImage and QByteArray in here, so it can run
+        off the UI thread.
+
+        Arguments:
+        key (tuple) : from preview_key
+        element_path (string) : full path to the element directory
+        element (string) : Name of the element
+
+        Returns:
+        (preview dictionary, bytes it costs) or None if it couldn't be read.
+    """
+    if key[0] == 'gif':
+        with open(key[1], 'rb') as f:
+            data = f.read()
+        return {'kind': 'gif', 'data': QByteArray(data)}, len(data)
+
+    strip_index = read_strip_index(element_path, element)
+    if strip_index is None:
+        return None
+    entry = strip_index['sizes'].get(str(key[2]))
+    if entry is None or not entry['rects']:
+        # strips made before this size existed, fall back to the gif
+        return load_preview(('gif', os.path.join(element_path, element + '.gif')), element_path, element)
+    image = QImage(os.path.join(element_path, STRIP_DIR, entry['file']))
+    if image.isNull():
+        return None
+    return {'kind': 'strip', 'image': image, 'rects': entry['rects']}, image_bytes(image)
+
+
+def load_contact_sheet(library, category):
+    """Read a category's contact sheet and its tile map
+
+        Arguments:
+        library (string) : path to the library root
+        category (string) : category name
+
+        Returns:
+        (dictionary of image and tiles, bytes it costs) or None if there isn't one.
+    """
+    contact_map = read_contact_map(library, category)
+    if contact_map is None:
+        return None
+    image = QImage(os.path.join(os.path.dirname(contact_map_path(library, category)), contact_map['file']))
+    if image.isNull():
+        return None
+    return {'image': image, 'tiles': contact_map['elements']}, image_bytes(image)
+
+
+class PreviewCache(object):
+    """Previews held in memory under a byte budget, with a background loader to
+        fetch the ones likely to be asked for next.
+
+    Arguments:
+    budget_mb (int) : memory budget for decoded previews
+    workers (int) : background loader threads
+
+    """
+
+    def __init__(self, budget_mb=PREVIEW_CACHE_MB, workers=PREVIEW_WORKERS):
+        self.cache = LRUCache(budget_mb * 1024 * 1024)
+        self.pool = ThreadPoolExecutor(max_workers=max(1, workers))
+        self.lock = threading.Lock()
+        # key : Event for loads in flight, so a click waits on a prefetch instead of repeating it
+        self.loading = dict()
+        self.generation = 0
+
+    def fetch(self, element_path, element, size):
+        """Preview for an element, from memory if it's there
+
+        Arguments:
+        element_path (string) : full path to the element directory
+        element (string) : Name of the element
+        size (int) : preview height
+
+        Returns:
+        preview dictionary - kind 'strip' with image and rects, or kind 'gif' with data -
+        or None if the element has no thumbnail.
+        """
+        key = preview_key(element_path, element, size)
+        if key is None:
+            return None
+        value = self.cache.get(key)
+        if value is not None:
+            return value
+        return self.load(key, element_path, element)
+
+    def load(self, key, element_path, element):
+        """Load a preview into the cache, or wait for the load already in flight for it
+
+        Returns:
+        preview dictionary, or None if there isn't one.
+        """
+        with self.lock:
+            pending = self.loading.get(key)
+            if pending is None:
+                done = self.loading[key] = threading.Event()
+        if pending is not None:
+            pending.wait()
+            value = self.cache.get(key)
+            if value is not None:
+                return value
+            # too big to keep, or it failed - try it here
+            return self.load(key, element_path, element)
+
+        value = None
+        try:
+            loaded = load_preview(key, element_path, element)
+            if loaded is not None:
+                value, size = loaded
+                # in the cache before anyone waiting is woken
+                self.cache.put(key, value, size)
+        except (OSError, ValueError):
+            pass
+        finally:
+            with self.lock:
+                del self.loading[key]
+            done.set()
+        return value
+
+    def fetch_sheet(self, library, category):
+        """Contact sheet for a category, from memory if it's there
+
+        Arguments:
+        library (string) : path to the library root
+        category (string) : category name
+
+        Returns:
+        dictionary of image and tiles, or None if the category has no sheet.
+        """
+        map_path = contact_map_path(library, category)
+        try:
+            key = ('sheet', map_path, os.stat(map_path).st_mtime)
+        except OSError:
+            return None
+        value = self.cache.get(key)
+        if value is None:
+            loaded = load_contact_sheet(library, category)
+            if loaded is None:
+                return None
+            value, size = loaded
+            self.cache.put(key, value, size)
+        return value
+
+    def prefetch(self, elements):
+        """Load previews in the background, dropping any still queued from an
+            earlier call since the selection has moved on
+
+        Arguments:
+        elements (list) : (element_path, element, size) tuples, most wanted first
+
+        Returns:
+        None.
+        """
+        self.generation += 1
+        for element_path, element, size in elements:
+            self.pool.submit(self.prefetch_one, self.generation, element_path, element, size)
+
+    def prefetch_one(self, generation, element_path, element, size):
+        if generation != self.generation:
+            return
+        key = preview_key(element_path, element, size)
+        if key is None or key in self.cache:
+            return
+        self.load(key, element_path, element)
+
+    def shutdown(self):
+        self.generation += 1
+        self.pool.shutdown(wait=False)
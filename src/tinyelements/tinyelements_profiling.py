@@ -0,0 +1,162 @@
+import sys, json, time, pstats, cProfile, threading, functools
+
+from tinyelements.globals import PROFILE_LOG
+
+# where span records go - None means instrumentation is off and spans cost one check
+_sink = None
+_sink_lock = threading.Lock()
+_profile_next = None
+
+
+class NullSpan(object):
+    """Stand-in handed out while instrumentation is off"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **fields):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+class Span(object):
+    """Times a named phase of work and emits one record when it closes.
+
+    Arguments:
+    phase (string) : what's being timed - 'sequence', 'copy', 'nodes', 'sidecar', 'ffmpeg' ...
+    element (string) : Name of the element it's for, if any
+    fields : anything else to put in the record (bytes, files ...)
+
+    """
+
+    def __init__(self, phase, element=None, **fields):
+        self.record = dict(fields)
+        self.record['phase'] = phase
+        self.record['element'] = element
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def set(self, **fields):
+        """Add to the record before it's written - e.g. bytes copied"""
+        self.record.update(fields)
+
+    def __exit__(self, exc_type, exc, tb):
+        self.record['duration'] = time.perf_counter() - self.start
+        self.record['time'] = time.time()
+        if exc_type is not None:
+            self.record['error'] = repr(exc)
+        emit(self.record)
+        return False
+
+
+def span(phase, element=None, **fields):
+    """Time a block of work:
+
+        with span('copy', element) as s:
+            ...
+            s.set(bytes=n, files=count)
+
+        Returns:
+        a Span, or a do-nothing stand-in when instrumentation is off.
+    """
+    if _sink is None:
+        return NULL_SPAN
+    return Span(phase, element, **fields)
+
+
+def emit(record):
+    sink = _sink
+    if sink is None:
+        return
+    with _sink_lock:
+        sink(record)
+
+
+def file_sink(path):
+    """A sink appending JSON lines to a file ('-' for stderr)
+
+        Arguments:
+        path (string) : file to append to
+
+        Returns:
+        function taking a record.
+    """
+    def write(record):
+        line = json.dumps(record, default=str) + '\n'
+        if path == '-':
+            sys.stderr.write(line)
+            return
+        with open(path, 'a') as f:
+            f.write(line)
+    return write
+
+
+def enable(sink=None):
+    """Turn instrumentation on
+
+        Arguments:
+        sink (function or string) : called with each record dictionary, or a path to
+                                    append JSON lines to. Defaults to stderr.
+
+        Returns:
+        None.
+    """
+    global _sink
+    if sink is None:
+        sink = '-'
+    if isinstance(sink, str):
+        sink = file_sink(sink)
+    _sink = sink
+
+
+def disable():
+    global _sink
+    _sink = None
+
+
+def is_enabled():
+    return _sink is not None
+
+
+def profile_next(path):
+    """Capture a cProfile of the next profiled call (see capture_profile)
+
+        Arguments:
+        path (string) : where to write the .prof stats, readable with pstats or snakeviz
+
+        Returns:
+        None.
+    """
+    global _profile_next
+    _profile_next = path
+
+
+def capture_profile(func):
+    """Decorator - runs func under cProfile once after profile_next has been called,
+        and straight through the rest of the time"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        global _profile_next
+        if _profile_next is None:
+            return func(*args, **kwargs)
+
+        path, _profile_next = _profile_next, None
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(func, *args, **kwargs)
+        finally:
+            profiler.dump_stats(path)
+            print('profile of %s written to %s'%(func.__name__, path))
+            pstats.Stats(path).sort_stats('cumulative').print_stats(15)
+    return wrapper
+
+
+if PROFILE_LOG:
+    enable(PROFILE_LOG)
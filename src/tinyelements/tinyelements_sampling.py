@@ -0,0 +1,141 @@
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from tinyelements.globals import THUMB_SAMPLES, THUMB_SAMPLING
+from tinyelements.tinyelements_curves import key_frames
+
+SAMPLING_STRATEGIES = ['uniform', 'head', 'keyframe']
+
+# how hard 'head' leans toward the start - position = t ** HEAD_WEIGHT
+HEAD_WEIGHT = 2.0
+
+
+def uniform_indices(count, max_count):
+    """Evenly spaced indices into count items, always including the first and last
+
+        Arguments:
+        count (int) : how many items there are
+        max_count (int) : most indices to return
+
+        Returns:
+        sorted list of ints.
+    """
+    if count <= max_count:
+        return list(range(count))
+    if max_count <= 1:
+        return [0][:max_count]
+    if numpy is not None:
+        return numpy.linspace(0, count - 1, max_count).round().astype(int).tolist()
+    last = count - 1
+    steps = max_count - 1
+    return [(i * last * 2 + steps) // (steps * 2) for i in range(max_count)]
+
+
+def head_indices(count, max_count):
+    """Indices bunched toward the start, where most elements do their interesting
+        bit, thinning out toward the end
+
+        Arguments:
+        count (int) : how many items there are
+        max_count (int) : most indices to return
+
+        Returns:
+        sorted list of ints.
+    """
+    if count <= max_count:
+        return list(range(count))
+    if max_count <= 1:
+        return [0][:max_count]
+    last = count - 1
+    steps = float(max_count - 1)
+    if numpy is not None:
+        positions = numpy.linspace(0.0, 1.0, max_count) ** HEAD_WEIGHT * last
+        indices = numpy.unique(positions.round().astype(int)).tolist()
+    else:
+        indices = sorted(set(int(round((i / steps) ** HEAD_WEIGHT * last)) for i in range(max_count)))
+    return indices
+
+
+def keyframe_indices(frames, keyframes, max_count):
+    """Indices of the frames that carry keys in the element's sidecar, topped up
+        or thinned out evenly to land near max_count
+
+        Arguments:
+        frames (list) : frame numbers of the sequence, in order
+        keyframes (list) : frame numbers with keys
+        max_count (int) : most indices to return
+
+        Returns:
+        sorted list of ints.
+    """
+    positions = dict((frame, i) for i, frame in enumerate(frames))
+    keyed = sorted(set(positions[int(k)] for k in keyframes if int(k) in positions))
+    if len(keyed) >= max_count:
+        return [keyed[i] for i in uniform_indices(len(keyed), max_count)]
+    filler = uniform_indices(len(frames), max_count - len(keyed))
+    return sorted(set(keyed).union(filler))
+
+
+def sidecar_keyframes(sidecar):
+    """Frame numbers worth sampling from a write_data_json sidecar - an explicit
+        'keyframes' list if it has one, otherwise the Source Point keys
+
+        Arguments:
+        sidecar (dict) : loaded sidecar json
+
+        Returns:
+        list of ints.
+    """
+    keys = sidecar.get('keyframes')
+    if keys is None:
+        source_point = sidecar.get('source_point', {})
+        keys = key_frames(source_point) if 'curves' in source_point else source_point.keys()
+    result = list()
+    for key in keys:
+        try:
+            result.append(int(float(key)))
+        except (TypeError, ValueError):
+            continue
+    return result
+
+
+def sample_indices(frames, max_count=THUMB_SAMPLES, strategy=THUMB_SAMPLING, sidecar=None):
+    """Pick which frames of a sequence go into a thumbnail without walking all of them
+
+        Arguments:
+        frames (list) : frame numbers of the sequence in order, or just a count
+        max_count (int) : most frames to pick
+        strategy (string) : one of SAMPLING_STRATEGIES
+        sidecar (dict) : element sidecar json, needed for 'keyframe'
+
+        Returns:
+        sorted list of indices into frames.
+    """
+    if strategy not in SAMPLING_STRATEGIES:
+        raise ValueError('unknown sampling strategy %s, pick from %s'%(strategy, ', '.join(SAMPLING_STRATEGIES)))
+    count = frames if isinstance(frames, int) else len(frames)
+    max_count = max(1, int(max_count))
+
+    if strategy == 'head':
+        return head_indices(count, max_count)
+    if strategy == 'keyframe' and sidecar and not isinstance(frames, int):
+        keyframes = sidecar_keyframes(sidecar)
+        if keyframes:
+            return keyframe_indices(frames, keyframes, max_count)
+    return uniform_indices(count, max_count)
+
+
+def sample_list(items, max_count=THUMB_SAMPLES, strategy='uniform'):
+    """Thin a list down to max_count items
+
+        Arguments:
+        items (list) : anything, usually frame paths
+        max_count (int) : most items to keep
+        strategy (string) : 'uniform' or 'head'
+
+        Returns:
+        list.
+    """
+    return [items[i] for i in sample_indices(len(items), max_count, strategy)]
@@ -0,0 +1,321 @@
+import os, re, json, heapq
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
+
+from tinyelements.globals import CRAWL_WORKERS
+from tinyelements.tinyelements_index import get_index, get_mtime
+from tinyelements.tinyelements_catalog import read_catalog, catalog_is_current
+
+TOKEN_SPLIT = re.compile(r'[^a-z0-9]+')
+FIELD_FILTER = re.compile(r'^(?P<field>[a-z_]+)(?P<op>>=|<=|=|>|<|:)(?P<value>.+)$')
+
+# fields that can be range filtered, and the doc key they read
+NUMERIC_FIELDS = ['width', 'height', 'channels', 'duration', 'count', 'startframe', 'endframe']
+
+# score weights - whole word beats prefix beats buried somewhere in the name
+EXACT_SCORE = 10.0
+PREFIX_SCORE = 6.0
+SUBSTRING_SCORE = 3.0
+TAG_SCORE = 4.0
+NAME_START_BONUS = 2.0
+
+
+def tokenize(text):
+    """Lower-case words from a name or tag - fire_Big.v02 -> ['fire', 'big', 'v02']
+
+        Arguments:
+        text (string) : the text to split
+
+        Returns:
+        list of tokens.
+    """
+    return [t for t in TOKEN_SPLIT.split(text.lower()) if t]
+
+
+def trigrams(text):
+    text = text.lower()
+    return set(text[i:i + 3] for i in range(len(text) - 2))
+
+
+def read_sidecar(element_path, element):
+    """Load the json written by write_data_json, if there is one
+
+        Arguments:
+        element_path (string) : full path to the element directory
+        element (string) : Name of the element
+
+        Returns:
+        dictionary of sidecar data, empty if there isn't one.
+    """
+    try:
+        with open(os.path.join(element_path, element + '.json')) as json_file:
+            return json.load(json_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def parse_query(text):
+    """Split search text into name terms and field filters.
+        'fire width>=1920 duration<100 tag:hero category:Fire compression:piz'
+
+        Arguments:
+        text (string) : what was typed
+
+        Returns:
+        (terms, filters) - a list of words and a dictionary of
+        field : (min, max) for numeric fields or field : string otherwise.
+        Numeric filters with a value that isn't a number are left out.
+    """
+    terms = list()
+    filters = dict()
+    for word in text.split():
+        match = FIELD_FILTER.match(word.lower())
+        if match is None:
+            terms.extend(tokenize(word))
+            continue
+
+        field, op, value = match.group('field'), match.group('op'), match.group('value')
+        if field in NUMERIC_FIELDS:
+            try:
+                number = float(value)
+            except ValueError:
+                # a filter that doesn't parse (or is still being typed) is dropped, not searched for
+                continue
+            low, high = filters.get(field, (None, None))
+            if op in ['>', '>=']:
+                low = number + (1 if op == '>' else 0)
+            elif op in ['<', '<=']:
+                high = number - (1 if op == '<' else 0)
+            else:
+                low = high = number
+            filters[field] = (low, high)
+        else:
+            filters[field] = value
+    return terms, filters
+
+
+class SearchIndex(object):
+    """In-memory search over every element in every category of both libraries.
+        Names are indexed by whole tokens, token prefixes and trigrams so a query
+        only ever touches the documents that could match it.
+
+    """
+
+    def __init__(self):
+        self.docs = list()
+        self.names = list()
+        self.ranks = None
+        self.numeric = dict()
+        self.exact = dict()
+        self.first_prefixes = dict()
+        self.prefixes = dict()
+        self.grams = dict()
+        self.tags = dict()
+
+    def add(self, doc):
+        """Add one element to the index
+
+        Arguments:
+        doc (dict) : needs library, category and name. tags, width, height,
+                     duration and anything else from the sidecar ride along.
+
+        Returns:
+        int document id.
+        """
+        doc_id = len(self.docs)
+        self.docs.append(doc)
+        name = doc['name'].lower()
+        self.names.append(name)
+
+        tokens = tokenize(name)
+        for token in tokens:
+            self.exact.setdefault(token, set()).add(doc_id)
+            for i in range(1, len(token) + 1):
+                self.prefixes.setdefault(token[:i], set()).add(doc_id)
+        if tokens:
+            for i in range(1, len(tokens[0]) + 1):
+                self.first_prefixes.setdefault(tokens[0][:i], set()).add(doc_id)
+        for gram in trigrams(name):
+            self.grams.setdefault(gram, set()).add(doc_id)
+        for tag in doc.get('tags', []):
+            for token in tokenize(tag):
+                self.tags.setdefault(token, set()).add(doc_id)
+        return doc_id
+
+    def build(self, libraries, index=None, read_sidecars=True, workers=CRAWL_WORKERS):
+        """Fill the search index from the library index
+
+        Arguments:
+        libraries (list) : library roots to include
+        index (LibraryIndex) : defaults to the shared index
+        read_sidecars (bool) : pull tags from the element json files, and resolution
+                               for elements whose image headers couldn't be read
+        workers (int) : how many sidecars to read at once
+
+        Returns:
+        self.
+        """
+        if index is None:
+            index = get_index()
+
+        rows = list()
+        # sidecar metadata from a current published catalog saves opening every json
+        published = dict()
+        for library in libraries:
+            for category in index.get_categories(library):
+                rows.extend(index.get_elements(library, category))
+                catalog = read_catalog(library, category) if read_sidecars else None
+                if catalog_is_current(catalog, get_mtime(os.path.join(library, category))):
+                    for entry in catalog['elements']:
+                        published[(library, category, entry['name'])] = entry.get('sidecar', {})
+
+        def make_doc(row):
+            doc = dict(row)
+            doc['duration'] = (row['endframe'] - row['startframe']) if row['fname'] else None
+            if read_sidecars:
+                sidecar = published.get((row['library'], row['category'], row['name']))
+                if sidecar is None:
+                    sidecar = read_sidecar(os.path.join(row['library'], row['category'], row['name']), row['name'])
+                for key in ['width', 'height', 'tags']:
+                    # the image header is what's actually on disk, the sidecar only fills gaps
+                    if key in sidecar and doc.get(key) is None:
+                        doc[key] = sidecar[key]
+            tags = doc.get('tags', [])
+            doc['tags'] = [tags] if isinstance(tags, str) else list(tags)
+            return doc
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            for doc in pool.map(make_doc, rows):
+                self.add(doc)
+        self.get_ranks()
+        return self
+
+    def term_scores(self, term):
+        """Score every document that matches a single term. Each tier is filled
+            with set operations so the work stays out of python loops.
+
+        Arguments:
+        term (string) : lower-case search word
+
+        Returns:
+        dictionary of doc id : score.
+        """
+        prefix_ids = self.prefixes.get(term, set())
+        scores = dict()
+
+        # short terms only match the start of words, longer ones anywhere in the name
+        if len(term) >= 3:
+            candidates = None
+            for gram in trigrams(term):
+                ids = self.grams.get(gram, set())
+                candidates = ids if candidates is None else candidates & ids
+                if not candidates:
+                    break
+            names = self.names
+            scores = dict.fromkeys((doc_id for doc_id in (candidates or set()) - prefix_ids
+                                    if term in names[doc_id]), SUBSTRING_SCORE)
+
+        scores.update(dict.fromkeys(prefix_ids, PREFIX_SCORE))
+        scores.update(dict.fromkeys(self.first_prefixes.get(term, ()), PREFIX_SCORE + NAME_START_BONUS))
+        scores.update(dict.fromkeys(self.exact.get(term, ()), EXACT_SCORE))
+        for doc_id in self.tags.get(term, ()):
+            scores[doc_id] = scores.get(doc_id, 0) + TAG_SCORE
+        return scores
+
+    def get_ranks(self):
+        """Tie-break order for results - shorter names first, then alphabetical
+
+        Returns:
+        list of rank by doc id.
+        """
+        if self.ranks is None or len(self.ranks) != len(self.docs):
+            order = sorted(range(len(self.docs)), key=lambda i: (len(self.names[i]), self.names[i]))
+            self.ranks = [0] * len(order)
+            for rank, doc_id in enumerate(order):
+                self.ranks[doc_id] = rank
+        return self.ranks
+
+    def numeric_index(self, field):
+        """Documents sorted by a numeric field, so range filters are a bisect rather than a scan
+
+        Arguments:
+        field (string) : one of NUMERIC_FIELDS
+
+        Returns:
+        (values, doc ids) lists in value order, documents without a number for the field left out.
+        """
+        index = self.numeric.get(field)
+        if index is None or index[2] != len(self.docs):
+            pairs = sorted((doc[field], doc_id) for doc_id, doc in enumerate(self.docs)
+                           if isinstance(doc.get(field), (int, float)))
+            index = self.numeric[field] = ([p[0] for p in pairs], [p[1] for p in pairs], len(self.docs))
+        return index[0], index[1]
+
+    def range_ids(self, field, low, high):
+        """Document ids with a field value between low and high, either end may be None"""
+        values, doc_ids = self.numeric_index(field)
+        start = 0 if low is None else bisect_left(values, low)
+        end = len(values) if high is None else bisect_right(values, high)
+        return set(doc_ids[start:end])
+
+    def matches_filters(self, doc, filters):
+        for field, wanted in filters.items():
+            if field in NUMERIC_FIELDS:
+                value = doc.get(field)
+                if value is None:
+                    return False
+                low, high = wanted
+                if (low is not None and value < low) or (high is not None and value > high):
+                    return False
+            elif field in ['tag', 'tags']:
+                if wanted not in [t.lower() for t in doc.get('tags', [])]:
+                    return False
+            elif field == 'library':
+                if wanted not in doc['library'].lower():
+                    return False
+            elif str(doc.get(field, '')).lower() != wanted:
+                return False
+        return True
+
+    def search(self, text, filters=None, limit=50):
+        """Ranked search across everything in the index. Every term has to match.
+
+        Arguments:
+        text (string) : search words, may include field filters (see parse_query)
+        filters (dict) : extra filters in the same shape parse_query returns
+        limit (int) : most results to hand back
+
+        Returns:
+        list of (score, doc) tuples, best first.
+        """
+        terms, text_filters = parse_query(text)
+        if filters:
+            text_filters.update(filters)
+
+        scores = None
+        for term in terms:
+            term_scores = self.term_scores(term)
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = dict((doc_id, scores[doc_id] + term_scores[doc_id])
+                              for doc_id in scores if doc_id in term_scores)
+            if not scores:
+                return []
+
+        if scores is None:
+            # filters on their own - the sorted numeric indexes answer those fields outright,
+            # so only the rest are checked document by document
+            candidates = None
+            for field in [f for f in text_filters if f in NUMERIC_FIELDS]:
+                ids = self.range_ids(field, *text_filters.pop(field))
+                candidates = ids if candidates is None else candidates & ids
+            if candidates is None:
+                candidates = range(len(self.docs))
+            scores = dict.fromkeys(candidates, 0.0)
+
+        results = ((score, doc_id) for doc_id, score in scores.items()
+                   if not text_filters or self.matches_filters(self.docs[doc_id], text_filters))
+        ranks = self.get_ranks()
+        best = heapq.nsmallest(limit, results, key=lambda r: (-r[0], ranks[r[1]]))
+        return [(score, self.docs[doc_id]) for score, doc_id in best]
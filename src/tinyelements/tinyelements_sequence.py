@@ -0,0 +1,225 @@
+import os, re
+
+IMAGE_EXTENSIONS = ['.exr', '.png', '.jpg', '.jpeg', '.tif', '.tiff', '.hdr']
+
+# prefix, optional separator, frame digits, extension - e.g. fire_01.1001.exr
+FRAME_PATTERN = re.compile(r'^(?P<prefix>.*?)(?P<sep>[._-]?)(?P<frame>\d+)\.(?P<ext>[^.]+)$')
+
+
+def classify_filename(filename):
+    """Break a single filename down into the parts that make up a sequence.
+
+        Arguments:
+        filename (string) : the file name (no directory) to classify
+
+        Returns:
+        Dictionary containing prefix, separator, frame_string, frame and extension,
+        or None if the file isn't one of the image types we care about.
+        Un-numbered stills come back with frame set to None.
+    """
+    stem, ext = os.path.splitext(filename)
+    if ext.lower() not in IMAGE_EXTENSIONS:
+        return None
+
+    match = FRAME_PATTERN.match(filename)
+    if match is None:
+        return {'prefix': stem, 'separator': '', 'frame_string': None,
+                'frame': None, 'extension': ext[1:]}
+
+    return {'prefix': match.group('prefix'),
+            'separator': match.group('sep'),
+            'frame_string': match.group('frame'),
+            'frame': int(match.group('frame')),
+            'extension': match.group('ext')}
+
+
+def find_sequences(dir_list):
+    """Group every image in a directory listing into sequences in a single pass.
+        Each file is classified once, so the cost is linear in the size of the listing.
+
+        Arguments:
+        dir_list (list) : file names in a directory (as from os.listdir)
+
+        Returns:
+        List of sequence dictionaries (see build_sequence_info), ordered by the
+        first file name of each sequence.
+    """
+    groups = dict()
+    for filename in dir_list:
+        parts = classify_filename(filename)
+        if parts is None:
+            continue
+        if parts['frame'] is None:
+            key = (parts['prefix'], None, None, parts['extension'])
+        else:
+            key = (parts['prefix'], parts['separator'], True, parts['extension'])
+        groups.setdefault(key, list()).append((filename, parts))
+
+    sequences = [build_sequence_info(members) for members in groups.values()]
+    sequences.sort(key=lambda seq: seq['first_file'])
+    return sequences
+
+
+def get_padding(frame_strings):
+    """Work out the frame padding that best fits a group of frame numbers.
+        Zero-padded numbers pin the padding down exactly, otherwise the shortest
+        number is used so everything in the group still formats the same way.
+
+        Arguments:
+        frame_strings (list) : the frame numbers as they appear in the file names
+
+        Returns:
+        int padding.
+    """
+    padded = [len(f) for f in frame_strings if len(f) > 1 and f[0] == '0']
+    if padded:
+        return min(padded)
+    return min(len(f) for f in frame_strings)
+
+
+def build_sequence_info(members):
+    """Build the sequence dictionary for one group of classified files
+
+        Arguments:
+        members (list) : (filename, parts) tuples that belong to the same sequence
+
+        Returns:
+        Dictionary containing:
+                info['name'] : base name
+                info['count'] : how many images in the seq
+                info['startframe'] : start frame
+                info['endframe'] : end frame
+                info['extension'] : the image file type
+                info['frame_format'] : the format of the numbering w/in the seq
+                info['fname'] : the sequentially formatted naming
+                info['separator'] : character between the name and frame number
+                info['padding'] : frame number padding (0 for stills)
+                info['frames'] : sorted list of frame numbers present
+                info['files'] : file names, sorted by frame
+                info['missing_frames'] : frame numbers absent between start and end
+                info['mismatched_files'] : files whose padding differs from the rest
+                info['first_file'] : first file name alphabetically
+    """
+    filename, parts = members[0]
+    info = dict()
+    info['name'] = parts['prefix']
+    info['extension'] = parts['extension']
+    info['first_file'] = min(m[0] for m in members)
+
+    if parts['frame'] is None:
+        info['count'] = 1
+        info['startframe'] = 1
+        info['endframe'] = 1
+        info['frame_format'] = 'None'
+        info['fname'] = filename
+        info['separator'] = ''
+        info['padding'] = 0
+        info['frames'] = []
+        info['files'] = [filename]
+        info['missing_frames'] = []
+        info['mismatched_files'] = []
+        return info
+
+    members = sorted(members, key=lambda m: (m[1]['frame'], m[0]))
+    frames = sorted(set(m[1]['frame'] for m in members))
+    padding = get_padding([m[1]['frame_string'] for m in members])
+
+    info['separator'] = parts['separator']
+    info['padding'] = padding
+    info['frame_format'] = '%0' + str(padding) + 'd'
+    info['fname'] = info['name'] + info['separator'] + info['frame_format'] + '.' + info['extension']
+    info['frames'] = frames
+    info['files'] = [m[0] for m in members]
+    info['count'] = len(frames)
+    info['startframe'] = frames[0]
+    info['endframe'] = frames[-1]
+    info['mismatched_files'] = [m[0] for m in members if m[1]['frame_string'] != info['frame_format'] % m[1]['frame']]
+
+    frame_set = set(frames)
+    info['missing_frames'] = [f for f in range(frames[0], frames[-1] + 1) if f not in frame_set]
+    return info
+
+
+def longest_sequence(sequences):
+    """Pick the sequence with the most frames, this way we avoid numbered
+        temp files or partial conversions. Ties go to the first sequence by name.
+
+        Arguments:
+        sequences (list) : sequence dictionaries from find_sequences
+
+        Returns:
+        The sequence dictionary with the highest count.
+    """
+    if not sequences:
+        raise ValueError('no image sequence found')
+
+    longest = sequences[0]
+    for seq in sequences[1:]:
+        if seq['count'] > longest['count']:
+            longest = seq
+    return longest
+
+
+def frames_to_ranges(frames):
+    """Collapse a sorted list of frame numbers into a compact range string
+
+        Arguments:
+        frames (list) : sorted frame numbers
+
+        Returns:
+        string like '1001-1004,1006-1010'.
+    """
+    ranges = list()
+    start = prev = None
+    for frame in frames:
+        if start is None:
+            start = prev = frame
+        elif frame == prev + 1:
+            prev = frame
+        else:
+            ranges.append((start, prev))
+            start = prev = frame
+    if start is not None:
+        ranges.append((start, prev))
+    return ','.join(str(a) if a == b else '%d-%d'%(a, b) for a, b in ranges)
+
+
+def ranges_to_frames(range_string):
+    """Expand a range string from frames_to_ranges back into frame numbers
+
+        Arguments:
+        range_string (string) : string like '1001-1004,1006-1010'
+
+        Returns:
+        sorted list of frame numbers.
+    """
+    frames = list()
+    for part in range_string.split(','):
+        if not part:
+            continue
+        start, _, end = part.partition('-')
+        frames.extend(range(int(start), int(end or start) + 1))
+    return frames
+
+
+def sequence_files(info, frames=None):
+    """Rebuild file names for a sequence without listing the directory again
+
+        Arguments:
+        info (dict) : sequence dictionary, needs fname, frame_format, frames and mismatched_files
+        frames (list) : optional subset of frame numbers, defaults to all of them
+
+        Returns:
+        list of file names in the same order as the frames.
+    """
+    if info['frame_format'] == 'None':
+        return [info['fname']]
+    if frames is None:
+        frames = info['frames']
+
+    oddballs = dict()
+    for filename in info.get('mismatched_files', []):
+        parts = classify_filename(filename)
+        if parts is not None and parts['frame'] is not None:
+            oddballs[parts['frame']] = filename
+    return [oddballs.get(frame, info['fname'] % frame) for frame in frames]
@@ -1,71 +1,567 @@
-import os, subprocess
-from math import floor
-from tinyelements.tinyelements_helpers import get_img_seq
-from tinyelements.globals import FFMPEG_PATH
+import os, json, math, shutil, tempfile, subprocess
+from concurrent.futures import ThreadPoolExecutor
+from tinyelements.tinyelements_index import get_index
+from tinyelements.tinyelements_sequence import sequence_files
+from tinyelements.tinyelements_profiling import span
+from tinyelements.tinyelements_sampling import sample_indices, uniform_indices
+from tinyelements.tinyelements_search import read_sidecar
+from tinyelements.tinyelements_metadata import read_image_header
+from tinyelements.globals import FFMPEG_PATH, THUMB_WORKERS, THUMB_SAMPLES, THUMB_SAMPLING, STRIP_DIR, STRIP_SIZES, STRIP_FRAMES, \
+    CONTACT_DIR, CONTACT_TILE, CONTACT_COLUMNS
+from tinyelements.tinyelements_files import temp_file
+
 
 def generate_thumb(element_info):
     if 'Global' in element_info['from_dir']:
-        element_base_path = os.path.join(element_info['global_lib'], element_info['category'])
+        library = element_info['global_lib']
     else:
-        element_base_path = os.path.join(element_info['show_lib'], element_info['category'])
-    
+        library = element_info['show_lib']
 
     for element in element_info['element_list']:
-        element_path = os.path.join(element_base_path, element)
-        element_data = get_img_seq(element_path)
-
-        frames = os.listdir(element_path)
-        frames = [os.path.join(element_path, frame) for frame in frames]
-        frames = [frame for frame in frames if element_data['extension'] in frame and element in frame]
-        frames = get_frame_list(frames)
-        frames.sort()
-
-        thumb_name = '.'.join([element, 'gif'])
-
-        generate_gif(frames, os.path.join(element_path, thumb_name))
-
-
-def generate_gif(frame_list, output_path, framerate=24):
-    temp_dir = os.path.dirname(output_path)
-    temp_text = os.path.join(temp_dir, 'frame_list.txt')
-
-    # Create a temporary text file to store the frame list
-    with open(temp_text, 'w') as f:
-        for frame in frame_list:
-            f.write("file '{}'\n".format(frame))
-            f.write("duration 0.04\n")
-
-    # Execute FFmpeg command
-    ffmpeg_cmd = [
-        FFMPEG_PATH,
-        '-f', 'concat',
-        '-safe', '0',
-        '-i', temp_text,
-        '-vf', 'scale=256:-1',
-        '-framerate', str(framerate),
-        '-y',
-        output_path
+        make_element_thumb(library, element_info['category'], element, force=True,
+                           max_count=element_info.get('thumb_samples', THUMB_SAMPLES),
+                           strategy=element_info.get('thumb_sampling', THUMB_SAMPLING))
+
+
+def thumb_is_current(element_path, element, element_data):
+    """A thumbnail is current when it's newer than the first and last frames of the
+        sequence - a re-render or extended element touches at least one of them -
+        and the scrub strips have been made.
+
+        Arguments:
+        element_path (string) : full path to the element directory
+        element (string) : Name of the element
+        element_data (dict) : sequence info for the element
+
+        Returns:
+        bool.
+    """
+    try:
+        thumb_mtime = os.stat(os.path.join(element_path, element + '.gif')).st_mtime
+        ends = sequence_files(element_data, [element_data['startframe'], element_data['endframe']]) \
+            if element_data['frames'] else sequence_files(element_data)
+        seq_mtime = max(os.stat(os.path.join(element_path, f)).st_mtime for f in ends)
+    except OSError:
+        return False
+    return thumb_mtime >= seq_mtime and os.path.exists(strip_index_path(element_path, element))
+
+
+def make_element_thumb(library, category, element, force=False, max_count=THUMB_SAMPLES, strategy=THUMB_SAMPLING):
+    """Build the gif for a single element, skipping it if the gif is already current
+
+        Arguments:
+        library (string) : path to the library root
+        category (string) : category name
+        element (string) : Name of the element
+        force (bool) : rebuild even if the thumbnail looks current
+        max_count (int) : most frames to put in the gif
+        strategy (string) : how to pick them, see tinyelements_sampling
+
+        Returns:
+        Dictionary with library, category, element, thumb_path, status ('made', 'skipped'
+        or 'failed') and error.
+    """
+    index = get_index()
+    element_path = os.path.join(library, category, element)
+    result = {'library': library, 'category': category, 'element': element,
+              'thumb_path': os.path.join(element_path, '.'.join([element, 'gif'])),
+              'status': 'made', 'error': None}
+    try:
+        element_data = index.get_sequence(library, category, element)
+        if not force and thumb_is_current(element_path, element, element_data):
+            result['status'] = 'skipped'
+            return result
+
+        sidecar = read_sidecar(element_path, element) if strategy == 'keyframe' else None
+        indices = sample_indices(element_data['frames'] or element_data['count'], max_count, strategy, sidecar)
+
+        if generate_gif(element_path, element_data, result['thumb_path'], indices) != 0:
+            result['status'] = 'failed'
+            result['error'] = 'ffmpeg failed'
+        index.refresh_element(library, category, element)
+    except (OSError, ValueError) as e:
+        result['status'] = 'failed'
+        result['error'] = str(e)
+    return result
+
+
+class ThumbQueue(object):
+    """Runs thumbnail jobs in the background. Each worker drives its own ffmpeg
+        process, so the pool size is how many ffmpegs run at once. Threads rather than a
+        process pool: the decoding and encoding already happen in the ffmpeg processes,
+        the workers only wait on them, and threads can hand results straight to the
+        panel's signals without starting more python interpreters inside Nuke.
+
+    Arguments:
+    workers (int) : how many thumbnails to build at once
+    on_done (function) : called with the make_element_thumb result as each job finishes.
+                         This is called from a worker thread.
+    max_count (int) : most frames per gif, can be changed between submits
+    strategy (string) : frame sampling strategy, can be changed between submits
+
+    """
+
+    def __init__(self, workers=THUMB_WORKERS, on_done=None, max_count=THUMB_SAMPLES, strategy=THUMB_SAMPLING):
+        self.pool = ThreadPoolExecutor(max_workers=max(1, workers))
+        self.on_done = on_done
+        self.cancelled = False
+        self.max_count = max_count
+        self.strategy = strategy
+        self.jobs = list()
+
+    def run_job(self, library, category, element, force, max_count, strategy):
+        result = make_element_thumb(library, category, element, force, max_count, strategy)
+        on_done = self.on_done
+        if on_done is not None:
+            on_done(result)
+        return result
+
+    def submit(self, library, category, element, force=False):
+        """Queue a single element
+
+        Returns:
+        concurrent.futures.Future for the make_element_thumb result.
+        """
+        job = self.pool.submit(self.run_job, library, category, element, force, self.max_count, self.strategy)
+        self.jobs.append(job)
+        return job
+
+    def submit_elements(self, library, category, element_list, force=False):
+        return [self.submit(library, category, element, force) for element in element_list]
+
+    def submit_category(self, library, category, force=False):
+        """Queue every element in a category
+
+        Returns:
+        list of futures.
+        """
+        elements = [row['name'] for row in get_index().get_elements(library, category)]
+        return self.submit_elements(library, category, elements, force)
+
+    def submit_library(self, library, force=False):
+        """Queue every element in every category of a library
+
+        Returns:
+        list of futures.
+        """
+        jobs = list()
+        for category in get_index().get_categories(library):
+            jobs.extend(self.submit_category(library, category, force))
+        return jobs
+
+    def submit_sheets(self, library, categories):
+        """Rebuild contact sheets once everything queued so far has finished
+
+        Arguments:
+        library (string) : path to the library root
+        categories (list) : category names
+
+        Returns:
+        concurrent.futures.Future for the list of make_contact_sheet results.
+        """
+        ahead = list(self.jobs)
+
+        def run_sheets():
+            # everything ahead was taken off the queue before this, so waiting can't deadlock
+            for job in ahead:
+                try:
+                    job.result()
+                except Exception:
+                    pass
+            results = list()
+            for category in categories:
+                if self.cancelled:
+                    break
+                result = make_contact_sheet(library, category)
+                on_done = self.on_done
+                if on_done is not None:
+                    on_done(result)
+                results.append(result)
+            return results
+
+        job = self.pool.submit(run_sheets)
+        self.jobs.append(job)
+        return job
+
+    def pending(self):
+        self.jobs = [job for job in self.jobs if not job.done()]
+        return len(self.jobs)
+
+    def wait(self):
+        """Block until everything queued so far is done
+
+        Returns:
+        list of make_element_thumb and make_contact_sheet results.
+        """
+        results = list()
+        for job in list(self.jobs):
+            result = job.result()
+            results.extend(result if isinstance(result, list) else [result])
+        return results
+
+    def shutdown(self, cancel=False):
+        """Stop taking jobs
+
+        Arguments:
+        cancel (bool) : drop everything still queued and don't wait - the ffmpegs already
+                        running finish their one element, nothing new starts - and stop
+                        calling on_done, whatever it reported to may be gone
+
+        Returns:
+        None.
+        """
+        if cancel:
+            self.cancelled = True
+            self.on_done = None
+            for job in self.jobs:
+                job.cancel()
+        self.pool.shutdown(wait=not cancel)
+
+
+def link_frames(scratch_dir, element_path, element_data):
+    """Lay a sequence with gaps or odd padding out as a clean numbered sequence
+        of symlinks, since the image2 demuxer stops at the first missing frame.
+
+        Arguments:
+        scratch_dir (string) : private directory to make the links in
+        element_path (string) : full path to the element directory
+        element_data (dict) : sequence info for the element
+
+        Returns:
+        (pattern, start_number) to hand to ffmpeg.
+    """
+    pattern = os.path.join(scratch_dir, 'frame.%06d.' + element_data['extension'])
+    for i, filename in enumerate(sequence_files(element_data)):
+        os.symlink(os.path.join(element_path, filename), pattern % i)
+    return pattern, 0
+
+
+def select_filter(indices, frame_count):
+    """ffmpeg select filter keeping just the sampled frames
+
+        Arguments:
+        indices (list) : sorted positions in the input to keep
+        frame_count (int) : how many frames the input has
+
+        Returns:
+        string filter, or None when every frame is kept.
+    """
+    if len(indices) >= frame_count:
+        return None
+    step = indices[1] - indices[0] if len(indices) > 1 else frame_count
+    if indices[0] == 0 and indices == list(range(0, indices[-1] + 1, step)):
+        return 'select=not(mod(n\\,%d))*lte(n\\,%d)'%(step, indices[-1])
+    return 'select=' + '+'.join('eq(n\\,%d)'%i for i in indices)
+
+
+def strip_path(element_path, element, size):
+    return os.path.join(element_path, STRIP_DIR, '%s_strip_%d.jpg'%(element, size))
+
+
+def poster_path(element_path, element):
+    return os.path.join(element_path, STRIP_DIR, '%s_poster.jpg'%element)
+
+
+def strip_index_path(element_path, element):
+    return os.path.join(element_path, STRIP_DIR, '%s_strip.json'%element)
+
+
+def read_strip_index(element_path, element):
+    """Load the frame rectangles for an element's scrub strips
+
+        Arguments:
+        element_path (string) : full path to the element directory
+        element (string) : Name of the element
+
+        Returns:
+        Dictionary like the one write_strip_index makes, or None if there isn't one.
+    """
+    try:
+        with open(strip_index_path(element_path, element)) as json_file:
+            return json.load(json_file)
+    except (OSError, ValueError):
+        return None
+
+
+def tile_grid(count):
+    """Columns and rows for a near-square sheet of count tiles"""
+    columns = max(1, int(math.ceil(math.sqrt(count))))
+    return columns, max(1, int(math.ceil(count / float(columns))))
+
+
+def write_strip_index(element_path, element, frames, columns, rows):
+    """Record where each frame sits in each of the element's strips
+
+        Arguments:
+        element_path (string) : full path to the element directory
+        element (string) : Name of the element
+        frames (list) : frame numbers in the strips, in order
+        columns (int) : tiles across
+        rows (int) : tiles down
+
+        Returns:
+        Dictionary of frames and, for each size, file and [x, y, w, h] rects.
+    """
+    index = {'element': element, 'frames': frames, 'sizes': dict()}
+    for size in STRIP_SIZES:
+        sheet = strip_path(element_path, element, size)
+        header = read_image_header(sheet)
+        tile_w, tile_h = header['width'] // columns, header['height'] // rows
+        rects = [[(i % columns) * tile_w, (i // columns) * tile_h, tile_w, tile_h] for i in range(len(frames))]
+        index['sizes'][str(size)] = {'file': os.path.basename(sheet), 'rects': rects}
+
+    write_json(strip_index_path(element_path, element), index)
+    return index
+
+
+def write_json(path, data):
+    """Write json under a temp name and rename it into place, so readers only
+        ever see a whole file
+
+        Arguments:
+        path (string) : where it ends up
+        data (dict) : what to write
+
+        Returns:
+        None.
+    """
+    handle, temp_path = temp_file(path)
+    try:
+        with os.fdopen(handle, 'w') as f:
+            json.dump(data, f)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def fit_filter(width, height):
+    """Scale into a width x height box keeping the aspect, padding out the rest"""
+    return 'scale=%d:%d:force_original_aspect_ratio=decrease,pad=%d:%d:(ow-iw)/2:(oh-ih)/2'%(width, height, width, height)
+
+
+def build_ffmpeg_cmd(input_args, outputs, indices, frame_count, framerate=24, strip_indices=None):
+    """ffmpeg command that does the frame sampling inside the filter graph. The
+        sequence is read once and split between the gif and the scrub strips.
+
+        Arguments:
+        input_args (list) : ffmpeg input arguments for the sequence
+        outputs (dict) : 'gif', 'poster' and each strip size : path to write it to
+        indices (list) : sorted positions in the input to keep for the gif
+        frame_count (int) : how many frames the input has
+        framerate (int) : gif playback rate
+        strip_indices (list) : sorted positions for the strips and poster, none of those if None
+
+        Returns:
+        list of command arguments.
+    """
+    gif_filters = list()
+    select = select_filter(indices, frame_count)
+    if select is not None:
+        # keep the sampled frames, then close the gaps in the timestamps
+        gif_filters.append(select)
+        gif_filters.append('setpts=N/(%d*TB)'%framerate)
+    gif_filters.append('scale=256:-1')
+
+    if strip_indices is None:
+        graph = ['[0:v]%s[gif]'%','.join(gif_filters)]
+    else:
+        sizes = [size for size in STRIP_SIZES if size in outputs]
+        columns, rows = tile_grid(len(strip_indices))
+        strip_select = select_filter(strip_indices, frame_count)
+        # the poster is the middle strip frame at contact sheet tile size
+        graph = ['[0:v]split=3[g][s][p]',
+                 '[g]%s[gif]'%','.join(gif_filters),
+                 '[p]select=eq(n\\,%d),%s[poster]'%(strip_indices[len(strip_indices) // 2], fit_filter(*CONTACT_TILE)),
+                 '[s]%ssplit=%d%s'%(strip_select + ',' if strip_select else '', len(sizes),
+                                    ''.join('[s%d]'%size for size in sizes))]
+        for size in sizes:
+            graph.append('[s%d]scale=-2:%d,tile=%dx%d[t%d]'%(size, size, columns, rows, size))
+
+    cmd = [FFMPEG_PATH, '-v', 'error', '-nostdin'] + input_args + [
+        '-filter_complex', ';'.join(graph),
+        '-map', '[gif]', '-r', str(framerate), '-f', 'gif', '-y', outputs['gif']
     ]
-    print(' '.join(ffmpeg_cmd))
-
-    output = subprocess.run(ffmpeg_cmd, capture_output=True)
-    print(output.stdout.decode('utf-8'))
-    
-    # Remove the temporary frame list file
-    subprocess.run(['rm', temp_text])
-
-
-def get_frame_list(all_frames, max_count=100):
-    frame_count = len(all_frames)
-
-    if frame_count <= max_count:
-        return all_frames
-    
-    num_list = list(range(max_count))
-    result = []
-    for i, frame in enumerate(all_frames):
-        percent = floor(i / frame_count * 100)
-        if percent in num_list:
-            result.append(frame)
-            num_list.remove(percent)
+    if strip_indices is not None:
+        for size in sizes:
+            cmd += ['-map', '[t%d]'%size, '-frames:v', '1', '-c:v', 'mjpeg', '-q:v', '4',
+                    '-f', 'image2', '-update', '1', '-y', outputs[size]]
+        cmd += ['-map', '[poster]', '-frames:v', '1', '-c:v', 'mjpeg', '-q:v', '3',
+                '-f', 'image2', '-update', '1', '-y', outputs['poster']]
+    return cmd
+
+
+def generate_gif(element_path, element_data, output_path, indices=None, framerate=24, strips=True):
+    """Make the thumbnail gif, and the scrub strips that go with it, straight from
+        the sequence's %0Nd pattern in one ffmpeg run. Nothing is written next to the
+        element but hidden temp files, which are renamed over the real ones when
+        ffmpeg finishes, so readers never see half of one and two people making the
+        same thumbnail don't trip over each other.
+
+        Arguments:
+        element_path (string) : full path to the element directory
+        element_data (dict) : sequence info for the element
+        output_path (string) : where the gif ends up
+        indices (list) : which frames to use, as positions in the sequence. Defaults
+                         to THUMB_SAMPLES picked with THUMB_SAMPLING
+        framerate (int) : gif playback rate
+        strips (bool) : also make the STRIP_SIZES scrub strips, their index and the
+                        contact sheet poster
+
+        Returns:
+        int - ffmpeg's return code.
+    """
+    if indices is None:
+        indices = sample_indices(element_data['count'], THUMB_SAMPLES, 'uniform' if THUMB_SAMPLING == 'keyframe' else THUMB_SAMPLING)
+    element = os.path.basename(output_path)[:-len('.gif')]
+
+    final_paths = {'gif': output_path}
+    strip_indices = None
+    if strips:
+        # the strips only need enough frames to scrub with, which keeps the pixmaps small
+        strip_indices = [indices[i] for i in uniform_indices(len(indices), STRIP_FRAMES)]
+        if not os.path.isdir(os.path.join(element_path, STRIP_DIR)):
+            os.makedirs(os.path.join(element_path, STRIP_DIR))
+        for size in STRIP_SIZES:
+            final_paths[size] = strip_path(element_path, element, size)
+        final_paths['poster'] = poster_path(element_path, element)
+
+    scratch_dir = tempfile.mkdtemp(prefix='tinyelements_thumb_')
+    temp_paths = dict()
+    try:
+        for key, path in final_paths.items():
+            handle, temp_paths[key] = temp_file(path)
+            os.close(handle)
+
+        if element_data['frame_format'] == 'None':
+            input_args = ['-i', os.path.join(element_path, element_data['fname'])]
+        else:
+            if element_data['missing_frames'] or element_data['mismatched_files'] or '%' in element_path:
+                pattern, start_number = link_frames(scratch_dir, element_path, element_data)
+            else:
+                pattern, start_number = os.path.join(element_path, element_data['fname']), element_data['startframe']
+            input_args = ['-f', 'image2', '-framerate', str(framerate), '-start_number', str(start_number), '-i', pattern]
+
+        ffmpeg_cmd = build_ffmpeg_cmd(input_args, temp_paths, indices, element_data['count'], framerate, strip_indices)
+        print(' '.join(ffmpeg_cmd))
+
+        with span('ffmpeg', element, files=len(indices)) as timer:
+            output = subprocess.run(ffmpeg_cmd, capture_output=True)
+            if output.returncode == 0:
+                timer.set(bytes=sum(os.path.getsize(path) for path in temp_paths.values()))
+
+        if output.returncode != 0:
+            print(output.stderr.decode('utf-8', 'replace'))
+            return output.returncode
+
+        for key, path in final_paths.items():
+            os.replace(temp_paths[key], path)
+
+        if strips:
+            frames = element_data['frames'] or [element_data['startframe']]
+            columns, rows = tile_grid(len(strip_indices))
+            write_strip_index(element_path, element, [frames[i] for i in strip_indices], columns, rows)
+        return 0
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+        for path in temp_paths.values():
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def contact_sheet_path(library, category):
+    return os.path.join(library, category, CONTACT_DIR, 'contactsheet.jpg')
+
+
+def contact_map_path(library, category):
+    return os.path.join(library, category, CONTACT_DIR, 'contactsheet.json')
+
+
+def read_contact_map(library, category):
+    """Load the element : tile map for a category's contact sheet
+
+        Arguments:
+        library (string) : path to the library root
+        category (string) : category name
+
+        Returns:
+        Dictionary like the one make_contact_sheet writes, or None if there isn't one.
+    """
+    try:
+        with open(contact_map_path(library, category)) as json_file:
+            return json.load(json_file)
+    except (OSError, ValueError):
+        return None
+
+
+def make_contact_sheet(library, category):
+    """Tile every element's poster into one image for the category, in a single
+        ffmpeg run, plus a json map of where each element landed. Elements without
+        a poster yet are left off the sheet.
+
+        Arguments:
+        library (string) : path to the library root
+        category (string) : category name
+
+        Returns:
+        Dictionary with library, category, element ('contactsheet'), thumb_path,
+        count, status ('made', 'skipped' or 'failed') and error.
+    """
+    sheet_path = contact_sheet_path(library, category)
+    result = {'library': library, 'category': category, 'element': CONTACT_DIR, 'thumb_path': sheet_path,
+              'count': 0, 'status': 'made', 'error': None}
+
+    names = [row['name'] for row in get_index().get_elements(library, category)]
+    posters = [(name, poster_path(os.path.join(library, category, name), name)) for name in names]
+    posters = [(name, path) for name, path in posters if os.path.exists(path)]
+    if not posters:
+        result['status'] = 'skipped'
+        return result
+
+    width, height = CONTACT_TILE
+    columns = min(CONTACT_COLUMNS, len(posters))
+    rows = int(math.ceil(len(posters) / float(columns)))
+
+    scratch_dir = tempfile.mkdtemp(prefix='tinyelements_sheet_')
+    temp_output = None
+    try:
+        if not os.path.isdir(os.path.dirname(sheet_path)):
+            os.makedirs(os.path.dirname(sheet_path))
+        pattern = os.path.join(scratch_dir, 'tile.%06d.jpg')
+        for i, (name, path) in enumerate(posters):
+            os.symlink(path, pattern % i)
+
+        handle, temp_output = temp_file(sheet_path)
+        os.close(handle)
+        ffmpeg_cmd = [FFMPEG_PATH, '-v', 'error', '-nostdin',
+                      '-f', 'image2', '-start_number', '0', '-i', pattern,
+                      '-vf', '%s,tile=%dx%d'%(fit_filter(width, height), columns, rows),
+                      '-frames:v', '1', '-c:v', 'mjpeg', '-q:v', '3', '-f', 'image2', '-update', '1',
+                      '-y', temp_output]
+        print(' '.join(ffmpeg_cmd))
+
+        with span('contactsheet', category, files=len(posters)) as timer:
+            output = subprocess.run(ffmpeg_cmd, capture_output=True)
+            if output.returncode == 0:
+                timer.set(bytes=os.path.getsize(temp_output))
+
+        if output.returncode != 0:
+            result['status'] = 'failed'
+            result['error'] = output.stderr.decode('utf-8', 'replace').strip() or 'ffmpeg failed'
+            return result
+
+        os.replace(temp_output, sheet_path)
+        tiles = dict((name, [(i % columns) * width, (i // columns) * height, width, height])
+                     for i, (name, path) in enumerate(posters))
+        write_json(contact_map_path(library, category),
+                   {'category': category, 'file': os.path.basename(sheet_path), 'tile': [width, height],
+                    'columns': columns, 'elements': tiles})
+        result['count'] = len(posters)
+    except (OSError, ValueError) as e:
+        result['status'] = 'failed'
+        result['error'] = str(e)
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+        if temp_output is not None and os.path.exists(temp_output):
+            os.remove(temp_output)
     return result
@@ -5,15 +5,33 @@ from PySide2.QtGui import *
 import nuke
 import os
 
-from tinyelements.tinyelements_helpers import load_element_list, get_dirs
-from tinyelements.tinyelements_thumbmaker import generate_thumb
-
-from tinyelements.globals import DEFAULT_THUMB, GLOBAL_DIR, SHOW_DIR
+from tinyelements.tinyelements_helpers import load_element_list
+from tinyelements.tinyelements_thumbmaker import ThumbQueue
+from tinyelements.tinyelements_previews import PreviewCache
+from tinyelements.tinyelements_index import get_index
+from tinyelements.tinyelements_watcher import LibraryWatcher
+from tinyelements.tinyelements_model import ElementTableModel, ElementFilterModel
+from tinyelements.tinyelements_search import SearchIndex
+from tinyelements.tinyelements_sampling import SAMPLING_STRATEGIES
+
+from tinyelements.globals import DEFAULT_THUMB, GLOBAL_DIR, SHOW_DIR, THUMB_SAMPLES, THUMB_SAMPLING, PREVIEW_PREFETCH, \
+    CONTACT_DIR, CONTACT_TILE
 
 __author__ = "Jeremy Fernsler"
 __email__ = "jfernsler@mac.com"
 __status__ = "Prototype"
 
+# preview combo choice : thumbnail height
+PREVIEW_HEIGHTS = {'Small': 100, 'Large': 256}
+
+class ThumbSignals(QObject):
+    """Carries thumbnail results from the worker threads back to the UI thread."""
+    done = Signal(object)
+
+class WatchSignals(QObject):
+    """Carries library watcher events back to the UI thread."""
+    changed = Signal(object)
+
 class TinyElements_Library(QWidget):
     """2D Element Library viewer and loader.
 
@@ -39,14 +57,17 @@ class TinyElements_Library(QWidget):
         QWidget.__init__(self)
 
         self.LIB_DIR = GLOBAL_DIR
-        category_list = get_dirs(self.LIB_DIR)
+        self.index = get_index()
+        category_list = self.index.get_categories(self.LIB_DIR)
         self.element_list = list()
+        self.element_rows = dict()
 
         self.default_thumb = DEFAULT_THUMB
         preview_sizes = ['None', 'Small', 'Large']
 
         catalog_list = ['Global Library', 'Show Library']
         load_list = ['Standard', 'Switch', 'Centered', 'Centered Switch', 'Thumb Setup', 'Make Thumbs']
+        thumb_batch_list = ['Selected', 'Whole Category', 'Whole Library']
 
         self.start_frame = int(nuke.root()['first_frame'].value())
 
@@ -80,18 +101,43 @@ class TinyElements_Library(QWidget):
         self.search_field.setPlaceholderText('Begin Typing To Search Names')
         self.search_field.textChanged.connect(self.text_field_edit_handler)
 
-        topform_layout.addRow(QLabel('Search Name:'), self.search_field)
+        # wait for a pause in typing before filtering
+        self.search_timer = QTimer()
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(150)
+        self.search_timer.timeout.connect(self.apply_search)
+
+        self.search_all_box = QCheckBox('All Categories')
+        self.search_all_box.setChecked(False)
+        self.search_all_box.clicked.connect(self.text_field_edit_handler)
+        self.search_index = None
+        self.searching_all = False
+
+        search_layout = QHBoxLayout()
+        search_layout.addWidget(self.search_field)
+        search_layout.addWidget(self.search_all_box)
+
+        topform_layout.addRow(QLabel('Search Name:'), search_layout)
 
         self.get_element_list()
 
         ### The Element Table
-        headers = ['Thumb', 'Element Name']
-        self.table = QTableWidget(0, len(headers))
-        self.table.cellClicked.connect(self.table_click_handler)
-        self.table.setHorizontalHeaderLabels(headers)
+        self.table_model = ElementTableModel()
+        self.table_proxy = ElementFilterModel()
+        self.table_proxy.setSourceModel(self.table_model)
+
+        self.table = QTableView()
+        self.table.setModel(self.table_proxy)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.clicked.connect(self.table_click_handler)
+        self.table.selectionModel().currentRowChanged.connect(self.current_row_handler)
         self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setSortingEnabled(True)
+        self.table.sortByColumn(1, Qt.AscendingOrder)
         self.populate_table(self.element_list)
         self.table.showGrid()
+        self.default_row_height = self.table.verticalHeader().defaultSectionSize()
 
         table_layout = QHBoxLayout()
         table_layout.addWidget(self.table)
@@ -145,11 +191,36 @@ class TinyElements_Library(QWidget):
         self.gen_thumb_button = QPushButton('Generate Thumb')
         self.gen_thumb_button.clicked.connect(self.click_handler)
 
+        self.thumb_batch_combo = QComboBox()
+        self.thumb_batch_combo.addItems(thumb_batch_list)
+        self.thumb_batch_combo.name = 'thumb batch drop'
+        self.thumb_batch_combo.setCurrentIndex(0)
+        self.thumb_batch_combo.show()
+
+        self.thumb_samples_field = QSpinBox()
+        self.thumb_samples_field.setRange(1, 1000)
+        self.thumb_samples_field.setValue(THUMB_SAMPLES)
+        self.thumb_samples_field.setToolTip('Most frames per thumbnail')
+        self.thumb_samples_field.valueChanged.connect(self.thumb_sampling_handler)
+
+        self.thumb_sampling_combo = QComboBox()
+        self.thumb_sampling_combo.addItems(SAMPLING_STRATEGIES)
+        self.thumb_sampling_combo.setCurrentIndex(SAMPLING_STRATEGIES.index(THUMB_SAMPLING))
+        self.thumb_sampling_combo.setToolTip('Which frames go in the thumbnail')
+        self.thumb_sampling_combo.currentIndexChanged.connect(self.thumb_sampling_handler)
+
+        self.thumb_signals = ThumbSignals()
+        self.thumb_signals.done.connect(self.thumb_done_handler)
+        self.thumb_queue = ThumbQueue(on_done=self.thumb_signals.done.emit)
+
         ## stock up layouts
         preview_options_layout = QHBoxLayout()
         preview_options_layout.addWidget(self.preview_combo)
         preview_options_layout.addWidget(self.preview_playcheck)
         preview_options_layout.addWidget(self.gen_thumb_button)
+        preview_options_layout.addWidget(self.thumb_batch_combo)
+        preview_options_layout.addWidget(self.thumb_samples_field)
+        preview_options_layout.addWidget(self.thumb_sampling_combo)
 
         self.gif_label = QLabel()
         self.gif_label.setMinimumSize(QSize(100,100))
@@ -164,6 +235,16 @@ class TinyElements_Library(QWidget):
         self.thumb.setCacheMode(QMovie.CacheAll)
         self.gif_label.setMovie(self.thumb)
 
+        self.previews = PreviewCache()
+        self.thumb_buffer = None
+
+        # scrub strip for the current element, None while showing a plain gif
+        self.strip = None
+        self.strip_frame = 0
+        self.strip_timer = QTimer(self)
+        self.strip_timer.setInterval(int(1000 / 24))
+        self.strip_timer.timeout.connect(self.next_strip_frame)
+
         preview_layout = QFormLayout()
         preview_layout.addRow(QLabel('Preview:'), preview_options_layout)
 
@@ -182,6 +263,12 @@ class TinyElements_Library(QWidget):
         master_layout.addLayout(preview_layout)
         master_layout.addLayout(thumb_layout)
 
+        # keep the listing current as elements come and go
+        self.watch_signals = WatchSignals()
+        self.watch_signals.changed.connect(self.library_change_handler)
+        self.watcher = LibraryWatcher([GLOBAL_DIR, SHOW_DIR], self.index_library_change)
+        self.watcher.start()
+
         title = "2D Element Catalog"
         self.setMinimumSize(400, 200)
         self.setWindowTitle(title)
@@ -190,14 +277,12 @@ class TinyElements_Library(QWidget):
     def updateValue(self):
         pass
 
-    def search_elements(self, search_text):
-        """Match the head of the frag name with search text
-
-            Returns:
-            a catalog of matching elements
-        """
-        table_data = [n for n in self.element_list if search_text.lower() in n.lower()]
-        return table_data    
+    def closeEvent(self, event):
+        self.strip_timer.stop()
+        self.previews.shutdown()
+        self.watcher.stop()
+        self.thumb_queue.shutdown(cancel=True)
+        QWidget.closeEvent(self, event)
 
     def current_start_frame(self):
         """Set the start frame to the current frame.
@@ -250,7 +335,10 @@ class TinyElements_Library(QWidget):
     def eventFilter(self, object, event):
         #print(event.type(), object)
         if event.type() == QEvent.Type.Enter:
-            self.thumb.setPaused(True)
+            if self.strip is not None:
+                self.strip_timer.stop()
+            else:
+                self.thumb.setPaused(True)
 
         if event.type() == QEvent.Type.Leave:
             self.check_playstate()
@@ -259,6 +347,11 @@ class TinyElements_Library(QWidget):
             xpos = event.pos().x()
             label_size = self.gif_label.size().width()
             value = max(0, min(xpos, label_size))
+            if self.strip is not None:
+                # any frame is just a crop of the one pixmap
+                framecount = len(self.strip['rects'])
+                self.show_strip_frame(min(int(value/float(label_size) * framecount), framecount - 1))
+                return False
             framecount = self.thumb.frameCount()
             value = int(value/float(label_size) * framecount)
             #print(value, framecount)
@@ -277,23 +370,19 @@ class TinyElements_Library(QWidget):
         ui_type = type(target).__name__
 
         if 'Load' in target.text():
-            indexes = self.table.selectionModel().selectedRows()
-            load_info=dict()
-            elements_to_load = list()
-            for index in sorted(indexes):
-                row = index.row()
-                elements_to_load.append(self.table.item(row,1).text())
-
-            load_info['element_list'] = elements_to_load
-            load_info['type'] = self.load_combo.currentText()
-            load_info['category'] = self.category_combo.currentText()
-            load_info['start_frame'] = int(self.frame_field.text())
-            load_info['copy_to'] = self.copy_box.isChecked()
-            load_info['global_lib'] = GLOBAL_DIR
-            load_info['show_lib'] = SHOW_DIR
-            load_info['from_dir'] = self.catalog_combo.currentText()
-
-            load_element_list(load_info)
+            # search results can span categories, so load a category at a time
+            for (library, category), elements_to_load in self.selected_by_category():
+                load_info=dict()
+                load_info['element_list'] = elements_to_load
+                load_info['type'] = self.load_combo.currentText()
+                load_info['category'] = category
+                load_info['start_frame'] = int(self.frame_field.text())
+                load_info['copy_to'] = self.copy_box.isChecked()
+                load_info['global_lib'] = GLOBAL_DIR
+                load_info['show_lib'] = SHOW_DIR
+                load_info['from_dir'] = 'Show Library' if library == SHOW_DIR else 'Global Library'
+
+                load_element_list(load_info)
 
         if 'Reset' in target.text():
             #self.current_start_frame
@@ -309,20 +398,151 @@ class TinyElements_Library(QWidget):
             self.check_thumbstate()
         
         if 'Thumb' in target.text():
-            indexes = self.table.selectionModel().selectedRows()
-            element_info=dict()
-            elements_to_load = list()
-            for index in sorted(indexes):
-                row = index.row()
-                elements_to_load.append(self.table.item(row,1).text())
+            category = self.category_combo.currentText()
+            batch = self.thumb_batch_combo.currentText()
+            if 'Library' in batch:
+                self.thumb_queue.submit_library(self.LIB_DIR)
+                self.thumb_queue.submit_sheets(self.LIB_DIR, self.index.get_categories(self.LIB_DIR))
+            elif 'Category' in batch:
+                self.thumb_queue.submit_category(self.LIB_DIR, category)
+                self.thumb_queue.submit_sheets(self.LIB_DIR, [category])
+            else:
+                # asked for by name, so build them even if they look current
+                for (library, category), elements_to_load in self.selected_by_category():
+                    self.thumb_queue.submit_elements(library, category, elements_to_load, force=True)
+                    self.thumb_queue.submit_sheets(library, [category])
+
+    def thumb_sampling_handler(self, data=None):
+        # only affects thumbnails queued from here on
+        self.thumb_queue.max_count = self.thumb_samples_field.value()
+        self.thumb_queue.strategy = self.thumb_sampling_combo.currentText()
+
+    def thumb_done_handler(self, result):
+        """Update the Thumb column as background thumbnails finish
+
+        Arguments:
+        result (dict) : result from tinyelements_thumbmaker.make_element_thumb
+
+        Returns:
+        None.
+        """
+        if result['status'] == 'failed':
+            print('thumbnail failed for %s : %s'%(result['element'], result['error']))
+            return
+        if result['library'] != self.LIB_DIR or result['category'] != self.category_combo.currentText():
+            return
+        if result['element'] == CONTACT_DIR:
+            if not self.searching_all:
+                self.show_contact_sheet(result['library'], result['category'])
+            return
+
+        if result['element'] in self.element_rows:
+            self.element_rows[result['element']]['has_thumb'] = 1
+        self.table_model.set_thumb(result['element'], True)
+
+    def index_library_change(self, event):
+        """Runs on the watcher thread - bring the index up to date for an element event,
+            scanning any new element here so the UI thread only has a finished row to add
+
+        Arguments:
+        event (dict) : event from tinyelements_watcher.make_event
+
+        Returns:
+        None.
+        """
+        if event['element'] is not None:
+            if event['type'] in ['deleted', 'moved']:
+                self.index.remove_element(event['library'], event['old_category'] or event['category'],
+                                          event['old_name'] or event['element'])
+            if event['type'] in ['created', 'moved']:
+                event['row'] = self.index.refresh_element(event['library'], event['category'], event['element'])
+        self.watch_signals.changed.emit(event)
+
+    def library_change_handler(self, event):
+        """Apply a watcher event to the category list and table without a rescan.
+            The index has already been updated on the watcher thread (index_library_change).
+
+        Arguments:
+        event (dict) : event from tinyelements_watcher.make_event
+
+        Returns:
+        None.
+        """
+        # rebuilt on the next library-wide search
+        self.search_index = None
+
+        if event['library'] != self.LIB_DIR:
+            return
 
-            element_info['element_list'] = elements_to_load
-            element_info['category'] = self.category_combo.currentText()
-            element_info['global_lib'] = GLOBAL_DIR
-            element_info['show_lib'] = SHOW_DIR
-            element_info['from_dir'] = self.catalog_combo.currentText()
+        if event['type'] == 'rescan':
+            self.refresh_listing()
+            return
 
-            generate_thumb(element_info)
+        if event['element'] is None:
+            self.update_category_combo(event)
+            return
+
+        category = self.category_combo.currentText()
+        if event['type'] in ['deleted', 'moved']:
+            old_category = event['old_category'] or event['category']
+            old_name = event['old_name'] or event['element']
+            if old_category == category:
+                self.remove_element_row(old_name)
+
+        if event['type'] in ['created', 'moved'] and event['category'] == category:
+            self.add_element_row(event['row'])
+
+    def update_category_combo(self, event):
+        """Add, remove or rename a category in the dropdown
+
+        Arguments:
+        event (dict) : a category level watcher event
+
+        Returns:
+        None.
+        """
+        categories = [self.category_combo.itemText(i) for i in range(self.category_combo.count())]
+        if event['type'] in ['deleted', 'moved']:
+            old_name = event['old_name'] or event['category']
+            if old_name in categories:
+                self.category_combo.removeItem(categories.index(old_name))
+                categories.remove(old_name)
+        if event['type'] in ['created', 'moved'] and event['category'] not in categories:
+            categories.append(event['category'])
+            categories.sort()
+            self.category_combo.insertItem(categories.index(event['category']), event['category'])
+
+    def add_element_row(self, row):
+        """Add a single element to the listing and, if it matches the search, the table
+
+        Arguments:
+        row (dict) : element row from the index
+
+        Returns:
+        None.
+        """
+        if row['name'] not in self.element_rows:
+            self.element_list.append(row['name'])
+            self.element_list.sort()
+        self.element_rows[row['name']] = row
+        # the proxy takes care of the search filter and sorting
+        if not self.searching_all:
+            self.table_model.add_element(row)
+
+    def remove_element_row(self, element):
+        """Take a single element out of the listing and the table
+
+        Arguments:
+        element (string) : Name of the element
+
+        Returns:
+        None.
+        """
+        if element in self.element_rows:
+            del self.element_rows[element]
+            self.element_list.remove(element)
+        if not self.searching_all:
+            self.table_model.remove_element(element)
 
     def text_field_edit_handler(self, data=None):
         """For live searching the names and passes those right to populate table
@@ -330,8 +550,73 @@ class TinyElements_Library(QWidget):
         Returns:
         None.
         """
-        table_data = self.search_elements(self.search_field.text())
-        self.populate_table(table_data)
+        self.search_timer.start()
+
+    def apply_search(self):
+        """Filter the table to the search text - in memory, no rebuild. With
+            'All Categories' on, the table shows ranked hits from every category
+            of both libraries instead.
+
+        Returns:
+        None.
+        """
+        text = self.search_field.text()
+        if self.search_all_box.isChecked() and text.strip():
+            if self.search_index is None:
+                self.search_index = SearchIndex().build([GLOBAL_DIR, SHOW_DIR], self.index)
+            rows = [dict(doc, show_category=True) for score, doc in self.search_index.search(text, limit=500)]
+            self.table_proxy.setFilterFixedString('')
+            self.table_model.set_elements(rows)
+            # keep the ranking rather than sorting by name
+            self.table_proxy.sort(-1)
+            self.searching_all = True
+            return
+
+        if self.searching_all:
+            self.searching_all = False
+            self.populate_table(self.element_list)
+            self.table.sortByColumn(1, Qt.AscendingOrder)
+        self.table_proxy.setFilterFixedString(text)
+
+    def selected_rows(self):
+        """Rows behind the selected elements, in table order, with library and
+            category filled in
+
+        Returns:
+        list of row dictionaries.
+        """
+        indexes = self.table.selectionModel().selectedRows(1)
+        rows = list()
+        for index in sorted(indexes, key=lambda i: i.row()):
+            row = dict(self.table_model.row_at(self.table_proxy.mapToSource(index).row()))
+            row.setdefault('library', self.LIB_DIR)
+            row.setdefault('category', self.category_combo.currentText())
+            rows.append(row)
+        return rows
+
+    def selected_elements(self):
+        """Names of the selected elements, in table order
+
+        Returns:
+        list of element names.
+        """
+        return [row['name'] for row in self.selected_rows()]
+
+    def selected_by_category(self):
+        """Selected element names grouped by where they live
+
+        Returns:
+        list of ((library, category), [element names]) in table order.
+        """
+        groups = dict()
+        order = list()
+        for row in self.selected_rows():
+            key = (row['library'], row['category'])
+            if key not in groups:
+                groups[key] = list()
+                order.append(key)
+            groups[key].append(row['name'])
+        return [(key, groups[key]) for key in order]
 
     def table_click_handler(self, data=None):
         """Handle clicks w/in the table:
@@ -340,31 +625,87 @@ class TinyElements_Library(QWidget):
             Returns:
             None.
         """
-        self.table.selectRow(data)
+        # the preview follows the current row, see current_row_handler
+        self.table.selectRow(data.row())
+
+    def current_row_handler(self, current=None, previous=None):
+        """Clicks and arrow keys both land here
+
+            Returns:
+            None.
+        """
         self.get_current_thumb()
 
     def get_current_thumb(self):
-        indexes = self.table.selectionModel().selectedRows()
+        rows = self.selected_rows()
 
         thumb_path = self.default_thumb
+        self.strip = None
+        self.strip_timer.stop()
+        size = PREVIEW_HEIGHTS.get(self.preview_combo.currentText())
 
-        if len(indexes) > 0 and 'None' not in self.preview_combo.currentText():
+        preview = None
 
-            row = indexes[-1].row()
+        if len(rows) > 0 and size is not None:
 
-            element_name = self.table.item(row,1).text()
-            element_type = self.category_combo.currentText()
+            element_name = rows[-1]['name']
+            element_type = rows[-1]['category']
+            element_path = os.path.join(rows[-1]['library'], element_type, element_name)
 
-            t_path = os.path.join(self.LIB_DIR, element_type, element_name, element_name+'.gif')
-        
-            if os.path.exists(t_path):
-                thumb_path = t_path            
-        
-        self.thumb = QMovie(thumb_path)
-        self.gif_label.setMovie(self.thumb)
-        self.thumb.setCacheMode(QMovie.CacheAll)
+            preview = self.previews.fetch(element_path, element_name, size)
+            self.prefetch_neighbors(size)
+
+        if preview is not None and preview['kind'] == 'strip':
+            self.strip = preview
+        else:
+            if preview is not None:
+                # the gif bytes are already in memory, play them from there
+                self.thumb_buffer = QBuffer()
+                self.thumb_buffer.setData(preview['data'])
+                self.thumb_buffer.open(QIODevice.ReadOnly)
+                self.thumb = QMovie(self.thumb_buffer, QByteArray())
+            else:
+                self.thumb = QMovie(thumb_path)
+            self.gif_label.setMovie(self.thumb)
+            self.thumb.setCacheMode(QMovie.CacheAll)
         self.check_thumbstate()
 
+    def prefetch_neighbors(self, size):
+        """Start loading previews for the rows around the current one, nearest first,
+            so arrowing up or down the table finds them already in memory
+
+            Arguments:
+            size (int) : preview height
+
+            Returns:
+            None.
+        """
+        current = self.table.currentIndex().row()
+        if current < 0:
+            return
+        neighbors = list()
+        for distance in range(1, PREVIEW_PREFETCH + 1):
+            for proxy_row in [current + distance, current - distance]:
+                if not 0 <= proxy_row < self.table_proxy.rowCount():
+                    continue
+                source = self.table_proxy.mapToSource(self.table_proxy.index(proxy_row, 1))
+                row = self.table_model.row_at(source.row())
+                element_path = os.path.join(row.get('library', self.LIB_DIR),
+                                            row.get('category', self.category_combo.currentText()), row['name'])
+                neighbors.append((element_path, row['name'], size))
+        self.previews.prefetch(neighbors)
+
+    def show_strip_frame(self, frame):
+        self.strip_frame = frame % len(self.strip['rects'])
+        x, y, w, h = self.strip['rects'][self.strip_frame]
+        self.gif_label.setPixmap(QPixmap.fromImage(self.strip['image'].copy(x, y, w, h)))
+
+    def next_strip_frame(self):
+        if self.strip is None:
+            self.strip_timer.stop()
+            return
+        self.show_strip_frame(self.strip_frame + 1)
+
     def combo_click_handler(self, data=None):
         """Handle the combo boxes - just one in here app though
 
@@ -400,12 +741,16 @@ class TinyElements_Library(QWidget):
             self.show_preview(True)
             self.check_playstate()
 
-        self.gif_label.setMovie(self.thumb)
+        if self.strip is None:
+            self.gif_label.setMovie(self.thumb)
 
     def set_thumbsize(self, size):
-        self.thumb.start()
-        width = self.thumb.currentImage().size().width()
-        height = self.thumb.currentImage().size().height() + 0.001
+        if self.strip is not None:
+            width, height = self.strip['rects'][0][2], self.strip['rects'][0][3] + 0.001
+        else:
+            self.thumb.start()
+            width = self.thumb.currentImage().size().width()
+            height = self.thumb.currentImage().size().height() + 0.001
 
         mult = width/float(height)
         label_width = int(size * mult)
@@ -418,11 +763,20 @@ class TinyElements_Library(QWidget):
         if show:
             self.gif_label.show()
         else:
+            self.strip = None
+            self.strip_timer.stop()
             self.thumb = QMovie(self.default_thumb)
             self.gif_label.hide()
             self.gif_label.setMovie(self.thumb)
 
     def check_playstate(self):
+        if self.strip is not None:
+            if self.preview_playcheck.isChecked():
+                self.strip_timer.start()
+            else:
+                self.strip_timer.stop()
+                self.show_strip_frame(len(self.strip['rects']) // 2)
+            return
         if self.preview_playcheck.isChecked():
             self.thumb.start()
         else:
@@ -441,7 +795,7 @@ class TinyElements_Library(QWidget):
 
         self.load_button.setEnabled(True)
 
-        category_list = get_dirs(self.LIB_DIR)
+        category_list = self.index.get_categories(self.LIB_DIR)
         self.category_combo.addItems(category_list)
         self.category_combo.setCurrentIndex(0)
         self.refresh_listing()
@@ -464,7 +818,9 @@ class TinyElements_Library(QWidget):
         ## TODO ##
         ## This seems dumb and should probably return this value and should be passed the
         ## category listing.. or could just be collapsed into the combobox handler
-        self.element_list = get_dirs(os.path.join(self.LIB_DIR, self.category_combo.currentText()))
+        rows = self.index.get_elements(self.LIB_DIR, self.category_combo.currentText())
+        self.element_rows = dict((row['name'], row) for row in rows)
+        self.element_list = [row['name'] for row in rows]
 
     def make_error_table(self, error_path):
         element_list = list()
@@ -473,51 +829,41 @@ class TinyElements_Library(QWidget):
         element_list.append('Add some elements there')
         element_list.append('or switch back.')
 
-        table_data = list()
-        for element in element_list:
-            element_data = dict()
-            element_data['name'] = element
-            element_data['thumb'] = 'no'
-            table_data.append(element_data)
-
-        self.table.setRowCount(0)
-        self.table.setSortingEnabled(False)
-        for i, d in enumerate(table_data):
-            self.table.insertRow(self.table.rowCount())
-            for j, k in enumerate(['thumb', 'name']):
-                it = QTableWidgetItem()
-                it.setData(Qt.DisplayRole, d[k])
-                self.table.setItem(i,j,it)
-        self.table.setSortingEnabled(True)
+        self.element_rows = dict()
+        self.table_model.set_elements([{'name': element, 'has_thumb': False} for element in element_list])
+        self.table_model.set_contact_sheet(None)
         self.table.show()
 
     def populate_table(self, element_list):
-        """Take a list and fill the table
+        """Take a list and fill the table. Thumbnail presence comes from the index,
+            anything it doesn't know is checked when the row is first drawn.
 
             Returns:
             None.
         """
-        ## TODO ##
-        ## Add thumbnail support to this
-        cat = self.category_combo.currentText()
-        table_data = list()
-        for element in element_list:
-            element_data = dict()
-            element_data['name'] = element
-            element_data['thumb'] = 'no'
-            thumb_path = os.path.join(self.LIB_DIR, cat, element, element+'.gif')
-            if os.path.exists(thumb_path):
-                element_data['thumb'] = 'yes'
-
-            table_data.append(element_data)
-
-        self.table.setRowCount(0)
-        self.table.setSortingEnabled(False)
-        for i, d in enumerate(table_data):
-            self.table.insertRow(self.table.rowCount())
-            for j, k in enumerate(['thumb', 'name']):
-                it = QTableWidgetItem()
-                it.setData(Qt.DisplayRole, d[k])
-                self.table.setItem(i,j,it)
-        self.table.setSortingEnabled(True)
+        library = self.LIB_DIR
+        category = self.category_combo.currentText()
+
+        def has_thumb(element):
+            return os.path.exists(os.path.join(library, category, element, element+'.gif'))
+
+        rows = [self.element_rows.get(element, {'name': element, 'has_thumb': None}) for element in element_list]
+        self.table_model.set_elements(rows, has_thumb)
+        self.show_contact_sheet(library, category)
         self.table.show()
+
+    def show_contact_sheet(self, library, category):
+        """Switch the Thumb column to mini-thumbnails if the category has a contact sheet
+
+            Returns:
+            None.
+        """
+        sheet = self.previews.fetch_sheet(library, category)
+        self.table_model.set_contact_sheet(sheet)
+        header = self.table.verticalHeader()
+        if sheet is not None:
+            header.setDefaultSectionSize(CONTACT_TILE[1] + 4)
+            self.table.setIconSize(QSize(CONTACT_TILE[0], CONTACT_TILE[1]))
+            self.table.setColumnWidth(0, CONTACT_TILE[0] + 8)
+        else:
+            header.setDefaultSectionSize(self.default_row_height)
@@ -0,0 +1,392 @@
+import os, time
+from concurrent.futures import ThreadPoolExecutor
+
+from tinyelements.globals import MANIFEST_HASH, HASH_WORKERS, CRAWL_WORKERS
+from tinyelements.tinyelements_crawler import scan_dir
+from tinyelements.tinyelements_sequence import frames_to_ranges
+from tinyelements.tinyelements_copy import element_copy_list, stat_files
+from tinyelements.tinyelements_manifest import read_manifest, write_manifest, new_manifest, file_entry, hash_file
+
+# Checksum manifests for whole libraries, and checking elements against them. Each element
+# goes in two steps: a stat pass that works out which files need reading, then the hashing,
+# which for a library runs in one pool across every element so a run of small elements
+# doesn't leave threads idle and an overnight audit keeps the file server busy.
+
+# hash jobs handed to the pool at a time, so a library of millions of frames doesn't queue
+# millions of futures
+HASH_BATCH = 4096
+
+PROBLEM_LABELS = [
+    ('missing', 'missing'),
+    ('truncated', 'truncated'),
+    ('corrupt', 'corrupt'),
+    ('changed', 'changed since the manifest'),
+    ('unrecorded', 'not in the manifest'),
+]
+
+# checked against a source element rather than a manifest
+SOURCE_LABELS = {'changed': 'a different size from the source', 'unrecorded': 'not in the source'}
+
+# most file names listed per problem
+LIST_FILES = 5
+
+
+def element_files(element_path):
+    """The files that make up an element: its longest sequence plus anything riding along
+
+        Arguments:
+        element_path (string) : full path to the element directory
+
+        Returns:
+        (sequence info, list of file names) tuple, (None, []) when there are no images.
+    """
+    try:
+        return element_copy_list(scan_dir(element_path)[1])
+    except ValueError:
+        return None, []
+
+
+def hash_work(works, workers=HASH_WORKERS):
+    """Hash the files every piece of work asks for, across one pool
+
+        Arguments:
+        works (list) : dictionaries with 'jobs', a list of (key, path, algorithm)
+        workers (int) : how many files to hash at once
+
+        Returns:
+        list, per work, of {key : hex digest, None if the file couldn't be read}.
+    """
+    jobs = [(i, key, path, algorithm) for i, work in enumerate(works) for key, path, algorithm in work['jobs']]
+
+    def run(job):
+        try:
+            return hash_file(job[2], job[3])
+        except OSError:
+            return None
+
+    digests = [dict() for _ in works]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for start in range(0, len(jobs), HASH_BATCH):
+            batch = jobs[start:start + HASH_BATCH]
+            for (i, key, _, _), digest in zip(batch, pool.map(run, batch)):
+                digests[i][key] = digest
+    return digests
+
+
+def manifest_work(element_path, algorithm=MANIFEST_HASH, rehash=False, stat_workers=HASH_WORKERS):
+    """Stat pass for a manifest: which files are new, or changed since they were hashed
+
+        Arguments:
+        element_path (string) : full path to the element directory
+        algorithm (string) : see tinyelements_manifest.hash_file
+        rehash (bool) : hash everything, even files that look unchanged
+        stat_workers (int) : how many files to stat at once
+
+        Returns:
+        work dictionary for hash_work and finish_manifest.
+    """
+    _, file_list = element_files(element_path)
+    old = read_manifest(element_path)
+    old_files = old['files'] if old else dict()
+    element = old['element'] if old else os.path.basename(element_path.rstrip('/'))
+    stats = stat_files(element_path, file_list, stat_workers)
+
+    jobs = list()
+    for filename, stat in sorted(stats.items()):
+        entry = old_files.get(filename)
+        current = (entry is not None and entry.get('hash') and old['algorithm'] == algorithm and
+                   entry['size'] == stat['size'] and entry['mtime'] == stat['mtime'])
+        if rehash or not current:
+            jobs.append((filename, os.path.join(element_path, filename), algorithm))
+    pending = [f for f in old.get('pending', []) if f not in stats] if old else []
+    return {'path': element_path, 'element': element, 'algorithm': algorithm, 'old': old_files, 'stats': stats,
+            'pending': pending, 'jobs': jobs}
+
+
+def finish_manifest(work, digests):
+    """Write the manifest for a manifest_work once its files are hashed. Entries for copies
+        keep the source size and mtime they were copied with while the file is untouched.
+
+        Returns:
+        dictionary of files (in the manifest), hashed (this time round) and bytes hashed.
+    """
+    manifest = new_manifest(work['element'], work['algorithm'])
+    if work['pending']:
+        manifest['pending'] = work['pending']
+    hashed = 0
+    hashed_bytes = 0
+    for filename, stat in sorted(work['stats'].items()):
+        entry = work['old'].get(filename)
+        if filename not in digests:
+            manifest['files'][filename] = entry
+            continue
+        if digests[filename] is None:
+            continue
+        source = None
+        if entry and 'source_size' in entry and entry['size'] == stat['size'] and entry['mtime'] == stat['mtime']:
+            source = {'size': entry['source_size'], 'mtime': entry['source_mtime']}
+        try:
+            manifest['files'][filename] = file_entry(os.path.join(work['path'], filename), digests[filename], source)
+        except OSError:
+            continue
+        hashed += 1
+        hashed_bytes += stat['size']
+    write_manifest(work['path'], manifest)
+    return {'files': len(manifest['files']), 'hashed': hashed, 'bytes': hashed_bytes}
+
+
+def update_manifest(element_path, algorithm=MANIFEST_HASH, rehash=False, workers=HASH_WORKERS):
+    """Bring an element's manifest up to date, hashing only files that are new or changed
+
+        Arguments:
+        element_path (string) : full path to the element directory
+        algorithm (string) : see tinyelements_manifest.hash_file
+        rehash (bool) : hash everything, even files that look unchanged
+        workers (int) : how many files to hash at once
+
+        Returns:
+        see finish_manifest.
+    """
+    work = manifest_work(element_path, algorithm, rehash, workers)
+    return finish_manifest(work, hash_work([work], workers)[0])
+
+
+def verify_work(element_path, source_path=None, check_hashes=True, stat_workers=HASH_WORKERS):
+    """Stat pass for a verify: compare the files on disk with the element's manifest, or with
+        the element it was copied from when source_path is given, and line up the hashing
+
+        Arguments:
+        element_path (string) : full path to the element directory
+        source_path (string) : the element it should match, e.g. the global copy of a show element
+        check_hashes (bool) : read the frames and compare content, not just sizes
+        stat_workers (int) : how many files to stat at once
+
+        Returns:
+        work dictionary for hash_work and finish_verify.
+    """
+    seq, file_list = element_files(element_path)
+    report = {'path': element_path, 'against': source_path, 'manifest': source_path is not None, 'missing': [],
+              'truncated': [], 'corrupt': [], 'changed': [], 'unrecorded': [],
+              'gaps': seq['missing_frames'] if seq else [], 'unhashed': 0, 'checked': 0, 'bytes': 0}
+
+    pending = list()
+    if source_path is not None:
+        # the source's sizes are the reference, its hashes too where they're still current
+        _, source_files = element_files(source_path)
+        source_manifest = read_manifest(source_path)
+        source_entries = source_manifest['files'] if source_manifest else dict()
+        algorithm = source_manifest['algorithm'] if source_manifest else MANIFEST_HASH
+        reference = dict()
+        for filename, stat in stat_files(source_path, source_files, stat_workers).items():
+            entry = source_entries.get(filename) or dict()
+            current = entry.get('size') == stat['size'] and entry.get('mtime') == stat['mtime']
+            reference[filename] = {'size': stat['size'], 'mtime': None, 'hash': entry.get('hash') if current else None}
+    else:
+        manifest = read_manifest(element_path)
+        report['manifest'] = manifest is not None
+        algorithm = manifest['algorithm'] if manifest else MANIFEST_HASH
+        reference = manifest['files'] if manifest else dict()
+        pending = manifest.get('pending', []) if manifest else []
+
+    stats = stat_files(element_path, sorted(set(file_list).union(reference)), stat_workers)
+    jobs = list()
+    expected = dict()
+    for filename in sorted(reference):
+        entry, stat = reference[filename], stats.get(filename)
+        if stat is None:
+            report['missing'].append(filename)
+        elif stat['size'] < entry['size']:
+            report['truncated'].append(filename)
+        elif stat['size'] > entry['size']:
+            report['changed'].append(filename)
+        elif not check_hashes:
+            continue
+        elif entry.get('hash') is None and source_path is None:
+            report['unhashed'] += 1
+        else:
+            if entry.get('hash') is None:
+                jobs.append((('source', filename), os.path.join(source_path, filename), algorithm))
+            jobs.append((filename, os.path.join(element_path, filename), algorithm))
+            # a copy has its own mtime, so against the source any difference is damage
+            expected[filename] = (entry.get('hash'), source_path is not None or stat['mtime'] == entry['mtime'])
+            report['bytes'] += stat['size']
+
+    report['missing'] = sorted(report['missing'] + [f for f in pending if f not in stats and f not in reference])
+    truncated = set(report['truncated'])
+    for filename in file_list:
+        if filename not in reference and (report['manifest'] or source_path is not None):
+            report['unrecorded'].append(filename)
+        if filename in stats and stats[filename]['size'] == 0 and filename not in truncated:
+            report['truncated'].append(filename)
+    report['truncated'].sort()
+    return {'report': report, 'jobs': jobs, 'expected': expected}
+
+
+def finish_verify(work, digests):
+    """Fill in the content checks for a verify_work once its files are hashed
+
+        Returns:
+        report dictionary:
+                report['path'] : the element directory
+                report['against'] : the source element it was checked against, None for its own manifest
+                report['manifest'] : whether there was a manifest (or source) to check against
+                report['missing'] : files the manifest or source has (or a cut short copy never
+                                    got to) that aren't there
+                report['truncated'] : files shorter than they should be, or empty
+                report['corrupt'] : same size (and mtime) but different content
+                report['changed'] : edited since the manifest was written
+                report['unrecorded'] : element files the manifest or source doesn't have
+                report['gaps'] : frame numbers missing from the sequence
+                report['unhashed'] : files there was no hash to check against
+                report['checked'] : files hashed
+                report['bytes'] : bytes hashed
+    """
+    report = work['report']
+    for filename, (digest_expected, untouched) in sorted(work['expected'].items()):
+        digest = digests.get(filename)
+        if digest_expected is None:
+            digest_expected = digests.get(('source', filename))
+        if digest is None:
+            report['corrupt'].append(filename)
+            continue
+        report['checked'] += 1
+        if digest_expected is None:
+            report['unhashed'] += 1
+        elif digest != digest_expected:
+            report['corrupt' if untouched else 'changed'].append(filename)
+    return report
+
+
+def verify_element(element_path, source_path=None, check_hashes=True, workers=HASH_WORKERS):
+    """Check an element for missing, truncated and corrupt frames and gaps in its numbering
+
+        Arguments:
+        element_path (string) : full path to the element directory
+        source_path (string) : check against this element instead of the manifest
+        check_hashes (bool) : read the frames and compare content, not just sizes
+        workers (int) : how many files to hash at once
+
+        Returns:
+        see finish_verify.
+    """
+    work = verify_work(element_path, source_path, check_hashes, workers)
+    return finish_verify(work, hash_work([work], workers)[0])
+
+
+def report_problems(report):
+    """What's wrong, from a verify report, as lines to print
+
+        Arguments:
+        report (dict) : from verify_element
+
+        Returns:
+        list of problem descriptions, empty if the element is fine.
+    """
+    problems = list()
+    if not report['manifest']:
+        problems.append('no manifest')
+    for key, label in PROBLEM_LABELS:
+        files = report[key]
+        if report['against'] is not None:
+            label = SOURCE_LABELS.get(key, label)
+        if files:
+            listed = ', '.join(files[:LIST_FILES]) + (' ...' if len(files) > LIST_FILES else '')
+            problems.append('%d %s: %s'%(len(files), label, listed))
+    if report['gaps']:
+        problems.append('frames missing from the numbering: %s'%frames_to_ranges(report['gaps']))
+    return problems
+
+
+def library_elements(library, categories=None):
+    """Every element directory in a library
+
+        Arguments:
+        library (string) : path to the library root
+        categories (list) : only these categories, all of them if None
+
+        Returns:
+        list of (category, element, full path) tuples.
+    """
+    elements = list()
+    for category in scan_dir(library)[0]:
+        if categories is not None and category not in categories:
+            continue
+        try:
+            names = scan_dir(os.path.join(library, category))[0]
+        except OSError:
+            continue
+        elements += [(category, name, os.path.join(library, category, name)) for name in names]
+    return elements
+
+
+def run_library(library, categories, make_work, finish, workers):
+    """Stat pass over every element, then all the hashing in one pool, then finish each
+
+        Returns:
+        (dictionary of 'category/element' : finish result or {'error'}, seconds taken).
+    """
+    start = time.perf_counter()
+    elements = library_elements(library, categories)
+
+    def work_for(element):
+        try:
+            return make_work(element)
+        except OSError as e:
+            return {'error': str(e), 'jobs': []}
+
+    with ThreadPoolExecutor(max_workers=CRAWL_WORKERS) as pool:
+        works = list(pool.map(work_for, elements))
+    digests = hash_work(works, workers)
+
+    results = dict()
+    for (category, name, _), work, element_digests in zip(elements, works, digests):
+        key = '%s/%s'%(category, name)
+        if 'error' in work:
+            results[key] = {'error': work['error']}
+            continue
+        try:
+            results[key] = finish(work, element_digests)
+        except OSError as e:
+            results[key] = {'error': str(e)}
+    return results, time.perf_counter() - start
+
+
+def update_library_manifests(library, categories=None, algorithm=MANIFEST_HASH, rehash=False, workers=HASH_WORKERS):
+    """Bring the manifest of every element in a library up to date
+
+        Arguments:
+        library (string) : path to the library root
+        categories (list) : only these categories, all of them if None
+        algorithm (string) : see tinyelements_manifest.hash_file
+        rehash (bool) : hash everything, even files that look unchanged
+        workers (int) : how many files to hash at once
+
+        Returns:
+        (dictionary of 'category/element' : see finish_manifest, seconds taken).
+    """
+    return run_library(library, categories, lambda element: manifest_work(element[2], algorithm, rehash, 1),
+                       finish_manifest, workers)
+
+
+def audit_library(library, categories=None, source_library=None, check_hashes=True, workers=HASH_WORKERS):
+    """Verify every element in a library
+
+        Arguments:
+        library (string) : path to the library root
+        categories (list) : only these categories, all of them if None
+        source_library (string) : check elements against their copies in this library (e.g. the
+                                  global one for a show), elements only here go by their manifest
+        check_hashes (bool) : read the frames and compare content, not just sizes
+        workers (int) : how many files to hash at once
+
+        Returns:
+        (dictionary of 'category/element' : see finish_verify, seconds taken).
+    """
+    def make_work(element):
+        category, name, element_path = element
+        source_path = None
+        if source_library is not None and os.path.isdir(os.path.join(source_library, category, name)):
+            source_path = os.path.join(source_library, category, name)
+        return verify_work(element_path, source_path, check_hashes, 1)
+
+    return run_library(library, categories, make_work, finish_verify, workers)
@@ -0,0 +1,283 @@
+import os, sys, struct, select, threading
+import ctypes, ctypes.util
+
+from tinyelements.globals import IGNORE_DIRS, WATCH_POLL_INTERVAL
+from tinyelements.tinyelements_crawler import scan_dir
+
+# from <sys/inotify.h>
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF
+EVENT_HEADER = struct.Struct('iIII')
+
+# inotify only hears about changes made by this machine on these
+NETWORK_FS = ['nfs', 'nfs4', 'cifs', 'smbfs', 'smb3', 'afs', 'fuse.sshfs', 'lustre', 'gpfs', 'beegfs']
+
+
+def get_fs_type(path):
+    """Find the filesystem type a path lives on from /proc/mounts
+
+        Arguments:
+        path (string) : any path
+
+        Returns:
+        string filesystem type, or None if it can't be worked out.
+    """
+    path = os.path.realpath(path)
+    best = ('', None)
+    try:
+        with open('/proc/mounts') as mounts:
+            for line in mounts:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                mount_point = fields[1].replace('\\040', ' ')
+                if (path == mount_point or path.startswith(mount_point.rstrip('/') + '/')) and len(mount_point) > len(best[0]):
+                    best = (mount_point, fields[2])
+    except OSError:
+        return None
+    return best[1]
+
+
+def can_use_inotify(path):
+    """inotify is only worth using on Linux and on local filesystems
+
+        Arguments:
+        path (string) : the library root
+
+        Returns:
+        bool.
+    """
+    if not sys.platform.startswith('linux'):
+        return False
+    return get_fs_type(path) not in NETWORK_FS
+
+
+def make_event(event_type, library, category, element=None, old_name=None, old_category=None):
+    """Events handed to the watcher callback
+
+        Returns:
+        Dictionary containing:
+                event['type'] : 'created', 'deleted', 'moved' or 'rescan'
+                event['library'] : library root
+                event['category'] : category name (None for 'rescan')
+                event['element'] : element name, None when the category itself changed
+                event['old_name'] : the element (or category) name before a move
+                event['old_category'] : the category an element was moved out of
+    """
+    return {'type': event_type, 'library': library, 'category': category,
+            'element': element, 'old_name': old_name, 'old_category': old_category}
+
+
+class InotifyBackend(object):
+    """Watches library roots and their category directories with inotify.
+
+    Arguments:
+    roots (list) : library roots to watch
+    on_change (function) : called with each event from make_event
+
+    """
+
+    def __init__(self, roots, on_change):
+        self.roots = roots
+        self.on_change = on_change
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        # watch descriptor -> (library, category or None)
+        self.watches = dict()
+        for root in roots:
+            self.add_watch(root, root, None)
+            try:
+                categories, _ = scan_dir(root)
+            except OSError:
+                categories = []
+            for category in categories:
+                self.add_watch(os.path.join(root, category), root, category)
+
+    def add_watch(self, path, library, category):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            print('Can not watch %s : %s'%(path, os.strerror(ctypes.get_errno())))
+            return
+        self.watches[wd] = (library, category)
+
+    def run(self, stop_event):
+        try:
+            while not stop_event.is_set():
+                ready, _, _ = select.select([self.fd], [], [], 0.5)
+                if ready:
+                    self.handle(os.read(self.fd, 64 * 1024))
+        finally:
+            os.close(self.fd)
+
+    def handle(self, data):
+        moved_from = dict()
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                for root in self.roots:
+                    self.on_change(make_event('rescan', root, None))
+                continue
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+            if wd not in self.watches or not mask & IN_ISDIR or name in IGNORE_DIRS:
+                continue
+
+            library, category = self.watches[wd]
+            if category is None:
+                # something changed at the category level
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self.add_watch(os.path.join(library, name), library, name)
+                category, element = name, None
+            else:
+                element = name
+
+            if mask & IN_MOVED_FROM:
+                moved_from[cookie] = (library, category, element)
+            elif mask & IN_MOVED_TO and cookie in moved_from:
+                old = moved_from.pop(cookie)
+                if element is None:
+                    self.on_change(make_event('moved', library, category, None, old[1]))
+                elif old[2] is None:
+                    # a whole category moved down into another one
+                    self.on_change(make_event('deleted', old[0], old[1]))
+                    self.on_change(make_event('created', library, category, element))
+                else:
+                    self.on_change(make_event('moved', library, category, element, old[2], old[1]))
+            elif mask & (IN_CREATE | IN_MOVED_TO):
+                self.on_change(make_event('created', library, category, element))
+            elif mask & IN_DELETE:
+                self.on_change(make_event('deleted', library, category, element))
+
+        # moved out of the library altogether
+        for library, category, element in moved_from.values():
+            self.on_change(make_event('deleted', library, category, element))
+
+
+class PollingBackend(object):
+    """Watches library roots by polling the mtime of the root and category
+        directories. Slower to notice things than inotify but works over NFS.
+
+    Arguments:
+    roots (list) : library roots to watch
+    on_change (function) : called with each event from make_event
+    interval (float) : seconds between polls
+
+    """
+
+    def __init__(self, roots, on_change, interval=WATCH_POLL_INTERVAL):
+        self.roots = roots
+        self.on_change = on_change
+        self.interval = interval
+        # directory path -> (mtime, set of subdirectory names), filled in by run so the
+        # first walk of a network library happens on the watcher thread
+        self.snapshot = dict()
+
+    def check(self, path, library, category, quiet=False):
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            mtime = None
+        known = self.snapshot.get(path)
+        if known is not None and known[0] == mtime:
+            if category is None:
+                for name in known[1]:
+                    self.check(os.path.join(path, name), library, name, quiet)
+            return
+
+        try:
+            names = set(scan_dir(path)[0]) if mtime is not None else set()
+        except OSError:
+            names = set()
+        old_names = known[1] if known is not None else set()
+        self.snapshot[path] = (mtime, names)
+
+        if not quiet:
+            for name in sorted(names - old_names):
+                if category is None:
+                    self.on_change(make_event('created', library, name))
+                else:
+                    self.on_change(make_event('created', library, category, name))
+            for name in sorted(old_names - names):
+                if category is None:
+                    self.on_change(make_event('deleted', library, name))
+                    self.forget(os.path.join(path, name))
+                else:
+                    self.on_change(make_event('deleted', library, category, name))
+
+        if category is None:
+            for name in names:
+                # new categories get their first look quietly, the category event covers them
+                self.check(os.path.join(path, name), library, name, quiet or name not in old_names)
+
+    def forget(self, path):
+        self.snapshot.pop(path, None)
+
+    def run(self, stop_event):
+        for root in self.roots:
+            if stop_event.is_set():
+                return
+            self.check(root, root, None, quiet=True)
+        while not stop_event.wait(self.interval):
+            for root in self.roots:
+                self.check(root, root, None)
+
+
+class LibraryWatcher(object):
+    """Keeps an eye on the global and show libraries and reports elements and
+        categories coming and going. Local roots use inotify, network roots
+        (or anything inotify can't handle) fall back to mtime polling.
+
+    Arguments:
+    roots (list) : library roots to watch
+    on_change (function) : called with each event from make_event, from a background thread
+    interval (float) : seconds between polls for the polling fallback
+
+    """
+
+    def __init__(self, roots, on_change, interval=WATCH_POLL_INTERVAL):
+        self.stop_event = threading.Event()
+        self.threads = list()
+
+        roots = [root for root in roots if os.path.isdir(root)]
+        local_roots = [root for root in roots if can_use_inotify(root)]
+        poll_roots = [root for root in roots if root not in local_roots]
+
+        self.backends = list()
+        if local_roots:
+            try:
+                self.backends.append(InotifyBackend(local_roots, on_change))
+            except (OSError, AttributeError) as e:
+                print('inotify not available, polling instead : %s'%e)
+                poll_roots.extend(local_roots)
+        if poll_roots:
+            self.backends.append(PollingBackend(poll_roots, on_change, interval))
+
+    def start(self):
+        for backend in self.backends:
+            thread = threading.Thread(target=backend.run, args=(self.stop_event,), daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        self.stop_event.set()
+        for thread in self.threads:
+            thread.join(timeout=2)
+        self.threads = list()
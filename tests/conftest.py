@@ -0,0 +1,37 @@
+"""Throwaway libraries shared by the tests, no nuke needed.
+
+    python -m pytest tests
+"""
+import os, sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), 'src'))
+
+import pytest
+
+
+def add_frames(library, category, element, frames, size=4096):
+    element_path = os.path.join(library, category, element)
+    os.makedirs(element_path, exist_ok=True)
+    for frame in frames:
+        with open(os.path.join(element_path, '%s.%04d.exr'%(element, frame)), 'wb') as f:
+            f.write(os.urandom(size))
+    return element_path
+
+
+def touch_later(path, seconds=10):
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + seconds))
+
+
+@pytest.fixture
+def make_element():
+    """make_element(library, category, element, frames, size=4096) - write exr frames of random
+        bytes into an element directory, made if needed, and return its path"""
+    return add_frames
+
+
+@pytest.fixture
+def bump_mtime():
+    """bump_mtime(path, seconds=10) - push a file or directory's mtime forward"""
+    return touch_later
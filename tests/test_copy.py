@@ -0,0 +1,218 @@
+"""Copies and syncs between throwaway global and show libraries, no nuke needed.
+
+    python -m pytest tests
+"""
+import os, shutil
+
+import pytest
+
+from tinyelements import tinyelements_copy
+from tinyelements.tinyelements_copy import copy_element, copy_files, element_needs_sync, plan_sync
+from tinyelements.tinyelements_verify import update_manifest, verify_element, report_problems
+from tinyelements.tinyelements_manifest import read_manifest
+
+
+@pytest.fixture
+def load_info(tmp_path, make_element):
+    global_lib, show_lib = str(tmp_path / 'global'), str(tmp_path / 'show')
+    update_manifest(make_element(global_lib, 'Fire', 'fire_01', range(1001, 1011)))
+    return {'global_lib': global_lib, 'show_lib': show_lib, 'category': 'Fire'}
+
+
+def element_path(load_info, lib):
+    return os.path.join(load_info[lib], 'Fire', 'fire_01')
+
+
+def make_twin(load_info):
+    """fire_02 with the same frames as fire_01, so a copy of it can take them from the show"""
+    source = element_path(load_info, 'global_lib')
+    other = os.path.join(load_info['global_lib'], 'Fire', 'fire_02')
+    os.makedirs(other)
+    for n in range(1001, 1011):
+        shutil.copy2(os.path.join(source, 'fire_01.%04d.exr'%n), os.path.join(other, 'fire_02.%04d.exr'%n))
+    update_manifest(other)
+    return other
+
+
+def test_resync_touched_frame_keeps_it(load_info, bump_mtime):
+    # the show copy has the same hash as the touched global frame, it mustn't be its own source
+    copy_element(load_info, 'fire_01')
+    bump_mtime(os.path.join(element_path(load_info, 'global_lib'), 'fire_01.1003.exr'))
+    update_manifest(element_path(load_info, 'global_lib'))
+
+    result = copy_element(load_info, 'fire_01')
+    assert result['failed'] == []
+    assert result['copied'] == ['fire_01.1003.exr']
+    show_frame = os.path.join(element_path(load_info, 'show_lib'), 'fire_01.1003.exr')
+    assert os.path.getsize(show_frame) == 4096
+    assert report_problems(verify_element(element_path(load_info, 'show_lib'),
+                                          element_path(load_info, 'global_lib'))) == []
+
+
+def test_edited_show_frame_not_shared(load_info, bump_mtime):
+    other = make_twin(load_info)
+    copy_element(load_info, 'fire_01')
+
+    # edited in place without changing size, like a fixed size exr
+    edited = os.path.join(element_path(load_info, 'show_lib'), 'fire_01.1005.exr')
+    with open(edited, 'r+b') as f:
+        f.write(b'\0\0\0\0')
+    bump_mtime(edited)
+
+    result = copy_element(load_info, 'fire_02')
+    assert 'fire_02.1005.exr' not in result['shared']
+    assert len(result['shared']) == 9
+    assert report_problems(verify_element(os.path.join(load_info['show_lib'], 'Fire', 'fire_02'), other)) == []
+
+
+def test_content_index_read_once_per_load(load_info, monkeypatch):
+    make_twin(load_info)
+
+    calls = []
+    content_index = tinyelements_copy.content_index
+    monkeypatch.setattr(tinyelements_copy, 'content_index', lambda library: calls.append(library) or content_index(library))
+    copy_element(load_info, 'fire_01')
+    result = copy_element(load_info, 'fire_02')
+    assert len(calls) == 1
+    # frames copied earlier in the same load are found without reading the library again
+    assert len(result['shared']) == 10
+
+
+def test_show_sidecar_survives_sync(load_info):
+    source = element_path(load_info, 'global_lib')
+    for name, data in [('fire_01.json', '{"source_point": {"1001": [1, 2]}}'), ('fire_01.gif', 'GIF89a')]:
+        with open(os.path.join(source, name), 'w') as f:
+            f.write(data)
+    copy_element(load_info, 'fire_01')
+
+    show = element_path(load_info, 'show_lib')
+    with open(os.path.join(show, 'fire_01.json'), 'w') as f:
+        f.write('{"source_point": {"1001": [300, 400]}}')
+    assert not element_needs_sync(load_info, 'fire_01')
+
+    # the global element loses a frame - only that goes from the show
+    os.remove(os.path.join(source, 'fire_01.1010.exr'))
+    assert element_needs_sync(load_info, 'fire_01')
+    result = copy_element(load_info, 'fire_01')
+    assert result['removed'] == ['fire_01.1010.exr']
+    assert result['copied'] == []
+    with open(os.path.join(show, 'fire_01.json')) as f:
+        assert '300' in f.read()
+    assert os.path.exists(os.path.join(show, 'fire_01.gif'))
+    assert not element_needs_sync(load_info, 'fire_01')
+
+
+def test_short_copy_fails(load_info, tmp_path, monkeypatch):
+    def short_copy(src_fd, dst_fd, size, stop_event=None):
+        os.write(dst_fd, os.read(src_fd, size // 2))
+        return size // 2
+
+    monkeypatch.setattr(tinyelements_copy, 'kernel_copy', short_copy)
+    target = str(tmp_path / 'short')
+    result = copy_files(element_path(load_info, 'global_lib'), target, ['fire_01.1001.exr'], strategies=['copy'])
+    assert result['copied'] == []
+    assert [filename for filename, _ in result['failed']] == ['fire_01.1001.exr']
+    assert not os.path.exists(os.path.join(target, 'fire_01.1001.exr'))
+
+
+def test_kernel_copy_falls_back(load_info, tmp_path, monkeypatch):
+    # some mounts answer 0 instead of failing, and writes can come up short
+    write = os.write
+    monkeypatch.setattr(os, 'copy_file_range', lambda *args: 0, raising=False)
+    monkeypatch.setattr(os, 'sendfile', lambda *args: 0, raising=False)
+    monkeypatch.setattr(os, 'write', lambda fd, data: write(fd, bytes(data[:1000])))
+    target = str(tmp_path / 'fallback')
+    result = copy_files(element_path(load_info, 'global_lib'), target, ['fire_01.1001.exr'], strategies=['copy'])
+    monkeypatch.undo()
+    assert result['copied'] == ['fire_01.1001.exr']
+    with open(os.path.join(target, 'fire_01.1001.exr'), 'rb') as a, \
+            open(os.path.join(element_path(load_info, 'global_lib'), 'fire_01.1001.exr'), 'rb') as b:
+        assert a.read() == b.read()
+
+
+def test_copy_element(load_info):
+    result = copy_element(load_info, 'fire_01')
+    show = element_path(load_info, 'show_lib')
+    assert sorted(result['copied']) == ['fire_01.%04d.exr'%n for n in range(1001, 1011)]
+    assert result['failed'] == [] and not result['cancelled']
+    assert result['target_folder'] == show
+    for n in range(1001, 1011):
+        name = 'fire_01.%04d.exr'%n
+        with open(os.path.join(show, name), 'rb') as a, \
+                open(os.path.join(element_path(load_info, 'global_lib'), name), 'rb') as b:
+            assert a.read() == b.read()
+    manifest = read_manifest(show)
+    assert len(manifest['files']) == 10
+    assert manifest['pending'] == []
+
+
+def test_cancelled_copy_resumes(load_info, monkeypatch):
+    # hold the fourth frame until the cancel lands, small frames would all be done before it otherwise
+    placed = []
+    place_file = tinyelements_copy.place_file
+
+    def held_place(src, dst, stop_event=None, strategies=None):
+        placed.append(dst)
+        if len(placed) > 3:
+            stop_event.wait(5)
+        return place_file(src, dst, stop_event, strategies)
+
+    monkeypatch.setattr(tinyelements_copy, 'place_file', held_place)
+    calls = []
+    load_info['copy_workers'] = 1
+    result = copy_element(load_info, 'fire_01', is_cancelled=lambda: calls.append(1) or len(calls) >= 3)
+    monkeypatch.undo()
+    assert result['cancelled']
+    done = len(result['copied'])
+    assert done == 3
+    assert len(read_manifest(element_path(load_info, 'show_lib'))['pending']) == 10 - done
+
+    result = copy_element(load_info, 'fire_01')
+    assert len(result['copied']) == 10 - done
+    assert len(result['unchanged']) == done
+
+
+def test_plan_sync(load_info):
+    source, show = element_path(load_info, 'global_lib'), element_path(load_info, 'show_lib')
+    assert len(plan_sync(source, show)['copy']) == 10
+
+    copy_element(load_info, 'fire_01')
+    sync = plan_sync(source, show)
+    assert sync['copy'] == [] and len(sync['unchanged']) == 10 and sync['stale'] == []
+
+    with open(os.path.join(source, 'fire_01.1004.exr'), 'ab') as f:
+        f.write(b'more')
+    os.remove(os.path.join(source, 'fire_01.1010.exr'))
+    sync = plan_sync(source, show)
+    assert sync['copy'] == ['fire_01.1004.exr']
+    assert sync['stale'] == ['fire_01.1010.exr']
+
+
+def test_plan_sync_legacy_copy(load_info, bump_mtime):
+    # copies from before manifests were written count as current when they look it
+    source, show = element_path(load_info, 'global_lib'), element_path(load_info, 'show_lib')
+    copy_element(load_info, 'fire_01')
+    os.remove(os.path.join(show, '.tinyelements_manifest.json'))
+    for name in os.listdir(show):
+        bump_mtime(os.path.join(show, name))
+    assert plan_sync(source, show)['copy'] == []
+
+    bump_mtime(os.path.join(source, 'fire_01.1002.exr'), 60)
+    assert plan_sync(source, show)['copy'] == ['fire_01.1002.exr']
+
+
+def test_plan_sync_hash(load_info):
+    # a copy with no manifest to vouch for it is only caught by content
+    source, show = element_path(load_info, 'global_lib'), element_path(load_info, 'show_lib')
+    copy_element(load_info, 'fire_01')
+    os.remove(os.path.join(show, '.tinyelements_manifest.json'))
+    frame = os.path.join(show, 'fire_01.1006.exr')
+    stat = os.stat(frame)
+    with open(frame, 'r+b') as f:
+        f.write(b'\0\0\0\0')
+    os.utime(frame, (stat.st_atime, stat.st_mtime))
+
+    assert plan_sync(source, show)['copy'] == []
+    sync = plan_sync(source, show, use_hash=True)
+    assert sync['copy'] == ['fire_01.1006.exr']
+    assert len(sync['unchanged']) == 9
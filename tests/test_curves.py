@@ -0,0 +1,139 @@
+"""Checks that the curve scripts apply_offset_anim hands nuke put the same keys on a
+knob as setting them one at a time did. Runs without nuke: StandInKnob plays the
+part of an XY_Knob and reads curve scripts the way nuke does.
+
+    python -m pytest tests
+"""
+import json, math
+
+from tinyelements.tinyelements_curves import static_source_point, offset_source_point, curve_value, curve_script, \
+    parse_curve_script
+from tinyelements.tinyelements_helpers import apply_offset_anim
+
+LETTERS = {'K': 'constant', 'L': 'linear', 'Z': 'smooth', 'R': 'catmull_rom', 'C': 'cubic',
+           'H': 'horizontal', 'X': 'break'}
+
+
+class StandInKnob(object):
+    """Just enough of an XY_Knob to record the keys put on it and how many calls it took"""
+
+    def __init__(self):
+        self.channels = [dict(), dict()]
+        self.value = [0.0, 0.0]
+        self.calls = 0
+
+    def setAnimated(self):
+        self.calls += 1
+
+    def setValue(self, value):
+        self.calls += 1
+        self.value = list(value)
+
+    def setValueAt(self, value, frame, channel):
+        self.calls += 1
+        self.channels[channel][float(frame)] = [float(value), 'smooth']
+
+    def setInterpolation(self, channel, frame, interpolation):
+        self.channels[channel][float(frame)][1] = interpolation
+
+    def setSlopes(self, channel, frame, lslope, rslope):
+        self.channels[channel][float(frame)][2:] = [float(lslope), float(rslope)]
+
+    def fromScript(self, script):
+        self.calls += 1
+        body = script.strip()[1:-1]
+        if '{' not in body:
+            self.value = [float(word) for word in body.split()]
+            return
+        for channel, curve in enumerate(body.replace('}', '').split('{')[1:]):
+            frame, interpolation = 1.0, 'smooth'
+            for word in curve.split()[1:]:
+                if word in LETTERS:
+                    interpolation = LETTERS[word]
+                elif word.startswith('x'):
+                    frame = float(word[1:])
+                elif word.startswith('s'):
+                    slope = float(word[1:])
+                    self.channels[channel][last][1:] = ['user_set_slope', slope, slope]
+                elif word.startswith('t'):
+                    self.channels[channel][last][3] = float(word[1:])
+                else:
+                    self.channels[channel][frame] = [float(word), interpolation]
+                    last = frame
+                    frame += 1
+
+    def keys(self):
+        return [sorted((frame,) + tuple(key) for frame, key in channel.items()) for channel in self.channels]
+
+
+def apply_one_key_at_a_time(knob, source_point, center=None):
+    """How keys went onto the knob before curve scripts"""
+    if center is not None:
+        source_point = offset_source_point(source_point, center)
+    knob.setAnimated()
+    for channel, curve in enumerate(source_point['curves']):
+        for key in curve:
+            knob.setValueAt(key[1], key[0], channel)
+            knob.setInterpolation(channel, key[0], key[2] if len(key) > 2 else 'linear')
+            if len(key) > 2 and key[2] == 'user_set_slope':
+                knob.setSlopes(channel, key[0], key[3], key[4])
+
+
+def tracked_point(frames):
+    return {'curves': [[[f, 960 + 100 * math.sin(f / 40.0)] for f in frames],
+                       [[f, 540 + 0.5 * f] for f in frames]]}
+
+
+KEYED = {'curves': [[[1001, 900.0, 'smooth', 0.0, 0.0], [1010, 950.5, 'linear', 1.5, 1.5],
+                     [1020, 975.25, 'constant', 0.0, 0.0], [1030, 980.0, 'user_set_slope', 1.25, -0.5],
+                     [1040, 990.0, 'user_set_slope', 2.0, 2.0]],
+                    [[1001, 500.0], [1030, 520.0]]]}
+
+
+def test_keyed_point_matches_setting_keys_one_at_a_time():
+    for center in [None, [1024, 778]]:
+        expected, bulk = StandInKnob(), StandInKnob()
+        apply_one_key_at_a_time(expected, KEYED, center)
+        apply_offset_anim(bulk, KEYED, center)
+        assert bulk.keys() == expected.keys()
+        assert bulk.calls == 1
+
+
+def test_long_element_is_one_call():
+    source_point = tracked_point(range(1001, 6001))
+    expected, bulk = StandInKnob(), StandInKnob()
+    apply_one_key_at_a_time(expected, source_point, [960, 540])
+    apply_offset_anim(bulk, source_point, [960, 540])
+    assert bulk.keys() == expected.keys()
+    assert bulk.calls == 1
+    assert expected.calls == 2 * 5000 + 1
+
+
+def test_per_frame_sidecar_from_json():
+    # older sidecars hold a key per frame, and json turns the frames into strings
+    samples = dict((n, [960 + 100 * math.sin(n / 40.0), 540.0]) for n in range(1, 201))
+    legacy = json.loads(json.dumps(samples))
+    knob = StandInKnob()
+    apply_offset_anim(knob, legacy)
+    x_keys, y_keys = knob.keys()
+    assert len(x_keys) < len(samples)
+    curve = [[key[0], key[1]] for key in x_keys]
+    for n, (x, _) in samples.items():
+        assert abs(curve_value(curve, n) - x) <= 0.1 + 1e-9
+
+
+def test_still_point_sets_a_value():
+    knob = StandInKnob()
+    apply_offset_anim(knob, static_source_point(960, 540), [1024, 778])
+    assert knob.value == [64, 238]
+    assert knob.keys() == [[], []]
+
+
+def test_set_slopes_round_trip():
+    curve = KEYED['curves'][0]
+    script = curve_script(curve)
+    assert 's1.25 t-0.5' in script
+    keys = parse_curve_script(script)[0]
+    assert keys[3] == [1030, 980.0, 'user_set_slope', 1.25, -0.5]
+    assert keys[4] == [1040, 990.0, 'user_set_slope', 2.0, 2.0]
+    assert [key[:2] for key in keys] == [key[:2] for key in curve]
@@ -0,0 +1,33 @@
+"""The library index kept in step with a throwaway library, no nuke needed.
+
+    python -m pytest tests
+"""
+import os
+
+from tinyelements.tinyelements_index import LibraryIndex
+
+
+def test_changed_elements_are_rescanned(tmp_path, make_element, bump_mtime):
+    library = str(tmp_path)
+    category = os.path.join(library, 'Fire')
+    make_element(library, 'Fire', 'fire_01', range(1001, 1011))
+    make_element(library, 'Fire', 'fire_02', range(1, 6))
+    index = LibraryIndex(':memory:')
+    rows = dict((row['name'], row) for row in index.get_elements(library, 'Fire'))
+    assert rows['fire_01']['endframe'] == 1010
+    assert not rows['fire_01']['has_thumb']
+
+    # fire_01 gets longer and a thumbnail, and a new element bumps the category
+    make_element(library, 'Fire', 'fire_01', range(1011, 1021))
+    with open(os.path.join(category, 'fire_01', 'fire_01.gif'), 'wb') as f:
+        f.write(b'GIF89a')
+    bump_mtime(os.path.join(category, 'fire_01'))
+    make_element(library, 'Fire', 'fire_03', range(1, 3))
+    bump_mtime(category)
+
+    rows = dict((row['name'], row) for row in index.get_elements(library, 'Fire'))
+    assert sorted(rows) == ['fire_01', 'fire_02', 'fire_03']
+    assert rows['fire_01']['endframe'] == 1020
+    assert rows['fire_01']['count'] == 20
+    assert rows['fire_01']['has_thumb']
+    assert rows['fire_02']['endframe'] == 5
@@ -0,0 +1,73 @@
+"""Load plans resolved against a throwaway library, no nuke needed.
+
+    python -m pytest tests
+"""
+import os, json, struct
+
+import pytest
+
+from tinyelements.tinyelements_index import LibraryIndex
+from tinyelements.tinyelements_planner import plan_load, plan_to_dict
+
+PNG_HEADER = b'\x89PNG\r\n\x1a\n' + struct.pack('>I', 13) + b'IHDR' + struct.pack('>IIBBBBB', 2048, 1152, 8, 6, 0, 0, 0)
+
+
+def make_element(library, category, element, frames, sidecar=None):
+    element_path = os.path.join(library, category, element)
+    os.makedirs(element_path)
+    for frame in frames:
+        with open(os.path.join(element_path, '%s.%04d.png'%(element, frame)), 'wb') as f:
+            f.write(PNG_HEADER)
+    if sidecar is not None:
+        with open(os.path.join(element_path, element + '.json'), 'w') as f:
+            json.dump(sidecar, f)
+
+
+@pytest.fixture
+def libraries(tmp_path):
+    global_lib, show_lib = str(tmp_path / 'global'), str(tmp_path / 'show')
+    make_element(global_lib, 'Fire', 'fire_01', range(1001, 1011),
+                 sidecar={'source_point': {'1001': [100, 200], '1002': [110, 200], '1003': [120, 200]}})
+    make_element(global_lib, 'Fire', 'fire_02', range(1, 6))
+    make_element(show_lib, 'Fire', 'fire_02', range(1, 4))
+    return global_lib, show_lib
+
+
+def load_info(libraries, elements, copy_to=False):
+    return {'element_list': elements, 'type': 'Centered Switch', 'category': 'Fire', 'start_frame': 1001,
+            'copy_to': copy_to, 'global_lib': libraries[0], 'show_lib': libraries[1]}
+
+
+def test_plan_resolves_each_element(libraries):
+    plan = plan_load(load_info(libraries, ['fire_01', 'fire_02', 'missing']), index=LibraryIndex(':memory:'))
+    fire_01, fire_02, missing = plan.elements
+
+    assert [e.element for e in plan.elements] == ['fire_01', 'fire_02', 'missing']
+    assert fire_01.from_global_lib and not fire_01.needs_copy
+    assert (fire_01.start, fire_01.end, fire_01.width, fire_01.height) == (1001, 1010, 2048, 1152)
+    assert fire_01.file == os.path.join(libraries[0], 'Fire', 'fire_01', 'fire_01.%04d.png')
+    assert [key[:2] for key in fire_01.source_point['curves'][0]] == [(1001, 100), (1003, 120)]
+
+    # the show copy wins over the global one
+    assert not fire_02.from_global_lib and fire_02.end == 3
+    assert fire_02.source_point is None
+    assert missing.error is not None
+
+
+def test_copy_is_planned_not_made(libraries):
+    plan = plan_load(load_info(libraries, ['fire_01'], copy_to=True), index=LibraryIndex(':memory:'))
+    fire_01 = plan.elements[0]
+
+    assert fire_01.needs_copy and not fire_01.from_global_lib
+    assert fire_01.element_dir == os.path.join(libraries[1], 'Fire', 'fire_01')
+    assert fire_01.source_dir == os.path.join(libraries[0], 'Fire', 'fire_01')
+    assert not os.path.exists(fire_01.element_dir)
+
+
+def test_plan_is_read_only(libraries):
+    plan = plan_load(load_info(libraries, ['fire_01']), index=LibraryIndex(':memory:'))
+    with pytest.raises(AttributeError):
+        plan.elements[0].start = 1
+    with pytest.raises(TypeError):
+        plan.elements[0].metadata['width'] = 1
+    json.dumps(plan_to_dict(plan))
@@ -0,0 +1,73 @@
+"""Search ranking and filters over a hand-built index, no library or nuke needed.
+
+    python -m pytest tests
+"""
+import pytest
+
+from tinyelements.tinyelements_search import SearchIndex, parse_query, EXACT_SCORE, PREFIX_SCORE, \
+    SUBSTRING_SCORE, TAG_SCORE, NAME_START_BONUS
+
+
+def doc(name, category='Fire', **fields):
+    return dict({'library': '/lib/global', 'category': category, 'name': name}, **fields)
+
+
+@pytest.fixture
+def index():
+    search = SearchIndex()
+    for d in [doc('fire_01', width=1920, height=1080, duration=100, tags=['hero']),
+              doc('fireball_big', width=4096, height=2160, duration=40),
+              doc('campfire_small', width=1920, height=1080, duration=250),
+              doc('big_fire_wall', width=2048, height=1556, duration=80),
+              doc('smoke_01', category='Smoke', width=1920, height=1080, duration=100, tags=['fire'])]:
+        search.add(d)
+    search.get_ranks()
+    return search
+
+
+def names(results):
+    return [d['name'] for _, d in results]
+
+
+def test_whole_word_beats_prefix_beats_substring(index):
+    results = index.search('fire')
+    scores = dict((d['name'], score) for score, d in results)
+    assert scores['fire_01'] == EXACT_SCORE
+    assert scores['big_fire_wall'] == EXACT_SCORE
+    assert scores['fireball_big'] == PREFIX_SCORE + NAME_START_BONUS
+    assert scores['campfire_small'] == SUBSTRING_SCORE
+    assert scores['smoke_01'] == TAG_SCORE
+    # equal scores go shortest name first
+    assert names(results) == ['fire_01', 'big_fire_wall', 'fireball_big', 'smoke_01', 'campfire_small']
+
+
+def test_every_term_has_to_match(index):
+    assert names(index.search('fire big')) == ['big_fire_wall', 'fireball_big']
+    assert index.search('fire nothing') == []
+
+
+def test_short_terms_only_match_word_starts(index):
+    assert 'campfire_small' not in names(index.search('fi'))
+    assert 'fireball_big' in names(index.search('fi'))
+
+
+def test_filters(index):
+    assert names(index.search('fire width>=2000')) == ['big_fire_wall', 'fireball_big']
+    assert names(index.search('duration<100 category:fire')) == ['fireball_big', 'big_fire_wall']
+    assert names(index.search('tag:hero')) == ['fire_01']
+    assert names(index.search('fire', filters={'category': 'smoke'})) == ['smoke_01']
+
+
+def test_parse_query():
+    terms, filters = parse_query('Fire_Big width>1920 height<=1080 tag:hero width=abc')
+    assert terms == ['fire', 'big']
+    assert filters == {'width': (1921.0, None), 'height': (None, 1080.0), 'tag': 'hero'}
+
+
+def test_filters_on_their_own(index):
+    assert names(index.search('width>=2000')) == ['fireball_big', 'big_fire_wall']
+    assert names(index.search('height=1080 duration>=100')) == ['fire_01', 'smoke_01', 'campfire_small']
+    # a filter that doesn't parse is dropped rather than searched for as a name
+    assert len(index.search('width=abc')) == 5
+    index.add(doc('fire_wide', width=3000))
+    assert names(index.search('width>2500 width<3500')) == ['fire_wide']
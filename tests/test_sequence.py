@@ -0,0 +1,67 @@
+"""Sequence detection from directory listings, no filesystem or nuke needed.
+
+    python -m pytest tests
+"""
+import pytest
+
+from tinyelements.tinyelements_sequence import classify_filename, find_sequences, longest_sequence, \
+    frames_to_ranges, ranges_to_frames, sequence_files
+
+
+def by_name(sequences):
+    return dict((seq['name'], seq) for seq in sequences)
+
+
+def test_groups_a_listing_into_sequences():
+    listing = ['fire_01.%04d.exr'%n for n in range(1001, 1011)] + \
+              ['smoke_%d.png'%n for n in range(1, 4)] + ['plate.exr', 'fire_01.json', 'notes.txt']
+    sequences = by_name(find_sequences(listing))
+    assert sorted(sequences) == ['fire_01', 'plate', 'smoke']
+
+    fire = sequences['fire_01']
+    assert fire['fname'] == 'fire_01.%04d.exr'
+    assert (fire['startframe'], fire['endframe'], fire['count']) == (1001, 1010, 10)
+    assert fire['missing_frames'] == []
+    assert fire['files'][0] == 'fire_01.1001.exr'
+
+    assert sequences['smoke']['fname'] == 'smoke_%01d.png'
+    assert sequences['smoke']['separator'] == '_'
+    assert sequences['plate']['frame_format'] == 'None'
+    assert sequences['plate']['fname'] == 'plate.exr'
+
+
+def test_gaps_come_from_the_frame_numbers():
+    # a short or gappy sequence keeps its real range, not one worked out from the count
+    listing = ['fire.%04d.exr'%n for n in [1001, 1002, 1005, 1006, 1010]]
+    seq = find_sequences(listing)[0]
+    assert (seq['startframe'], seq['endframe'], seq['count']) == (1001, 1010, 5)
+    assert seq['missing_frames'] == [1003, 1004, 1007, 1008, 1009]
+    assert frames_to_ranges(seq['missing_frames']) == '1003-1004,1007-1009'
+
+
+def test_padding_mismatches():
+    seq = find_sequences(['fire.0001.exr', 'fire.0002.exr', 'fire.3.exr'])[0]
+    assert seq['padding'] == 4
+    assert seq['mismatched_files'] == ['fire.3.exr']
+    assert sequence_files(seq) == ['fire.0001.exr', 'fire.0002.exr', 'fire.3.exr']
+    assert sequence_files(seq, [2]) == ['fire.0002.exr']
+
+
+def test_longest_sequence():
+    listing = ['fire.%04d.exr'%n for n in range(1, 11)] + ['fire_tmp.%04d.exr'%n for n in range(1, 3)]
+    assert longest_sequence(find_sequences(listing))['name'] == 'fire'
+    with pytest.raises(ValueError):
+        longest_sequence(find_sequences(['notes.txt']))
+
+
+def test_classify_filename():
+    assert classify_filename('fire_01.1001.exr')['frame'] == 1001
+    assert classify_filename('fire_01.1001.exr')['prefix'] == 'fire_01'
+    assert classify_filename('still.JPG')['frame'] is None
+    assert classify_filename('fire_01.json') is None
+
+
+def test_ranges_round_trip():
+    for frames in [[], [5], [1, 2, 3], [1001, 1002, 1004, 1010, 1011, 1012]]:
+        assert ranges_to_frames(frames_to_ranges(frames)) == frames
+    assert frames_to_ranges([1, 2, 3, 7]) == '1-3,7'
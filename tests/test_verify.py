@@ -0,0 +1,89 @@
+"""Manifests and verify run against a throwaway library, no nuke needed.
+
+    python -m pytest tests
+"""
+import os
+
+import pytest
+
+from tinyelements.tinyelements_copy import copy_element
+from tinyelements.tinyelements_verify import update_manifest, verify_element, audit_library, report_problems
+
+
+def damage(path, data=b'\0\0\0\0'):
+    """Overwrite the start of a file without changing its size or mtime, like a bad disk would"""
+    stat = os.stat(path)
+    with open(path, 'r+b') as f:
+        f.write(data)
+    os.utime(path, (stat.st_atime, stat.st_mtime))
+
+
+@pytest.fixture
+def library(tmp_path, make_element):
+    global_lib = str(tmp_path / 'global')
+    element_path = make_element(global_lib, 'Fire', 'fire_01', range(1001, 1011))
+    update_manifest(element_path)
+    return global_lib, element_path
+
+
+def test_clean_element_passes(library):
+    _, element_path = library
+    report = verify_element(element_path)
+    assert report_problems(report) == []
+    assert report['checked'] == 10
+
+
+def test_manifest_only_hashes_what_changed(library):
+    _, element_path = library
+    assert update_manifest(element_path)['hashed'] == 0
+    with open(os.path.join(element_path, 'fire_01.1011.exr'), 'wb') as f:
+        f.write(b'new frame')
+    assert update_manifest(element_path)['hashed'] == 1
+
+
+def test_damage_is_reported(library):
+    _, element_path = library
+    frame = lambda n: os.path.join(element_path, 'fire_01.%04d.exr'%n)
+    os.remove(frame(1005))
+    with open(frame(1003), 'r+b') as f:
+        f.truncate(100)
+    damage(frame(1007))
+
+    report = verify_element(element_path)
+    assert report['missing'] == ['fire_01.1005.exr']
+    assert report['truncated'] == ['fire_01.1003.exr']
+    assert report['corrupt'] == ['fire_01.1007.exr']
+    assert report['gaps'] == [1005]
+
+    sizes_only = verify_element(element_path, check_hashes=False)
+    assert sizes_only['corrupt'] == []
+    assert sizes_only['checked'] == 0
+
+
+def test_cancelled_copy_is_short(library, tmp_path):
+    global_lib, _ = library
+    load_info = {'global_lib': global_lib, 'show_lib': str(tmp_path / 'show'), 'category': 'Fire', 'copy_workers': 1}
+    calls = []
+    result = copy_element(load_info, 'fire_01', is_cancelled=lambda: calls.append(1) or len(calls) > 4)
+    assert result['cancelled']
+    copied = os.path.join(load_info['show_lib'], 'Fire', 'fire_01')
+    expected_missing = 10 - len(result['copied'])
+
+    assert len(verify_element(copied)['missing']) == expected_missing
+
+    results, _ = audit_library(load_info['show_lib'], source_library=global_lib)
+    assert len(results['Fire/fire_01']['missing']) == expected_missing
+
+    copy_element(load_info, 'fire_01')
+    assert report_problems(verify_element(copied)) == []
+    assert report_problems(verify_element(copied, os.path.join(global_lib, 'Fire', 'fire_01'))) == []
+
+
+def test_copy_checked_against_source(library, tmp_path):
+    global_lib, _ = library
+    load_info = {'global_lib': global_lib, 'show_lib': str(tmp_path / 'show'), 'category': 'Fire'}
+    copy_element(load_info, 'fire_01')
+    damage(os.path.join(load_info['show_lib'], 'Fire', 'fire_01', 'fire_01.1002.exr'))
+
+    results, _ = audit_library(load_info['show_lib'], source_library=global_lib)
+    assert results['Fire/fire_01']['corrupt'] == ['fire_01.1002.exr']